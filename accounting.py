@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from environment import Environment
+import heapq
+import itertools
+import monkey_object
+import sys
+import weakref
+
+
+@dataclass
+class TypeUsage:
+    count: int = 0
+    bytes: int = 0
+
+
+def type_name(obj):
+    if isinstance(obj, Environment):
+        return "ENVIRONMENT"
+    return str(obj.type())
+
+
+def estimate_size(obj):
+    "Estimated bytes held by `obj` itself, not counting the objects it refers to."
+    size = sys.getsizeof(obj) + sys.getsizeof(vars(obj))
+    if isinstance(obj, Environment):
+        size += sys.getsizeof(obj.store)
+    elif isinstance(obj, monkey_object.Integer) or isinstance(
+        obj, monkey_object.String
+    ):
+        size += sys.getsizeof(obj.value)
+    elif isinstance(obj, monkey_object.Array):
+        size += sys.getsizeof(obj.elements)
+    elif isinstance(obj, monkey_object.IntArray):
+        size += sys.getsizeof(obj.values)
+    elif isinstance(obj, monkey_object.Hash):
+        size += sys.getsizeof(obj.pairs)
+        for key, pair in obj.pairs.items():
+            size += sys.getsizeof(key) + sys.getsizeof(pair)
+    return size
+
+
+def describe(obj):
+    if isinstance(obj, Environment):
+        return f"ENVIRONMENT[{len(obj.store)}]"
+    elif isinstance(obj, monkey_object.String):
+        return f"STRING[{len(obj.value)}]"
+    elif isinstance(obj, monkey_object.Array):
+        return f"ARRAY[{len(obj.elements)}]"
+    elif isinstance(obj, monkey_object.IntArray):
+        return f"INT_ARRAY[{len(obj.values)}]"
+    elif isinstance(obj, monkey_object.Hash):
+        return f"HASH[{len(obj.pairs)}]"
+    return type_name(obj)
+
+
+class AllocationAccountant:
+    """
+    Counts the Monkey objects and environments created during a run along
+    with their estimated size, tracks live and peak bytes, and remembers the
+    largest allocations. Install it with monkey_object.observe_allocations.
+    With a `quota`, creating an object that takes live bytes over the quota
+    raises MemoryQuotaExceeded, which the evaluator turns into an Error and
+    the VM raises like its other runtime errors.
+    """
+
+    def __init__(self, quota=None, largest=10):
+        self.quota = quota
+        self.by_type = dict()
+        self.live_bytes = 0
+        self.peak_live_bytes = 0
+        self._largest_size = largest
+        self._largest = []
+        self._sequence = itertools.count()
+
+    @property
+    def count(self):
+        return sum(usage.count for usage in self.by_type.values())
+
+    @property
+    def total_bytes(self):
+        return sum(usage.bytes for usage in self.by_type.values())
+
+    def allocated(self, obj):
+        size = estimate_size(obj)
+        name = type_name(obj)
+        usage = self.by_type.get(name)
+        if usage is None:
+            usage = TypeUsage()
+            self.by_type[name] = usage
+        usage.count += 1
+        usage.bytes += size
+
+        self.live_bytes += size
+        weakref.finalize(obj, self._freed, size)
+        if self.live_bytes > self.peak_live_bytes:
+            self.peak_live_bytes = self.live_bytes
+
+        entry = (size, next(self._sequence), describe(obj))
+        if len(self._largest) < self._largest_size:
+            heapq.heappush(self._largest, entry)
+        elif size > self._largest[0][0]:
+            heapq.heapreplace(self._largest, entry)
+
+        # the Error reporting an exceeded quota must still be creatable
+        if (
+            self.quota is not None
+            and self.live_bytes > self.quota
+            and not isinstance(obj, monkey_object.Error)
+        ):
+            raise monkey_object.MemoryQuotaExceeded(
+                f"memory quota of {self.quota} bytes exceeded"
+            )
+
+    def _freed(self, size):
+        self.live_bytes -= size
+
+    def largest(self):
+        "(estimated bytes, description) of the largest objects, biggest first."
+        return [(size, text) for size, _, text in sorted(self._largest, reverse=True)]
+
+    def report(self):
+        return {
+            "count": self.count,
+            "bytes": self.total_bytes,
+            "live_bytes": self.live_bytes,
+            "peak_live_bytes": self.peak_live_bytes,
+            "by_type": {
+                name: {"count": usage.count, "bytes": usage.bytes}
+                for name, usage in sorted(self.by_type.items())
+            },
+            "largest": [
+                {"bytes": size, "object": text} for size, text in self.largest()
+            ],
+        }
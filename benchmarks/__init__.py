@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from typing import Tuple
+import random
+
+ENGINES = ("vm", "eval")
+
+
+@dataclass
+class Workload:
+    name: str
+    source: str
+    # the engines that can run the workload
+    engines: Tuple[str, ...] = ENGINES
+
+
+def identifier(i):
+    "A distinct identifier for every `i`; identifiers cannot contain digits."
+    letters = ""
+    while True:
+        letters = chr(ord("a") + i % 26) + letters
+        i //= 26
+        if i == 0:
+            return "v" + letters
+
+
+def statements(n):
+    "`n` let statements, each building on the one before."
+    lines = ["let va = 1;"]
+    for i in range(1, n):
+        lines.append(f"let {identifier(i)} = {identifier(i - 1)} + {i % 7} * 2;")
+    lines.append(f"{identifier(n - 1)};")
+    return "\n".join(lines)
+
+
+def nested_ifs(depth):
+    return "if (true) { " * depth + "1" + " }" * depth
+
+
+def nested_parentheses(depth):
+    return "(" * depth + "1" + " + 1)" * depth
+
+
+def wide_array(n):
+    return "[" + ", ".join(str(i) for i in range(n)) + "]"
+
+
+def wide_hash(n):
+    return "{" + ", ".join(f"{i}: {i}" for i in range(n)) + "}"
+
+
+def generate(
+    statements=100, depth=3, identifier_density=0.5, literal_size=2, seed=0
+):
+    """
+    A valid program of `statements` let statements, each binding an
+    arithmetic expression nested `depth` operators deep. A leaf refers to an
+    earlier binding with probability `identifier_density` and is otherwise
+    an integer literal of `literal_size` digits.
+    """
+    rng = random.Random(seed)
+
+    def leaf(bound):
+        if bound > 0 and rng.random() < identifier_density:
+            return identifier(rng.randrange(bound))
+        digits = [str(rng.randint(1, 9))]
+        digits.extend(str(rng.randint(0, 9)) for _ in range(literal_size - 1))
+        return "".join(digits)
+
+    def expression(depth, bound):
+        if depth == 0:
+            return leaf(bound)
+        left = expression(depth - 1, bound)
+        right = expression(depth - 1, bound)
+        return f"({left} {rng.choice('+-*')} {right})"
+
+    lines = [f"let {identifier(i)} = {expression(depth, i)};" for i in range(statements)]
+    lines.append(f"{identifier(statements - 1)};")
+    return "\n".join(lines)
+
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# the parser and the evaluator recurse per level of nesting
+DEPTHS = (10, 50, 100)
+
+
+def workloads(max_size=10_000):
+    "The scaled workloads, up to `max_size` statements or elements."
+    result = []
+    for size in SIZES:
+        if size > max_size:
+            break
+        # two-byte operands limit the VM to 65535 constants and literal items
+        engines = ENGINES if size < 2**15 else ("eval",)
+        result.append(Workload(f"statements-{size}", statements(size), engines))
+        result.append(Workload(f"array-{size}", wide_array(size), engines))
+        result.append(Workload(f"hash-{size}", wide_hash(size), engines))
+    for depth in DEPTHS:
+        result.append(Workload(f"nested-ifs-{depth}", nested_ifs(depth)))
+        result.append(Workload(f"nested-parens-{depth}", nested_parentheses(depth)))
+    return result
+
+
+# The evaluator recurses deeply per Monkey call, so recursive workloads stay
+# at around 50 calls deep and repeat work within each call instead.
+CORPUS = [
+    Workload(
+        "fibonacci",
+        """
+        let fibonacci = fn(x) {
+            if (x < 2) { x } else { fibonacci(x - 1) + fibonacci(x - 2) }
+        };
+        fibonacci(15);
+        """,
+    ),
+    Workload(
+        "counter",
+        """
+        let count = fn(n, acc) {
+            if (n == 0) { acc } else { count(n - 1, acc + 1) }
+        };
+        count(50, 0) + count(50, 0) + count(50, 0) + count(50, 0);
+        """,
+    ),
+    Workload(
+        "string-building",
+        """
+        let build = fn(n, s) {
+            if (n == 0) { s } else { build(n - 1, s + "ab") }
+        };
+        len(build(50, ""));
+        """,
+    ),
+    Workload(
+        "hash-lookups",
+        """
+        let h = {"a": 1, "b": 2, "c": 3, 1: 4, 2: 5, true: 6};
+        let look = fn(n, acc) {
+            if (n == 0) {
+                acc
+            } else {
+                look(n - 1, acc + h["a"] + h["b"] + h["c"] + h[1] + h[2] + h[true])
+            }
+        };
+        look(50, 0);
+        """,
+    ),
+    Workload(
+        "array-push-rest",
+        """
+        let build = fn(n, arr) {
+            if (n == 0) { arr } else { build(n - 1, push(arr, n)) }
+        };
+        let sum = fn(arr, acc) {
+            if (len(arr) == 0) { acc } else { sum(rest(arr), acc + first(arr)) }
+        };
+        sum(build(50, []), 0);
+        """,
+    ),
+    Workload(
+        "closures",
+        """
+        let adder = fn(a) { fn(b) { fn(c) { a + b + c } } };
+        let loop = fn(n, acc) {
+            if (n == 0) { acc } else { loop(n - 1, acc + adder(n)(1)(2)) }
+        };
+        loop(50, 0);
+        """,
+    ),
+    Workload("arithmetic", statements(500)),
+]
@@ -0,0 +1,186 @@
+"""
+Throughput of each pipeline component in isolation, across program sizes.
+
+    python -m benchmarks.components --sizes 100,1000,10000 --depth 3
+
+For every component the table shows the rate at each size and the scaling
+exponent between consecutive sizes: the slope of log(time) against
+log(size), about 1.0 for linear work. A clearly larger exponent points at
+superlinear behaviour.
+"""
+from benchmarks import generate
+from dataclasses import dataclass
+from lexer import Lexer
+from monkey_code import Opcode
+from monkey_compiler import Compiler
+from monkey_parser import Parser
+from tokens import TokenType
+from typing import List, Optional
+import argparse
+import math
+import monkey_ast as ast
+import monkey_code as code
+import pipeline
+import sys
+import time
+
+
+@dataclass
+class Sample:
+    component: str
+    size: int
+    # units of work (tokens, nodes, bytes, instructions) and the seconds
+    # taken for them
+    units: int
+    seconds: float
+    exponent: Optional[float] = None
+
+    @property
+    def rate(self):
+        return self.units / max(self.seconds, 1e-9)
+
+
+def best_of(repetitions, fn, clock=time.perf_counter):
+    "The fastest of `repetitions` timed calls, and the last result."
+    best = None
+    for _ in range(repetitions):
+        start = clock()
+        result = fn()
+        elapsed = clock() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench_lexer(source, repetitions):
+    def lex():
+        lexer = Lexer(source)
+        count = 0
+        while lexer.next_token().type != TokenType.Eof:
+            count += 1
+        return count
+
+    return best_of(repetitions, lex)
+
+
+def bench_parser(source, repetitions):
+    tokens = pipeline.lex(source)
+
+    def parse():
+        return Parser(pipeline.TokenList(tokens)).parse_program()
+
+    seconds, program = best_of(repetitions, parse)
+    return seconds, sum(1 for _ in ast.walk(program))
+
+
+def bench_compiler(source, repetitions):
+    program = Parser(Lexer(source)).parse_program()
+
+    def compile():
+        compiler = Compiler()
+        compiler.compile(program)
+        return len(compiler.bytecode().instructions)
+
+    return best_of(repetitions, compile)
+
+
+ENCODED = [
+    (Opcode.CONSTANT, (65534,)),
+    (Opcode.ADD, ()),
+    (Opcode.GET_GLOBAL, (12,)),
+    (Opcode.JUMP_NOT_TRUTHY, (255,)),
+]
+
+
+def bench_make(count, repetitions):
+    def make():
+        for i in range(count):
+            op, operands = ENCODED[i % len(ENCODED)]
+            code.make(op, *operands)
+        return count
+
+    return best_of(repetitions, make)
+
+
+def bench_read_operands(count, repetitions):
+    encoded = [
+        (code.lookup(op), code.make(op, *operands)[1:]) for op, operands in ENCODED
+    ]
+
+    def read():
+        for i in range(count):
+            definition, operands = encoded[i % len(encoded)]
+            code.read_operands(definition, operands)
+        return count
+
+    return best_of(repetitions, read)
+
+
+def run_suite(sizes, depth=3, identifier_density=0.5, literal_size=2, repetitions=3):
+    samples = []
+    for size in sizes:
+        source = generate(size, depth, identifier_density, literal_size)
+        # code.make and read_operands run ten times per generated statement
+        for component, (seconds, units) in (
+            ("lexer", bench_lexer(source, repetitions)),
+            ("parser", bench_parser(source, repetitions)),
+            ("compiler", bench_compiler(source, repetitions)),
+            ("code.make", bench_make(size * 10, repetitions)),
+            ("read_operands", bench_read_operands(size * 10, repetitions)),
+        ):
+            samples.append(Sample(component, size, units, seconds))
+    _add_exponents(samples)
+    return samples
+
+
+def _add_exponents(samples: List[Sample]):
+    previous = dict()
+    for sample in samples:
+        before = previous.get(sample.component)
+        if before is not None and before.units > 0 and before.seconds > 0:
+            sample.exponent = math.log(sample.seconds / before.seconds) / math.log(
+                sample.units / before.units
+            )
+        previous[sample.component] = sample
+
+
+UNITS = {
+    "lexer": "tokens/s",
+    "parser": "nodes/s",
+    "compiler": "bytes/s",
+    "code.make": "instrs/s",
+    "read_operands": "instrs/s",
+}
+
+
+def format_table(samples):
+    out = f"{'component':<14} {'size':>8} {'units':>10} {'rate':>14} {'':<9} {'exponent':>8}\n"
+    for s in sorted(samples, key=lambda s: (list(UNITS).index(s.component), s.size)):
+        exponent = "" if s.exponent is None else f"{s.exponent:.2f}"
+        out += f"{s.component:<14} {s.size:>8} {s.units:>10} {s.rate:>14.0f} {UNITS[s.component]:<9} {exponent:>8}\n"
+    return out
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    args.add_argument("--sizes", default="100,1000,10000")
+    args.add_argument("--depth", type=int, default=3)
+    args.add_argument("--identifier-density", type=float, default=0.5)
+    args.add_argument("--literal-size", type=int, default=2)
+    args.add_argument("--repetitions", type=int, default=3)
+    args = args.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    samples = run_suite(
+        sizes,
+        args.depth,
+        args.identifier_density,
+        args.literal_size,
+        args.repetitions,
+    )
+    print(format_table(samples), end="")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Throughput of the corpus workloads on the evaluator and the VM.
+
+    python -m benchmarks.engines --output engines.json
+    python -m benchmarks.engines --baseline engines.json --threshold 0.1
+    python -m benchmarks.engines --optimize --baseline engines.json
+
+Each workload is parsed (and compiled, for the VM) once; only execution is
+timed. With a baseline the run exits with status 1 if any workload's mean
+ops/sec dropped by more than the threshold. `--optimize` compiles with the
+compiler's optimizations, superinstructions and compact encoding, and also
+prints how many VM instructions each workload dispatches with and without
+them.
+"""
+from benchmarks import CORPUS
+from dataclasses import asdict, dataclass
+from environment import Environment
+from lexer import Lexer
+from monkey_compiler import Compiler
+from monkey_parser import Parser
+from monkey_vm import VM
+from typing import List
+import argparse
+import evaluator
+import json
+import pipeline
+import platform
+import statistics
+import sys
+import time
+
+
+@dataclass
+class Throughput:
+    workload: str
+    engine: str
+    repetitions: int
+    # runs per second: the mean, its sample standard deviation and range
+    mean: float
+    stdev: float
+    min: float
+    max: float
+
+
+@dataclass
+class Regression:
+    workload: str
+    engine: str
+    baseline: float
+    current: float
+
+    def __str__(self):
+        drop = (self.baseline - self.current) / self.baseline * 100
+        return (
+            f"{self.workload} {self.engine}: {self.baseline:.1f} -> "
+            f"{self.current:.1f} ops/sec (-{drop:.1f}%)"
+        )
+
+
+@dataclass
+class Dispatches:
+    workload: str
+    plain: int
+    optimized: int
+
+
+def prepare(workload, engine, optimize=False):
+    "A function running `workload` once on `engine`."
+    parser = Parser(Lexer(workload.source))
+    program = parser.parse_program()
+    if len(parser.errors) > 0:
+        raise ValueError(f"{workload.name}: {parser.errors[0]}")
+    if engine == "vm":
+        compiler = Compiler(
+            optimize=optimize, superinstructions=optimize, compact=optimize
+        )
+        compiler.compile(program)
+        bytecode = compiler.bytecode()
+        return lambda: VM(bytecode).run()
+    else:
+        return lambda: evaluator.eval_node(program, Environment())
+
+
+def measure(
+    workload,
+    engine,
+    repetitions=10,
+    warmup=2,
+    clock=time.perf_counter,
+    optimize=False,
+):
+    run = prepare(workload, engine, optimize)
+    for _ in range(warmup):
+        run()
+    rates = []
+    for _ in range(repetitions):
+        start = clock()
+        run()
+        rates.append(1 / max(clock() - start, 1e-9))
+    stdev = statistics.stdev(rates) if len(rates) > 1 else 0.0
+    return Throughput(
+        workload.name,
+        engine,
+        repetitions,
+        statistics.mean(rates),
+        stdev,
+        min(rates),
+        max(rates),
+    )
+
+
+def run_suite(corpus, repetitions=10, warmup=2, optimize=False) -> List[Throughput]:
+    return [
+        measure(workload, engine, repetitions, warmup, optimize=optimize)
+        for workload in corpus
+        for engine in workload.engines
+    ]
+
+
+def dispatches(corpus) -> List[Dispatches]:
+    "VM instructions executed per workload, without and with optimization."
+    return [
+        Dispatches(
+            workload.name,
+            pipeline.run(workload.source).stats.instructions_executed,
+            pipeline.run(workload.source, optimize=True).stats.instructions_executed,
+        )
+        for workload in corpus
+        if "vm" in workload.engines
+    ]
+
+
+def to_dict(results):
+    return {
+        "python": platform.python_version(),
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare(baseline, current, threshold=0.1) -> List[Regression]:
+    """
+    Workloads in `current` whose mean ops/sec fell more than `threshold` (a
+    fraction) below `baseline`. Both are `to_dict` results; workloads missing
+    from the baseline are not compared.
+    """
+    expected = {(r["workload"], r["engine"]): r["mean"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = (result["workload"], result["engine"])
+        if key in expected and result["mean"] < expected[key] * (1 - threshold):
+            regressions.append(Regression(*key, expected[key], result["mean"]))
+    return regressions
+
+
+def format_table(results):
+    out = f"{'workload':<18} {'engine':<6} {'ops/sec':>10} {'stdev':>9} {'min':>10} {'max':>10}\n"
+    for r in results:
+        out += f"{r.workload:<18} {r.engine:<6} {r.mean:>10.1f} {r.stdev:>9.1f} {r.min:>10.1f} {r.max:>10.1f}\n"
+    return out
+
+
+def format_dispatches(results):
+    out = f"{'workload':<18} {'plain':>10} {'optimized':>10} {'change':>8}\n"
+    for r in results:
+        change = (r.optimized - r.plain) / r.plain * 100
+        out += f"{r.workload:<18} {r.plain:>10} {r.optimized:>10} {change:>7.1f}%\n"
+    return out
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    args.add_argument("--output", help="write the results as JSON to this file")
+    args.add_argument("--baseline", help="compare against this JSON results file")
+    args.add_argument("--threshold", type=float, default=0.1)
+    args.add_argument("--repetitions", type=int, default=10)
+    args.add_argument("--warmup", type=int, default=2)
+    args.add_argument("--optimize", action="store_true")
+    args = args.parse_args(argv)
+
+    if args.optimize:
+        print(format_dispatches(dispatches(CORPUS)))
+    results = run_suite(CORPUS, args.repetitions, args.warmup, args.optimize)
+    print(format_table(results), end="")
+    current = to_dict(results)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Peak and retained memory of each pipeline stage, measured with tracemalloc.
+
+    python -m benchmarks.memory --output memory.json
+    python -m benchmarks.memory --output memory.json --baseline baseline.json
+
+--max-size (default 10000) bounds the statement and element counts; pass
+1000000 for the full suite. With a baseline the run exits with status 1 if any stage's peak or retained
+memory grew by more than the tolerance.
+"""
+from benchmarks import workloads
+from dataclasses import asdict, dataclass
+from environment import Environment
+from monkey_compiler import Compiler
+from monkey_parser import Parser
+from monkey_vm import VM
+from typing import List
+import argparse
+import evaluator
+import json
+import pipeline
+import platform
+import sys
+import tracemalloc
+
+
+@dataclass
+class StageMemory:
+    workload: str
+    engine: str
+    stage: str
+    # bytes allocated at the high-water mark of the stage
+    peak: int
+    # bytes still allocated once the stage finished
+    retained: int
+
+
+@dataclass
+class Regression:
+    workload: str
+    engine: str
+    stage: str
+    metric: str
+    baseline: int
+    current: int
+
+    def __str__(self):
+        growth = (self.current - self.baseline) / max(self.baseline, 1) * 100
+        return (
+            f"{self.workload} {self.engine} {self.stage} {self.metric}: "
+            f"{self.baseline} -> {self.current} bytes (+{growth:.1f}%)"
+        )
+
+
+class _Stages:
+    def __init__(self, workload, engine):
+        self.workload = workload
+        self.engine = engine
+        self.results = []
+
+    def measure(self, stage, fn):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        value = fn()
+        after, peak = tracemalloc.get_traced_memory()
+        self.results.append(
+            StageMemory(
+                self.workload, self.engine, stage, peak - before, after - before
+            )
+        )
+        return value
+
+
+def measure(workload, engine) -> List[StageMemory]:
+    "Memory used by each stage of running `workload` on `engine`."
+    stages = _Stages(workload.name, engine)
+    tracemalloc.start()
+    try:
+        tokens = stages.measure("lex", lambda: pipeline.lex(workload.source))
+        parser = Parser(pipeline.TokenList(tokens))
+        program = stages.measure("parse", parser.parse_program)
+        if len(parser.errors) > 0:
+            raise ValueError(f"{workload.name}: {parser.errors[0]}")
+        if engine == "vm":
+
+            def compile():
+                compiler = Compiler()
+                compiler.compile(program)
+                return compiler.bytecode()
+
+            bytecode = stages.measure("compile", compile)
+            machine = VM(bytecode)
+            stages.measure("run", machine.run)
+        else:
+            env = Environment()
+            stages.measure("run", lambda: evaluator.eval_node(program, env))
+    finally:
+        tracemalloc.stop()
+    return stages.results
+
+
+def run_suite(suite) -> List[StageMemory]:
+    results = []
+    for workload in suite:
+        for engine in workload.engines:
+            results.extend(measure(workload, engine))
+    return results
+
+
+def to_dict(results):
+    return {
+        "python": platform.python_version(),
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare(baseline, current, tolerance=0.1) -> List[Regression]:
+    """
+    Stages in `current` whose peak or retained memory exceeds `baseline` by
+    more than `tolerance` (a fraction). Both are `to_dict` results; stages
+    missing from the baseline are not compared.
+    """
+    expected = {
+        (r["workload"], r["engine"], r["stage"]): r for r in baseline["results"]
+    }
+    regressions = []
+    for result in current["results"]:
+        key = (result["workload"], result["engine"], result["stage"])
+        if key not in expected:
+            continue
+        for metric in ("peak", "retained"):
+            limit = expected[key][metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    Regression(*key, metric, expected[key][metric], result[metric])
+                )
+    return regressions
+
+
+def format_table(results):
+    out = f"{'workload':<22} {'engine':<6} {'stage':<8} {'peak':>14} {'retained':>14}\n"
+    for r in results:
+        out += f"{r.workload:<22} {r.engine:<6} {r.stage:<8} {r.peak:>14} {r.retained:>14}\n"
+    return out
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    args.add_argument("--output", help="write the results as JSON to this file")
+    args.add_argument("--baseline", help="compare against this JSON results file")
+    args.add_argument("--tolerance", type=float, default=0.1)
+    args.add_argument("--max-size", type=int, default=10_000)
+    args = args.parse_args(argv)
+
+    results = run_suite(workloads(args.max_size))
+    print(format_table(results), end="")
+    current = to_dict(results)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
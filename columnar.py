@@ -0,0 +1,263 @@
+from environment import Environment
+import evaluator
+import int_array
+import monkey_ast as ast
+import monkey_object
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INTEGER = "integer"
+BOOLEAN = "boolean"
+
+
+class UnsupportedNode(Exception):
+    pass
+
+
+class UnsupportedColumn(TypeError):
+    "A column whose values have no Monkey equivalent, such as floats."
+
+
+def column_kind(column):
+    if numpy is None or not isinstance(column, numpy.ndarray):
+        return None
+    if column.dtype == numpy.bool_:
+        return BOOLEAN
+    if numpy.issubdtype(column.dtype, numpy.integer):
+        return INTEGER
+    return None
+
+
+def compile_node(node, kinds):
+    """
+    Compile `node` into a (kind, fn) pair. fn(columns, mask) returns a NumPy
+    array or scalar; mask selects the rows whose result is actually used
+    (None for all rows). Raises UnsupportedNode for anything that cannot be
+    vectorized.
+    """
+    if isinstance(node, ast.Program) and len(node.statements) == 1:
+        return compile_node(node.statements[0], kinds)
+    elif isinstance(node, ast.BlockStatement) and len(node.statements) == 1:
+        return compile_node(node.statements[0], kinds)
+    elif isinstance(node, ast.ExpressionStatement):
+        return compile_node(node.expression, kinds)
+    elif isinstance(node, ast.IntegerLiteral):
+        if not int_array.INT64_MIN <= node.value < -int_array.INT64_MIN:
+            raise UnsupportedNode(f"integer literal out of range: {node.value}")
+        value = numpy.int64(node.value)
+        return INTEGER, lambda columns, mask: value
+    elif isinstance(node, ast.Boolean):
+        value = numpy.bool_(node.value)
+        return BOOLEAN, lambda columns, mask: value
+    elif isinstance(node, ast.Identifier):
+        if node.value not in kinds:
+            raise UnsupportedNode(f"no column for {node.value}")
+        name = node.value
+        return kinds[name], lambda columns, mask: columns[name]
+    elif isinstance(node, ast.PrefixExpression):
+        return compile_prefix_expression(node, kinds)
+    elif isinstance(node, ast.InfixExpression):
+        return compile_infix_expression(node, kinds)
+    elif isinstance(node, ast.IfExpression):
+        return compile_if_expression(node, kinds)
+    raise UnsupportedNode(type(node).__name__)
+
+
+def compile_prefix_expression(node, kinds):
+    kind, right = compile_node(node.right, kinds)
+    if node.operator == "-" and kind == INTEGER:
+        return INTEGER, lambda columns, mask: negate(right(columns, mask), mask)
+    elif node.operator == "!" and kind == BOOLEAN:
+        return BOOLEAN, lambda columns, mask: numpy.logical_not(right(columns, mask))
+    elif node.operator == "!" and kind == INTEGER:
+        # every integer is truthy
+        value = numpy.bool_(False)
+        return BOOLEAN, lambda columns, mask: value
+    raise UnsupportedNode(f"{node.operator}{kind}")
+
+
+def check_overflow(overflowed, mask):
+    "Raise OverflowError if a used row, per `mask`, overflowed int64."
+    if mask is not None:
+        overflowed = numpy.logical_and(overflowed, mask)
+    if numpy.any(overflowed):
+        raise OverflowError("integer overflow")
+
+
+def negate(a, mask):
+    check_overflow(numpy.equal(a, int_array.INT64_MIN), mask)
+    return numpy.negative(a)
+
+
+def checked(operator, ufunc, a, b, mask):
+    with numpy.errstate(all="ignore"):
+        result = ufunc(a, b)
+    check_overflow(int_array._overflowed(operator, a, b, result), mask)
+    return result
+
+
+def floor_divide(a, b, mask):
+    zero = numpy.equal(b, 0)
+    if mask is not None:
+        zero = numpy.logical_and(zero, mask)
+    if numpy.any(zero):
+        raise ZeroDivisionError("division by zero")
+    # rows outside the mask may still hold a zero divisor; their results
+    # are discarded, so divide those by one instead.
+    divisor = numpy.where(numpy.equal(b, 0), 1, b)
+    return checked("/", numpy.floor_divide, a, divisor, mask)
+
+
+INTEGER_OPERATORS = {
+    "+": (INTEGER, "add"),
+    "-": (INTEGER, "subtract"),
+    "*": (INTEGER, "multiply"),
+    "<": (BOOLEAN, "less"),
+    ">": (BOOLEAN, "greater"),
+    "==": (BOOLEAN, "equal"),
+    "!=": (BOOLEAN, "not_equal"),
+}
+
+BOOLEAN_OPERATORS = {
+    "==": (BOOLEAN, "equal"),
+    "!=": (BOOLEAN, "not_equal"),
+}
+
+
+def compile_infix_expression(node, kinds):
+    left_kind, left = compile_node(node.left, kinds)
+    right_kind, right = compile_node(node.right, kinds)
+    if left_kind == INTEGER and right_kind == INTEGER and node.operator == "/":
+        return INTEGER, lambda columns, mask: floor_divide(
+            left(columns, mask), right(columns, mask), mask
+        )
+    elif left_kind == INTEGER and right_kind == INTEGER:
+        operators = INTEGER_OPERATORS
+    elif left_kind == BOOLEAN and right_kind == BOOLEAN:
+        operators = BOOLEAN_OPERATORS
+    else:
+        raise UnsupportedNode(f"{left_kind} {node.operator} {right_kind}")
+
+    try:
+        kind, name = operators[node.operator]
+    except KeyError:
+        raise UnsupportedNode(f"{left_kind} {node.operator} {right_kind}")
+    ufunc = getattr(numpy, name)
+    if kind == INTEGER:
+        operator = node.operator
+        return kind, lambda columns, mask: checked(
+            operator, ufunc, left(columns, mask), right(columns, mask), mask
+        )
+    return kind, lambda columns, mask: ufunc(left(columns, mask), right(columns, mask))
+
+
+def compile_if_expression(node, kinds):
+    if node.alternative is None:
+        raise UnsupportedNode("if without else")
+    condition_kind, condition = compile_node(node.condition, kinds)
+    kind, consequence = compile_node(node.consequence, kinds)
+    alternative_kind, alternative = compile_node(node.alternative, kinds)
+    if kind != alternative_kind:
+        raise UnsupportedNode("if branches of different types")
+
+    def fn(columns, mask):
+        if condition_kind == BOOLEAN:
+            truthy = condition(columns, mask)
+        else:
+            truthy = numpy.bool_(True)
+        falsy = numpy.logical_not(truthy)
+        if mask is None:
+            taken, skipped = truthy, falsy
+        else:
+            taken = numpy.logical_and(mask, truthy)
+            skipped = numpy.logical_and(mask, falsy)
+        return numpy.where(
+            truthy, consequence(columns, taken), alternative(columns, skipped)
+        )
+
+    return kind, fn
+
+
+def native_value(obj):
+    if isinstance(obj, monkey_object.Integer) or isinstance(
+        obj, monkey_object.Boolean
+    ):
+        return obj.value
+    elif isinstance(obj, monkey_object.Null):
+        return None
+    return obj
+
+
+def monkey_value(value):
+    if value is None:
+        return evaluator.NULL
+    elif isinstance(value, str):
+        return monkey_object.String(value)
+    elif isinstance(value, bool) or (
+        numpy is not None and isinstance(value, numpy.bool_)
+    ):
+        return evaluator.native_bool_to_boolean_object(value)
+    elif isinstance(value, int) or (
+        numpy is not None and isinstance(value, numpy.integer)
+    ):
+        return monkey_object.Integer(int(value))
+    raise UnsupportedColumn(f"unsupported column value: {value!r}")
+
+
+def eval_rows(node, columns, length):
+    results = []
+    for i in range(length):
+        env = Environment()
+        for name, column in columns.items():
+            env.set(name, monkey_value(column[i]))
+        results.append(native_value(evaluator.eval_node(node, env)))
+
+    if numpy is None:
+        return results
+    if all(isinstance(r, bool) for r in results):
+        return numpy.array(results, dtype=bool)
+    if all(isinstance(r, int) and not isinstance(r, bool) for r in results):
+        try:
+            return numpy.array(results, dtype=numpy.int64)
+        except OverflowError:
+            # the evaluator's integers are unbounded
+            pass
+    column = numpy.empty(length, dtype=object)
+    column[:] = results
+    return column
+
+
+def eval_columns(node, columns, length=None):
+    """
+    Evaluate an expression once per row of `columns`, a mapping from
+    identifier to a column of values. Integer and boolean NumPy columns
+    are evaluated with ufuncs; anything else falls back to eval_node, as
+    does a result that overflows int64. Columns of other types, such as
+    floats, raise UnsupportedColumn.
+    """
+    if length is None:
+        length = len(next(iter(columns.values()))) if columns else 1
+    if numpy is not None:
+        kinds = {name: column_kind(column) for name, column in columns.items()}
+        for name, column in columns.items():
+            if kinds[name] is None and isinstance(column, numpy.ndarray):
+                if column.dtype.kind not in ("O", "U"):
+                    raise UnsupportedColumn(
+                        f"unsupported dtype for column {name}: {column.dtype}"
+                    )
+        try:
+            kind, fn = compile_node(
+                node, {name: k for name, k in kinds.items() if k is not None}
+            )
+        except UnsupportedNode:
+            return eval_rows(node, columns, length)
+        dtype = bool if kind == BOOLEAN else numpy.int64
+        try:
+            values = numpy.asarray(fn(columns, None), dtype=dtype)
+        except OverflowError:
+            return eval_rows(node, columns, length)
+        return numpy.broadcast_to(values, (length,)).copy()
+    return eval_rows(node, columns, length)
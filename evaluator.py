@@ -1,5 +1,13 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+import int_array
+import monkey_builtins
 import monkey_object
 import monkey_ast as ast
+import threading
+import time
 from environment import Environment
 
 TRUE = monkey_object.Boolean(True)
@@ -7,104 +15,94 @@ FALSE = monkey_object.Boolean(False)
 NULL = monkey_object.Null()
 
 
-def monkey_len(args):
-    if len(args) != 1:
-        return monkey_object.Error(
-            f"wrong number of arguments. got={len(args)}, want=1"
-        )
-
-    if isinstance(args[0], monkey_object.String):
-        return monkey_object.Integer(len(args[0].value))
-    elif isinstance(args[0], monkey_object.Array):
-        return monkey_object.Integer(len(args[0].elements))
-    else:
-        return monkey_object.Error(
-            f"argument to `len` not supported, got {args[0].type()}"
-        )
-
-
-def monkey_first(args):
-    if len(args) != 1:
-        return monkey_object.Error(
-            f"wrong number of arguments. got={len(args)}, want=1"
-        )
-
-    if not isinstance(args[0], monkey_object.Array):
-        return monkey_object.Error(
-            f"argument to `first` must be ARRAY, got {args[0].type()}"
-        )
-
-    arr = args[0]
-    if len(arr.elements) > 0:
-        return arr.elements[0]
-
-    return NULL
-
-
-def monkey_last(args):
-    if len(args) != 1:
-        return monkey_object.Error(
-            f"wrong number of arguments. got={len(args)}, want=1"
-        )
-
-    if not isinstance(args[0], monkey_object.Array):
-        return monkey_object.Error(
-            f"argument to `first` must be ARRAY, got {args[0].type()}"
-        )
-
-    arr = args[0]
-    if len(arr.elements) > 0:
-        return arr.elements[-1]
-
-    return NULL
-
-
-def monkey_rest(args):
-    if len(args) != 1:
-        return monkey_object.Error(
-            f"wrong number of arguments. got={len(args)}, want=1"
-        )
-    if args[0].type() != monkey_object.ObjectType.ARRAY:
-        return monkey_object.Error(
-            f"argument to `rest` must be ARRAY, got {args[0].type()}"
-        )
-    arr = args[0]
-    length = len(arr.elements)
-    if length > 0:
-        new_elements = arr.elements[1:length]
-        return monkey_object.Array(new_elements)
-
-    return NULL
+# how many steps are taken between checks of the deadline
+DEADLINE_CHECK_INTERVAL = 1024
+
+
+@dataclass
+class Limits:
+    "Per-run bounds on eval_node. `timeout` is in seconds of wall-clock time."
+    fuel: Optional[int] = None
+    timeout: Optional[float] = None
+    max_call_depth: Optional[int] = None
+
+
+class Meter:
+    def __init__(self, limits):
+        self.limits = limits
+        self.steps = 0
+        self.depth = 0
+        self.error = None
+        self.deadline = None
+        if limits.timeout is not None:
+            self.deadline = time.monotonic() + limits.timeout
+
+    def step(self):
+        if self.error is not None:
+            return self.error
+        self.steps += 1
+        fuel = self.limits.fuel
+        if fuel is not None and self.steps > fuel:
+            self.error = monkey_object.Error(f"out of fuel after {fuel} steps")
+        elif (
+            self.deadline is not None
+            and self.steps % DEADLINE_CHECK_INTERVAL == 0
+            and time.monotonic() > self.deadline
+        ):
+            self.error = monkey_object.Error(
+                f"deadline of {self.limits.timeout}s exceeded"
+            )
+        return self.error
+
+    def enter_call(self):
+        self.depth += 1
+        max_depth = self.limits.max_call_depth
+        if self.error is None and max_depth is not None and self.depth > max_depth:
+            self.error = monkey_object.Error(
+                f"maximum call depth of {max_depth} exceeded"
+            )
+        return self.error
+
+    def exit_call(self):
+        self.depth -= 1
+
+
+_meter = ContextVar("evaluator_meter", default=None)
+_profiler = ContextVar("evaluator_profiler", default=None)
+_tracer = ContextVar("evaluator_tracer", default=None)
+# number of `limited`/`profiled`/`traced` blocks open in any thread; while it is zero
+# the evaluator skips the context variable lookups entirely.
+_hooks_active = 0
+_hooks_lock = threading.Lock()
+
+
+@contextmanager
+def _activate(var, value):
+    global _hooks_active
+    token = var.set(value)
+    with _hooks_lock:
+        _hooks_active += 1
+    try:
+        yield value
+    finally:
+        with _hooks_lock:
+            _hooks_active -= 1
+        var.reset(token)
 
 
-def monkey_push(args):
-    if len(args) != 2:
-        return monkey_object.Error(
-            f"wrong number of arguments. got={len(args)}, want=2"
-        )
-    if args[0].type() != monkey_object.ObjectType.ARRAY:
-        return monkey_object.Error(
-            f"argument to `push` must be ARRAY, got {args[0].type()}"
-        )
-    arr = args[0]
-    new_elements = [*arr.elements, args[1]]
-    return monkey_object.Array(new_elements)
+def limited(limits):
+    "Apply `limits` to every eval_node call made inside the block."
+    return _activate(_meter, Meter(limits))
 
 
-def monkey_puts(args):
-    for arg in args:
-        print(arg.inspect())
-    return NULL
+def profiled(profiler):
+    "Report every Monkey function call made inside the block to `profiler`."
+    return _activate(_profiler, profiler)
 
 
-BUILTINS = {
-    "len": monkey_object.Builtin(monkey_len),
-    "first": monkey_object.Builtin(monkey_first),
-    "last": monkey_object.Builtin(monkey_last),
-    "rest": monkey_object.Builtin(monkey_rest),
-    "push": monkey_object.Builtin(monkey_push),
-    "puts": monkey_object.Builtin(monkey_puts),
-}
+def traced(tracer):
+    "Record a trace span for every Monkey function call made inside the block."
+    return _activate(_tracer, tracer)
 
 
 def is_error(obj):
@@ -112,6 +110,13 @@ def is_error(obj):
 
 
 def eval_node(node, env):
+    if _hooks_active:
+        meter = _meter.get()
+        if meter is not None:
+            error = meter.step()
+            if error is not None:
+                return error
+
     if isinstance(node, ast.Program):
         return eval_program(node, env)
     elif isinstance(node, ast.BlockStatement):
@@ -154,7 +159,7 @@ def eval_node(node, env):
     elif isinstance(node, ast.FunctionLiteral):
         params = node.parameters
         body = node.body
-        return monkey_object.Function(params, body, env)
+        return monkey_object.Function(params, body, env, node.name)
     elif isinstance(node, ast.IfExpression):
         return eval_if_expression(node, env)
     elif isinstance(node, ast.InfixExpression):
@@ -194,6 +199,16 @@ def is_truthy(obj):
 
 
 def eval_program(program, env):
+    try:
+        return eval_statements(program, env)
+    except monkey_object.MemoryQuotaExceeded as e:
+        return monkey_object.Error(str(e))
+    except RecursionError:
+        # Python's own stack runs out long before most max_call_depth limits
+        return monkey_object.Error("maximum recursion depth exceeded")
+
+
+def eval_statements(program, env):
     result = None
     for stmt in program.statements:
         result = eval_node(stmt, env)
@@ -252,6 +267,11 @@ def eval_infix_expression(operator, left, right):
         and right.type() == monkey_object.ObjectType.STRING
     ):
         return eval_string_infix_expression(operator, left, right)
+    elif operator not in ("==", "!=") and (
+        left.type() == monkey_object.ObjectType.INT_ARRAY
+        or right.type() == monkey_object.ObjectType.INT_ARRAY
+    ):
+        return eval_int_array_infix_expression(operator, left, right)
     elif operator == "==":
         return native_bool_to_boolean_object(left == right)
     elif operator == "!=":
@@ -274,7 +294,7 @@ def eval_integer_infix_expression(operator, left, right):
     elif operator == "*":
         return monkey_object.Integer(left.value * right.value)
     elif operator == "/":
-        return monkey_object.Integer(left.value / right.value)
+        return monkey_object.Integer(left.value // right.value)
     elif operator == "<":
         return native_bool_to_boolean_object(left.value < right.value)
     elif operator == ">":
@@ -295,6 +315,31 @@ def eval_string_infix_expression(operator, left, right):
     return monkey_object.String(left.value + right.value)
 
 
+def eval_int_array_infix_expression(operator, left, right):
+    operands = []
+    for operand in (left, right):
+        if isinstance(operand, monkey_object.IntArray):
+            operands.append(operand.values)
+        elif isinstance(operand, monkey_object.Integer):
+            operands.append(operand.value)
+        else:
+            return monkey_object.Error(
+                f"type mismatch: {left.type()} {operator} {right.type()}"
+            )
+    if operator not in ("+", "-", "*", "/"):
+        return monkey_object.Error(
+            f"unknown operator: {left.type()} {operator} {right.type()}"
+        )
+    try:
+        return monkey_object.IntArray(int_array.binary(operator, *operands))
+    except ZeroDivisionError:
+        return monkey_object.Error("division by zero")
+    except OverflowError:
+        return monkey_object.Error("integer overflow")
+    except ValueError as e:
+        return monkey_object.Error(str(e))
+
+
 def eval_bang_operator_expression(right):
     if right is TRUE:
         return FALSE
@@ -320,7 +365,7 @@ def eval_identifier(node, env):
         pass
 
     try:
-        return BUILTINS[node.value]
+        return monkey_builtins.BUILTINS[node.value]
     except KeyError:
         pass
 
@@ -339,14 +384,47 @@ def eval_expressions(exps, env):
 
 def apply_function(function, args):
     if isinstance(function, monkey_object.Function):
-        extended_env = extend_function_env(function, args)
-        evaluated = eval_node(function.body, extended_env)
-        return unwrap_return_value(evaluated)
+        if _hooks_active:
+            return call_function_with_hooks(function, args)
+        return call_function(function, args)
     elif isinstance(function, monkey_object.Builtin):
-        return function.fn(args)
+        result = function.fn(args)
+        if result is None:
+            return NULL
+        return result
     return monkey_object.Error(f"not a function: {function.type()}")
 
 
+def call_function_with_hooks(function, args):
+    meter = _meter.get()
+    profiler = _profiler.get()
+    tracer = _tracer.get()
+    if meter is not None:
+        error = meter.enter_call()
+        if error is not None:
+            meter.exit_call()
+            return error
+    if profiler is not None:
+        profiler.enter(function)
+    if tracer is not None:
+        tracer.enter(function)
+    try:
+        return call_function(function, args)
+    finally:
+        if tracer is not None:
+            tracer.exit()
+        if profiler is not None:
+            profiler.exit()
+        if meter is not None:
+            meter.exit_call()
+
+
+def call_function(function, args):
+    extended_env = extend_function_env(function, args)
+    evaluated = eval_node(function.body, extended_env)
+    return unwrap_return_value(evaluated)
+
+
 def extend_function_env(function, args):
     env = Environment(function.env)
 
@@ -368,6 +446,11 @@ def eval_index_expression(left, index):
         and index.type() == monkey_object.ObjectType.INTEGER
     ):
         return eval_array_index_expression(left, index)
+    elif (
+        left.type() == monkey_object.ObjectType.INT_ARRAY
+        and index.type() == monkey_object.ObjectType.INTEGER
+    ):
+        return eval_int_array_index_expression(left, index)
     elif left.type() == monkey_object.ObjectType.HASH:
         return eval_hash_index_expression(left, index)
     else:
@@ -383,6 +466,15 @@ def eval_array_index_expression(array, index):
     return array.elements[idx]
 
 
+def eval_int_array_index_expression(array, index):
+    idx = index.value
+    max = len(array.values) - 1
+    if idx < 0 or idx > max:
+        return NULL
+
+    return monkey_object.Integer(int_array.element(array.values, idx))
+
+
 def eval_hash_index_expression(hash, index):
     if not isinstance(index, monkey_object.Hashable):
         return monkey_object.Error(f"unusable as hash key: {index.type()}")
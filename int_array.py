@@ -0,0 +1,113 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INT64_MIN = -(2**63)
+
+
+def new(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.int64)
+    return array("q", values)
+
+
+def _has_zero(operand):
+    if isinstance(operand, int):
+        return operand == 0
+    if numpy is not None:
+        return bool((operand == 0).any())
+    return 0 in operand
+
+
+def _apply(fn, left, right):
+    if isinstance(left, int):
+        return array("q", (fn(left, r) for r in right))
+    if isinstance(right, int):
+        return array("q", (fn(a, right) for a in left))
+    return array("q", (fn(a, b) for a, b in zip(left, right)))
+
+
+def _overflowed(operator, left, right, result):
+    "Where `result`, computed in wrapping int64 arithmetic, is out of range."
+    if operator == "+":
+        return ((left ^ result) & (right ^ result)) < 0
+    elif operator == "-":
+        return ((left ^ right) & (left ^ result)) < 0
+    elif operator == "*":
+        nonzero = left != 0
+        divisor = numpy.where(nonzero, left, 1)
+        return nonzero & (
+            (result // divisor != right) | ((left == -1) & (right == INT64_MIN))
+        )
+    return (left == INT64_MIN) & (right == -1)
+
+
+def _numpy_binary(operator, left, right):
+    with numpy.errstate(all="ignore"):
+        if operator == "+":
+            result = numpy.add(left, right, dtype=numpy.int64)
+        elif operator == "-":
+            result = numpy.subtract(left, right, dtype=numpy.int64)
+        elif operator == "*":
+            result = numpy.multiply(left, right, dtype=numpy.int64)
+        elif operator == "/":
+            result = numpy.floor_divide(left, right, dtype=numpy.int64)
+        else:
+            raise ValueError(f"unknown operator: {operator}")
+        if numpy.any(_overflowed(operator, left, right, result)):
+            raise OverflowError("integer overflow")
+    return result
+
+
+def binary(operator, left, right):
+    "Either operand may be a plain int; the other must be array storage."
+    if not isinstance(left, int) and not isinstance(right, int):
+        if len(left) != len(right):
+            raise ValueError(f"length mismatch: {len(left)} vs {len(right)}")
+    if operator == "/" and _has_zero(right):
+        raise ZeroDivisionError("division by zero")
+
+    if numpy is not None:
+        return _numpy_binary(operator, left, right)
+    try:
+        if operator == "+":
+            return _apply(lambda a, b: a + b, left, right)
+        elif operator == "-":
+            return _apply(lambda a, b: a - b, left, right)
+        elif operator == "*":
+            return _apply(lambda a, b: a * b, left, right)
+        elif operator == "/":
+            return _apply(lambda a, b: a // b, left, right)
+    except OverflowError:
+        raise OverflowError("integer overflow")
+    raise ValueError(f"unknown operator: {operator}")
+
+
+def total(values):
+    "The exact sum, which may be outside the int64 range."
+    if numpy is not None:
+        wrapped = int(numpy.sum(values, dtype=numpy.int64))
+        # the int64 sum is exact modulo 2**64; a float sum is close enough
+        # to the true one to tell how many times it wrapped
+        approximate = float(numpy.sum(values, dtype=numpy.float64))
+        return wrapped + round((approximate - wrapped) / 2**64) * 2**64
+    return sum(values)
+
+
+def minimum(values):
+    if numpy is not None:
+        return int(numpy.min(values))
+    return min(values)
+
+
+def maximum(values):
+    if numpy is not None:
+        return int(numpy.max(values))
+    return max(values)
+
+
+def element(values, index):
+    return int(values[index])
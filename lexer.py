@@ -20,10 +20,15 @@ class Lexer:
         self.position = 0
         self.read_position = 0
         self.ch = "\0"
+        self.line = 1
+        self.line_start = 0
 
         self.read_char()
 
     def read_char(self):
+        if self.ch == "\n":
+            self.line += 1
+            self.line_start = self.read_position
         if self.read_position >= len(self.input):
             self.ch = "\0"
         else:
@@ -66,6 +71,8 @@ class Lexer:
         tok = Token(TokenType.Illegal, "")
 
         self.skip_whitespace()
+        line = self.line
+        column = self.position - self.line_start + 1
 
         if self.ch == "=":
             if self.peek_char() == "=":
@@ -116,11 +123,17 @@ class Lexer:
         elif is_letter(self.ch):
             tok.literal = self.read_identifier()
             tok.type = tokens.lookup_ident(tok.literal)
+            tok.line = line
+            tok.column = column
             return tok
         elif is_digit(self.ch):
             tok.literal = self.read_number()
             tok.type = TokenType.Num
+            tok.line = line
+            tok.column = column
             return tok
 
+        tok.line = line
+        tok.column = column
         self.read_char()
         return tok
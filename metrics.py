@@ -0,0 +1,228 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import os
+import tempfile
+import threading
+
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{n}="{escape_label(v)}"' for n, v in (*zip(names, values), *extra)]
+    if len(pairs) == 0:
+        return ""
+    return f"{{{','.join(pairs)}}}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[n] for n in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [bucket counts..., sum, count]
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels):
+        state = self._values.get(tuple(labels[n] for n in self.labelnames))
+        return 0 if state is None else state[-1]
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in values:
+            for bound, n in zip(self.buckets, state):
+                labels = format_labels(
+                    self.labelnames, key, [("le", format_value(bound))]
+                )
+                yield f"{self.name}_bucket{labels} {n}"
+            labels = format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {format_value(state[-2])}"
+            yield f"{self.name}_count{labels} {state[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = dict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def exposition(self):
+        "The registry's metrics in the Prometheus text format."
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class InterpreterMetrics:
+    "The counters and histograms fed by pipeline.run(metrics=...)."
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else Registry()
+        r = self.registry
+        self.scripts = r.counter(
+            "monkey_scripts_total", "Scripts run.", ["engine"]
+        )
+        self.phase_seconds = r.histogram(
+            "monkey_phase_seconds", "Wall time per pipeline phase.", ["phase"]
+        )
+        self.instructions = r.counter(
+            "monkey_vm_instructions_total", "VM instructions executed."
+        )
+        self.parse_errors = r.counter(
+            "monkey_parse_errors_total", "Scripts rejected by the parser."
+        )
+        self.compile_errors = r.counter(
+            "monkey_compile_errors_total", "Scripts rejected by the compiler."
+        )
+        self.runtime_errors = r.counter(
+            "monkey_runtime_errors_total", "Scripts that failed at run time.", ["engine"]
+        )
+
+    def record(self, stats):
+        "Account for one pipeline run, given its pipeline.Stats."
+        failed_phase = stats.failed_phase
+        self.scripts.inc(engine=stats.engine)
+        phases = [("lex", stats.lex_time), ("parse", stats.parse_time)]
+        if failed_phase != "parse":
+            if stats.engine == "vm":
+                phases.append(("compile", stats.compile_time))
+            if failed_phase != "compile":
+                phases.append(("run", stats.run_time))
+        for phase, seconds in phases:
+            self.phase_seconds.observe(seconds, phase=phase)
+        if stats.instructions_executed > 0:
+            self.instructions.inc(stats.instructions_executed)
+        if failed_phase == "parse":
+            self.parse_errors.inc()
+        elif failed_phase == "compile":
+            self.compile_errors.inc()
+        elif failed_phase == "run":
+            self.runtime_errors.inc(engine=stats.engine)
+
+
+def write_file(registry, path):
+    "Atomically replace `path`, e.g. for node_exporter's textfile collector."
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(registry.exposition())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def make_handler(registry):
+    "A request handler class serving the registry on GET /metrics."
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.exposition().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def serve(registry, host="127.0.0.1", port=9100):
+    "Serve the registry from a daemon thread; returns the server."
+    server = ThreadingHTTPServer((host, port), make_handler(registry))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -11,6 +11,25 @@ class Node(ABC):
         pass
 
 
+def walk(node):
+    "Yield `node` and every node below it."
+    pending = [node]
+    while len(pending) > 0:
+        n = pending.pop()
+        if n is None:
+            continue
+        yield n
+        for value in vars(n).values():
+            if isinstance(value, Node):
+                pending.append(value)
+            elif isinstance(value, list):
+                pending.extend(value)
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    pending.append(key)
+                    pending.append(item)
+
+
 class Expression(Node):
     pass
 
@@ -113,10 +132,12 @@ class InfixExpression(Expression):
 
 
 class FunctionLiteral(Expression):
-    def __init__(self, token, parameters, body):
+    def __init__(self, token, parameters, body, name=""):
         self.token = token
         self.parameters = parameters
         self.body = body
+        # the name of the let binding this literal is assigned to, if any
+        self.name = name
 
     def token_literal(self):
         return self.token.literal
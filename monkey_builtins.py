@@ -0,0 +1,186 @@
+"""
+The builtin functions shared by the evaluator and the VM. A builtin takes
+the list of its argument objects and returns an object, an Error, or None
+for null; each engine turns None into its own NULL.
+"""
+import int_array
+import monkey_object
+import output
+
+
+def monkey_len(args):
+    if len(args) != 1:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=1"
+        )
+
+    if isinstance(args[0], monkey_object.String):
+        return monkey_object.Integer(len(args[0].value))
+    elif isinstance(args[0], monkey_object.Array):
+        return monkey_object.Integer(len(args[0].elements))
+    elif isinstance(args[0], monkey_object.IntArray):
+        return monkey_object.Integer(len(args[0].values))
+    else:
+        return monkey_object.Error(
+            f"argument to `len` not supported, got {args[0].type()}"
+        )
+
+
+def monkey_first(args):
+    if len(args) != 1:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=1"
+        )
+
+    if not isinstance(args[0], monkey_object.Array):
+        return monkey_object.Error(
+            f"argument to `first` must be ARRAY, got {args[0].type()}"
+        )
+
+    arr = args[0]
+    if len(arr.elements) > 0:
+        return arr.elements[0]
+
+    return None
+
+
+def monkey_last(args):
+    if len(args) != 1:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=1"
+        )
+
+    if not isinstance(args[0], monkey_object.Array):
+        return monkey_object.Error(
+            f"argument to `first` must be ARRAY, got {args[0].type()}"
+        )
+
+    arr = args[0]
+    if len(arr.elements) > 0:
+        return arr.elements[-1]
+
+    return None
+
+
+def monkey_rest(args):
+    if len(args) != 1:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=1"
+        )
+    if args[0].type() != monkey_object.ObjectType.ARRAY:
+        return monkey_object.Error(
+            f"argument to `rest` must be ARRAY, got {args[0].type()}"
+        )
+    arr = args[0]
+    length = len(arr.elements)
+    if length > 0:
+        new_elements = arr.elements[1:length]
+        return monkey_object.Array(new_elements)
+
+    return None
+
+
+def monkey_push(args):
+    if len(args) != 2:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=2"
+        )
+    if args[0].type() != monkey_object.ObjectType.ARRAY:
+        return monkey_object.Error(
+            f"argument to `push` must be ARRAY, got {args[0].type()}"
+        )
+    arr = args[0]
+    new_elements = [*arr.elements, args[1]]
+    return monkey_object.Array(new_elements)
+
+
+def monkey_puts(args):
+    sink = output.current()
+    for arg in args:
+        sink.write(arg.inspect())
+    return None
+
+
+def monkey_int_array(args):
+    if len(args) != 1:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=1"
+        )
+    if not isinstance(args[0], monkey_object.Array):
+        return monkey_object.Error(
+            f"argument to `int_array` must be ARRAY, got {args[0].type()}"
+        )
+    values = []
+    for e in args[0].elements:
+        if not isinstance(e, monkey_object.Integer):
+            return monkey_object.Error(
+                f"elements of `int_array` must be INTEGER, got {e.type()}"
+            )
+        values.append(e.value)
+    try:
+        return monkey_object.IntArray(int_array.new(values))
+    except OverflowError:
+        return monkey_object.Error("integer overflow")
+
+
+def monkey_slice(args):
+    if len(args) != 3:
+        return monkey_object.Error(
+            f"wrong number of arguments. got={len(args)}, want=3"
+        )
+    if (
+        args[1].type() != monkey_object.ObjectType.INTEGER
+        or args[2].type() != monkey_object.ObjectType.INTEGER
+    ):
+        return monkey_object.Error(
+            f"bounds of `slice` must be INTEGER, got {args[1].type()}, {args[2].type()}"
+        )
+    start = args[1].value
+    end = args[2].value
+    if isinstance(args[0], monkey_object.IntArray):
+        return monkey_object.IntArray(args[0].values[start:end])
+    elif isinstance(args[0], monkey_object.Array):
+        return monkey_object.Array(args[0].elements[start:end])
+    return monkey_object.Error(
+        f"argument to `slice` not supported, got {args[0].type()}"
+    )
+
+
+def _int_array_reduction(name, reduce):
+    def builtin(args):
+        if len(args) != 1:
+            return monkey_object.Error(
+                f"wrong number of arguments. got={len(args)}, want=1"
+            )
+        if not isinstance(args[0], monkey_object.IntArray):
+            return monkey_object.Error(
+                f"argument to `{name}` must be INT_ARRAY, got {args[0].type()}"
+            )
+        if len(args[0].values) == 0:
+            return None
+        return monkey_object.Integer(reduce(args[0].values))
+
+    return builtin
+
+
+monkey_sum = _int_array_reduction("sum", int_array.total)
+monkey_min = _int_array_reduction("min", int_array.minimum)
+monkey_max = _int_array_reduction("max", int_array.maximum)
+
+
+# in the order of the compiler's GET_BUILTIN indexes
+BUILTINS = {
+    "len": monkey_object.Builtin(monkey_len),
+    "first": monkey_object.Builtin(monkey_first),
+    "last": monkey_object.Builtin(monkey_last),
+    "rest": monkey_object.Builtin(monkey_rest),
+    "push": monkey_object.Builtin(monkey_push),
+    "puts": monkey_object.Builtin(monkey_puts),
+    "int_array": monkey_object.Builtin(monkey_int_array),
+    "slice": monkey_object.Builtin(monkey_slice),
+    "sum": monkey_object.Builtin(monkey_sum),
+    "min": monkey_object.Builtin(monkey_min),
+    "max": monkey_object.Builtin(monkey_max),
+}
+
+BUILTIN_LIST = list(BUILTINS.values())
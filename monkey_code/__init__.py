@@ -32,6 +32,46 @@ class Opcode(IntEnum):
     GET_GLOBAL = auto()
     SET_GLOBAL = auto()
 
+    CALL = auto()
+    RETURN_VALUE = auto()
+    RETURN = auto()
+
+    GET_LOCAL = auto()
+    SET_LOCAL = auto()
+
+    CLOSURE = auto()
+    GET_FREE = auto()
+    CURRENT_CLOSURE = auto()
+
+    ARRAY = auto()
+    HASH = auto()
+    INDEX = auto()
+
+    GET_BUILTIN = auto()
+
+    # superinstructions, each doing the work of the two opcodes in its name;
+    # see monkey_compiler.fusion
+    GET_LOCAL_CONSTANT = auto()
+    GET_GLOBAL_CONSTANT = auto()
+    CONSTANT_SET_GLOBAL = auto()
+    GREATER_THAN_JUMP_NOT_TRUTHY = auto()
+    EQUAL_JUMP_NOT_TRUTHY = auto()
+
+    # arithmetic on operands the compiler proved to be integers
+    ADD_INT = auto()
+    SUB_INT = auto()
+    MUL_INT = auto()
+    DIV_INT = auto()
+
+    # one-byte operand forms, picked by `narrowest`
+    CONSTANT_SHORT = auto()
+    GET_GLOBAL_SHORT = auto()
+    SET_GLOBAL_SHORT = auto()
+    JUMP_SHORT = auto()
+    JUMP_NOT_TRUTHY_SHORT = auto()
+    # pushes its operand, 0-255, as an Integer without a constant
+    PUSH_SMALL_INT = auto()
+
 
 @dataclass
 class Definition:
@@ -77,6 +117,8 @@ class Instructions:
             return d.name
         elif operand_count == 1:
             return f"{d.name} {operands[0]}"
+        elif operand_count == 2:
+            return f"{d.name} {operands[0]} {operands[1]}"
         return f"ERROR: unhandled operand_count for {d.name}\n"
 
 
@@ -99,6 +141,43 @@ _definitions = {
     Opcode.JUMP: Definition("OpJump", [2]),
     Opcode.GET_GLOBAL: Definition("OpGetGlobal", [2]),
     Opcode.SET_GLOBAL: Definition("OpSetGlobal", [2]),
+    Opcode.CALL: Definition("OpCall", [1]),
+    Opcode.RETURN_VALUE: Definition("OpReturnValue", []),
+    Opcode.RETURN: Definition("OpReturn", []),
+    Opcode.GET_LOCAL: Definition("OpGetLocal", [1]),
+    Opcode.SET_LOCAL: Definition("OpSetLocal", [1]),
+    Opcode.CLOSURE: Definition("OpClosure", [2, 1]),
+    Opcode.GET_FREE: Definition("OpGetFree", [1]),
+    Opcode.CURRENT_CLOSURE: Definition("OpCurrentClosure", []),
+    Opcode.ARRAY: Definition("OpArray", [2]),
+    Opcode.HASH: Definition("OpHash", [2]),
+    Opcode.INDEX: Definition("OpIndex", []),
+    Opcode.GET_BUILTIN: Definition("OpGetBuiltin", [1]),
+    Opcode.GET_LOCAL_CONSTANT: Definition("OpGetLocalConstant", [1, 2]),
+    Opcode.GET_GLOBAL_CONSTANT: Definition("OpGetGlobalConstant", [2, 2]),
+    Opcode.CONSTANT_SET_GLOBAL: Definition("OpConstantSetGlobal", [2, 2]),
+    Opcode.GREATER_THAN_JUMP_NOT_TRUTHY: Definition(
+        "OpGreaterThanJumpNotTruthy", [2]
+    ),
+    Opcode.EQUAL_JUMP_NOT_TRUTHY: Definition("OpEqualJumpNotTruthy", [2]),
+    Opcode.ADD_INT: Definition("OpAddInt", []),
+    Opcode.SUB_INT: Definition("OpSubInt", []),
+    Opcode.MUL_INT: Definition("OpMulInt", []),
+    Opcode.DIV_INT: Definition("OpDivInt", []),
+    Opcode.CONSTANT_SHORT: Definition("OpConstantShort", [1]),
+    Opcode.GET_GLOBAL_SHORT: Definition("OpGetGlobalShort", [1]),
+    Opcode.SET_GLOBAL_SHORT: Definition("OpSetGlobalShort", [1]),
+    Opcode.JUMP_SHORT: Definition("OpJumpShort", [1]),
+    Opcode.JUMP_NOT_TRUTHY_SHORT: Definition("OpJumpNotTruthyShort", [1]),
+    Opcode.PUSH_SMALL_INT: Definition("OpPushSmallInt", [1]),
+}
+
+SHORT_FORMS = {
+    Opcode.CONSTANT: Opcode.CONSTANT_SHORT,
+    Opcode.GET_GLOBAL: Opcode.GET_GLOBAL_SHORT,
+    Opcode.SET_GLOBAL: Opcode.SET_GLOBAL_SHORT,
+    Opcode.JUMP: Opcode.JUMP_SHORT,
+    Opcode.JUMP_NOT_TRUTHY: Opcode.JUMP_NOT_TRUTHY_SHORT,
 }
 
 
@@ -107,6 +186,14 @@ def lookup(op: int):
     return _definitions[Opcode(op)]
 
 
+def narrowest(op: Opcode, *operands):
+    "The one-byte form of `op` if it has one and all `operands` fit, else `op`."
+    short = SHORT_FORMS.get(op)
+    if short is not None and all(0 <= o <= 0xFF for o in operands):
+        return short
+    return op
+
+
 def make(op: Opcode, *operands):
     try:
         d = _definitions[op]
@@ -120,6 +207,8 @@ def make(op: Opcode, *operands):
     for w, o in zip(d.operand_widths, operands):
         if w == 2:
             instruction[offset : offset + 2] = pack(">H", o)
+        elif w == 1:
+            instruction[offset : offset + 1] = pack(">B", o)
         offset += w
     return bytearray(instruction)
 
@@ -130,9 +219,26 @@ def read_operands(d: Definition, ins: Instructions):
     for i, width in enumerate(d.operand_widths):
         if width == 2:
             operands[i] = read_uint16(bytearray(ins[offset : offset + 2]))
+        elif width == 1:
+            operands[i] = read_uint8(ins[offset : offset + 1])
         offset += width
     return operands, offset
 
 
+def walk(ins: bytes):
+    "Yield (offset, opcode, operands) for every instruction in `ins`."
+    i = 0
+    while i < len(ins):
+        d = lookup(ins[i])
+        width = sum(d.operand_widths)
+        operands, _ = read_operands(d, ins[i + 1 : i + 1 + width])
+        yield i, Opcode(ins[i]), operands
+        i += 1 + width
+
+
 def read_uint16(ins: bytearray):
     return struct.unpack(">H", ins)[0]
+
+
+def read_uint8(ins: bytearray):
+    return ins[0]
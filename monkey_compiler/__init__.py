@@ -1,14 +1,23 @@
-from dataclasses import dataclass
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
 from monkey_code import Opcode
-from typing import List, Dict
+from typing import Any, Dict, List, Optional, Tuple
+import struct
+import sys
+from monkey_compiler import cfg, compact, fusion
 import monkey_ast as ast
+import monkey_builtins
 import monkey_code as code
 import monkey_object
 
 
 class SymbolScope(Enum):
     GLOBAL = auto()
+    LOCAL = auto()
+    FREE = auto()
+    FUNCTION = auto()
+    BUILTIN = auto()
 
 
 @dataclass
@@ -16,25 +25,81 @@ class Symbol:
     name: str
     scope: SymbolScope
     index: int
+    # the type of every value bound to the symbol, if the compiler proved one
+    static_type: Optional[monkey_object.ObjectType] = field(
+        default=None, compare=False
+    )
 
 
 @dataclass(init=False)
 class SymbolTable:
+    outer: Optional["SymbolTable"]
+    # the symbols of enclosing functions this function captures, in order
+    free_symbols: List[Symbol]
     _store: Dict[str, Symbol]
     _num_definitions: int
 
-    def __init__(self):
+    def __init__(self, outer: Optional["SymbolTable"] = None):
+        self.outer = outer
+        self.free_symbols = []
         self._store = dict()
         self._num_definitions = 0
 
+    @property
+    def num_definitions(self):
+        return self._num_definitions
+
     def define(self, name: str):
-        symbol = Symbol(name, SymbolScope.GLOBAL, self._num_definitions)
+        scope = SymbolScope.GLOBAL if self.outer is None else SymbolScope.LOCAL
+        symbol = Symbol(name, scope, self._num_definitions)
         self._store[name] = symbol
         self._num_definitions += 1
         return symbol
 
+    def define_builtin(self, index: int, name: str):
+        symbol = Symbol(name, SymbolScope.BUILTIN, index)
+        self._store[name] = symbol
+        return symbol
+
+    def define_function_name(self, name: str):
+        symbol = Symbol(name, SymbolScope.FUNCTION, 0)
+        self._store[name] = symbol
+        return symbol
+
+    def _define_free(self, original: Symbol):
+        self.free_symbols.append(original)
+        symbol = Symbol(
+            original.name,
+            SymbolScope.FREE,
+            len(self.free_symbols) - 1,
+            original.static_type,
+        )
+        self._store[original.name] = symbol
+        return symbol
+
     def resolve(self, name: str):
-        return self._store[name]
+        """
+        Note: this throws a KeyError on unknown input. A local of an enclosing
+        function resolves to a FREE symbol, captured by every function in
+        between.
+        """
+        symbol = self._store.get(name)
+        if symbol is not None:
+            return symbol
+        if self.outer is None:
+            raise KeyError(name)
+        symbol = self.outer.resolve(name)
+        if symbol.scope in (SymbolScope.GLOBAL, SymbolScope.BUILTIN):
+            return symbol
+        return self._define_free(symbol)
+
+
+def new_symbol_table():
+    "A global SymbolTable with every builtin defined."
+    table = SymbolTable()
+    for i, name in enumerate(monkey_builtins.BUILTINS):
+        table.define_builtin(i, name)
+    return table
 
 
 @dataclass
@@ -43,53 +108,282 @@ class EmittedInstruction:
     position: int
 
 
+@dataclass
+class CompilationScope:
+    instructions: bytearray = field(default_factory=bytearray)
+    last_instruction: EmittedInstruction = field(
+        default_factory=lambda: EmittedInstruction(Opcode.CONSTANT, 0)
+    )
+    previous_instruction: EmittedInstruction = field(
+        default_factory=lambda: EmittedInstruction(Opcode.CONSTANT, 0)
+    )
+    # (offset, line) pairs; each line applies until the next pair's offset
+    positions: List[Tuple[int, int]] = field(default_factory=list)
+
+
+@dataclass
+class OptimizationReport:
+    "The instructions `Compiler(optimize=True)` left out, by rewrite."
+    folded: int = 0
+    bang_pairs: int = 0
+    branches: int = 0
+    # unreachable instructions and jumps to the next one; see cfg.optimize
+    dead_code: int = 0
+    # jumps retargeted past other jumps, and arithmetic turned into *_INT
+    # opcodes; neither removes instructions
+    threaded: int = 0
+    specialized: int = 0
+    # pairs of instructions turned into one superinstruction
+    fused: int = 0
+
+    @property
+    def instructions_removed(self):
+        return (
+            self.folded + self.bang_pairs + self.branches + self.dead_code + self.fused
+        )
+
+    def __str__(self):
+        return (
+            f"{self.instructions_removed} instructions removed: "
+            f"{self.folded} by constant folding, {self.bang_pairs} in BANG pairs, "
+            f"{self.branches} in constant branches, {self.dead_code} as dead code, "
+            f"{self.fused} by fusion; {self.threaded} jumps threaded, "
+            f"{self.specialized} integer operations specialized"
+        )
+
+
+def _is_truthy(obj: monkey_object.Object):
+    if isinstance(obj, monkey_object.Boolean):
+        return obj.value
+    return not isinstance(obj, monkey_object.Null)
+
+
+def _fold_infix(operator: str, left: monkey_object.Object, right: monkey_object.Object):
+    Integer = monkey_object.Integer
+    Boolean = monkey_object.Boolean
+    if isinstance(left, Integer) and isinstance(right, Integer):
+        if operator == "+":
+            return Integer(left.value + right.value)
+        elif operator == "-":
+            return Integer(left.value - right.value)
+        elif operator == "*":
+            return Integer(left.value * right.value)
+        elif operator == "/" and right.value != 0:
+            return Integer(left.value // right.value)
+        elif operator == "<":
+            return Boolean(left.value < right.value)
+        elif operator == ">":
+            return Boolean(left.value > right.value)
+        elif operator == "==":
+            return Boolean(left.value == right.value)
+        elif operator == "!=":
+            return Boolean(left.value != right.value)
+    elif isinstance(left, Boolean) and isinstance(right, Boolean):
+        if operator == "==":
+            return Boolean(left.value == right.value)
+        elif operator == "!=":
+            return Boolean(left.value != right.value)
+    elif isinstance(left, monkey_object.String) and isinstance(
+        right, monkey_object.String
+    ):
+        if operator == "+":
+            return monkey_object.String(left.value + right.value)
+    return None
+
+
+def fold_constant(node: ast.Node):
+    """
+    The value of `node` if it is a compile-time constant, else None.
+    Anything the VM would reject at runtime, like dividing by zero, is left
+    unfolded so that it still fails there.
+    """
+    if isinstance(node, ast.IntegerLiteral):
+        return monkey_object.Integer(node.value)
+    elif isinstance(node, ast.Boolean):
+        return monkey_object.Boolean(node.value)
+    elif isinstance(node, ast.StringLiteral):
+        return monkey_object.String(node.value)
+    elif isinstance(node, ast.PrefixExpression):
+        right = fold_constant(node.right)
+        if right is None:
+            return None
+        if node.operator == "!":
+            return monkey_object.Boolean(not _is_truthy(right))
+        if node.operator == "-" and isinstance(right, monkey_object.Integer):
+            return monkey_object.Integer(-right.value)
+    elif isinstance(node, ast.InfixExpression):
+        left = fold_constant(node.left)
+        if left is None:
+            return None
+        right = fold_constant(node.right)
+        if right is None:
+            return None
+        return _fold_infix(node.operator, left, right)
+    return None
+
+
+def _is_boolean_valued(node: ast.Node):
+    "Whether `node` always evaluates to TRUE or FALSE, if it succeeds."
+    if isinstance(node, ast.Boolean):
+        return True
+    elif isinstance(node, ast.PrefixExpression):
+        return node.operator == "!"
+    elif isinstance(node, ast.InfixExpression):
+        return node.operator in ("<", ">", "==", "!=")
+    return False
+
+
+def _node_count(node: ast.Node):
+    return sum(1 for _ in ast.walk(node))
+
+
+def _constant_key(obj: monkey_object.Object):
+    "The key equal literals share in the constant pool, or None for functions."
+    if isinstance(obj, (monkey_object.Integer, monkey_object.String)):
+        return (type(obj), obj.value)
+    return None
+
+
 @dataclass(init=False)
 class Compiler:
-    _instructions: bytearray
     _constants: List[monkey_object.Object]
-    _last_instruction: EmittedInstruction
-    _previous_instruction: EmittedInstruction
+    # the index of every literal in _constants, by _constant_key
+    _constant_indexes: Dict[Tuple[type, Any], int]
     _symbol_table: SymbolTable
+    # one scope per function being compiled, innermost last
+    _scopes: List[CompilationScope]
+    _line: int
+    _optimize: bool
+    _superinstructions: bool
+    _compact: bool
+    # _static_type's answers for operator expressions in the program being
+    # compiled, by node id
+    _static_types: Dict[int, Optional[monkey_object.ObjectType]]
+    report: OptimizationReport
 
-    def __init__(self):
-        self._instructions = bytearray([])
+    def __init__(
+        self,
+        optimize: bool = False,
+        superinstructions: bool = False,
+        compact: bool = False,
+    ):
+        """
+        With `optimize`, constant subexpressions are folded, `!!` is dropped
+        where it cannot change the result, branches on a constant condition
+        are left out, arithmetic on proven integers uses the *_INT opcodes,
+        and every function and the program go through `cfg.optimize`;
+        `report` counts what that saved. With
+        `superinstructions`, common instruction pairs are fused last; see
+        `fusion.FUSIONS`. With `compact`, instructions are finally encoded
+        in their narrowest forms; see `compact.compact`.
+        """
+        self._optimize = optimize
+        self._superinstructions = superinstructions
+        self._compact = compact
+        self._static_types = {}
+        self.report = OptimizationReport()
         self._constants = []
-        self._last_instruction = EmittedInstruction(Opcode.CONSTANT, 0)
-        self._previous_instruction = EmittedInstruction(Opcode.CONSTANT, 0)
-        self._symbol_table = SymbolTable()
+        self._constant_indexes = {}
+        self._symbol_table = new_symbol_table()
+        self._scopes = [CompilationScope()]
+        self._line = 0
+
+    @classmethod
+    def new_with_state(
+        cls,
+        symbol_table: SymbolTable,
+        constants: List[monkey_object.Object],
+        optimize: bool = False,
+        superinstructions: bool = False,
+        compact: bool = False,
+    ):
+        """
+        A compiler that carries on from earlier ones, like the REPL's lines:
+        it defines globals in `symbol_table` (see `new_symbol_table`) and
+        appends to `constants`, reusing the literals already there.
+        """
+        compiler = cls(optimize, superinstructions, compact)
+        compiler._symbol_table = symbol_table
+        compiler._constants = constants
+        for i, obj in enumerate(constants):
+            key = _constant_key(obj)
+            if key is not None:
+                compiler._constant_indexes.setdefault(key, i)
+        return compiler
+
+    @property
+    def _scope(self):
+        return self._scopes[-1]
+
+    @property
+    def _instructions(self):
+        return self._scope.instructions
+
+    def _enter_scope(self):
+        self._scopes.append(CompilationScope())
+        self._symbol_table = SymbolTable(self._symbol_table)
+
+    def _leave_scope(self):
+        scope = self._scopes.pop()
+        self._symbol_table = self._symbol_table.outer
+        return scope
 
     def _add_constant(self, obj: monkey_object.Object):
+        "Equal integer and string literals share one constant."
+        key = _constant_key(obj)
+        if key is not None:
+            index = self._constant_indexes.get(key)
+            if index is not None:
+                return index
+            self._constant_indexes[key] = len(self._constants)
         self._constants.append(obj)
         return len(self._constants) - 1
 
     def _set_last_instruction(self, op: Opcode, pos: int):
-        previous = self._last_instruction
-        last = EmittedInstruction(op, pos)
-        self._previous_instruction = previous
-        self._last_instruction = last
+        scope = self._scope
+        scope.previous_instruction = scope.last_instruction
+        scope.last_instruction = EmittedInstruction(op, pos)
 
     def _emit(self, op: Opcode, *operands):
-        ins = code.make(op, *operands)
+        try:
+            ins = code.make(op, *operands)
+        except struct.error:
+            raise RuntimeError(f"operands {list(operands)} out of range for {op.name}")
         pos = self._add_instruction(ins)
 
         self._set_last_instruction(op, pos)
+        self._record_position(pos)
 
         return pos
 
     def _add_instruction(self, ins: List[int]):
         pos_new_instruction = len(self._instructions)
-        ins_lst = list(self._instructions)
-        ins_lst.extend(ins)
-        self._instructions = bytearray(ins_lst)
+        self._instructions.extend(ins)
 
         return pos_new_instruction
 
-    def _last_instruction_is_pop(self):
-        return self._last_instruction.opcode == Opcode.POP
+    def _record_position(self, pos: int):
+        positions = self._scope.positions
+        if len(positions) > 0 and positions[-1][1] == self._line:
+            return
+        if len(positions) > 0 and positions[-1][0] == pos:
+            positions.pop()
+        positions.append((pos, self._line))
+
+    def _last_instruction_is(self, op: Opcode):
+        if len(self._instructions) == 0:
+            return False
+        return self._scope.last_instruction.opcode == op
 
     def _remove_last_pop(self):
-        self._instructions = self._instructions[: self._last_instruction.position]
-        self._last_instruction = self._previous_instruction
+        scope = self._scope
+        del scope.instructions[scope.last_instruction.position :]
+        scope.last_instruction = scope.previous_instruction
+        while (
+            len(scope.positions) > 0
+            and scope.positions[-1][0] >= len(scope.instructions)
+        ):
+            scope.positions.pop()
 
     def _replace_instruction(self, pos: int, new_instruction: bytearray):
         self._instructions[pos: pos + len(new_instruction)] = new_instruction
@@ -99,10 +393,189 @@ class Compiler:
         new_instruction = code.make(op, operand)
         self._replace_instruction(op_pos, new_instruction)
 
+    def _replace_last_pop_with_return(self):
+        last_pos = self._scope.last_instruction.position
+        self._replace_instruction(last_pos, code.make(Opcode.RETURN_VALUE))
+        self._scope.last_instruction.opcode = Opcode.RETURN_VALUE
+
+    def _emit_constant_value(self, obj: monkey_object.Object):
+        if isinstance(obj, monkey_object.Boolean):
+            self._emit(Opcode.TRUE if obj.value else Opcode.FALSE)
+        else:
+            self._emit(Opcode.CONSTANT, self._add_constant(obj))
+
+    def _compile_dead(self, node):
+        """
+        Compile the branch `node` only for its definitions, so that code
+        after it resolves the same names, and return how many instructions it
+        would have taken.
+        """
+        num_constants = len(self._constants)
+        # rewrites of functions inside the branch are thrown away with it
+        report = replace(self.report)
+        self._scopes.append(CompilationScope())
+        try:
+            self.compile(node)
+        finally:
+            scope = self._scopes.pop()
+            self.report = report
+            for obj in self._constants[num_constants:]:
+                self._constant_indexes.pop(_constant_key(obj), None)
+            del self._constants[num_constants:]
+        count = sum(1 for _ in code.walk(scope.instructions))
+        if len(scope.instructions) > 0 and scope.last_instruction.opcode == Opcode.POP:
+            # a live branch loses its final POP too
+            count -= 1
+        return count
+
+    def _compile_branch(self, node):
+        self.compile(node)
+        if self._last_instruction_is(Opcode.POP):
+            self._remove_last_pop()
+
+    def _optimize_if(self, node: ast.IfExpression):
+        "Compile `node` without its condition if that is constant."
+        condition = node.condition
+        pairs = 0
+        while (
+            isinstance(condition, ast.PrefixExpression)
+            and condition.operator == "!"
+            and isinstance(condition.right, ast.PrefixExpression)
+            and condition.right.operator == "!"
+        ):
+            condition = condition.right.right
+            pairs += 1
+        value = fold_constant(condition)
+        if value is None:
+            if pairs == 0:
+                return False
+            node = ast.IfExpression(
+                node.token, condition, node.consequence, node.alternative
+            )
+            self.report.bang_pairs += 2 * pairs
+            self._compile_node(node)
+            return True
+        live, dead = node.consequence, node.alternative
+        if not _is_truthy(value):
+            live, dead = dead, live
+        if live is not None and len(live.statements) == 0:
+            # an empty block leaves nothing on the stack; keep the jumps
+            return False
+        # the condition, JUMP_NOT_TRUTHY and JUMP
+        removed = 2 * pairs + _node_count(condition) + 2
+        if dead is None:
+            removed += 1
+        else:
+            removed += self._compile_dead(dead)
+        if live is None:
+            self._emit(Opcode.NULL)
+        else:
+            self._compile_branch(live)
+        self.report.branches += removed
+        return True
+
+    def _static_type(self, node: ast.Node):
+        """
+        The type `node` always evaluates to, if it succeeds, or None when that
+        is unknown. Only integers are tracked: literals, arithmetic on
+        integers and symbols only ever bound to integers. A let binds its
+        symbol exactly once, so its value's type is the symbol's.
+        """
+        if isinstance(node, ast.IntegerLiteral):
+            return monkey_object.ObjectType.INTEGER
+        elif isinstance(node, ast.Identifier):
+            try:
+                return self._symbol_table.resolve(node.value).static_type
+            except KeyError:
+                return None
+        elif not isinstance(node, (ast.PrefixExpression, ast.InfixExpression)):
+            return None
+        key = id(node)
+        if key in self._static_types:
+            return self._static_types[key]
+        static_type = None
+        if isinstance(node, ast.PrefixExpression):
+            if node.operator == "-":
+                static_type = self._static_type(node.right)
+        elif node.operator in ("+", "-", "*", "/"):
+            left = self._static_type(node.left)
+            if left is not None and left == self._static_type(node.right):
+                static_type = left
+        if static_type != monkey_object.ObjectType.INTEGER:
+            static_type = None
+        self._static_types[key] = static_type
+        return static_type
+
+    def _arithmetic(self, node: ast.InfixExpression, generic: Opcode, integer: Opcode):
+        if self._optimize and self._static_type(node) is not None:
+            self.report.specialized += 1
+            self._emit(integer)
+        else:
+            self._emit(generic)
+
+    def _rewrites(self):
+        return self._optimize or self._superinstructions or self._compact
+
+    def _rewrite(self, instructions: bytes, positions: List[Tuple[int, int]]):
+        "Run the bytecode passes turned on for this compiler."
+        if self._optimize:
+            optimized = cfg.optimize(instructions, positions)
+            self.report.dead_code += optimized.removed
+            self.report.threaded += optimized.threaded
+            instructions, positions = optimized.instructions, optimized.positions
+        if self._superinstructions:
+            fused = fusion.fuse(instructions, positions)
+            self.report.fused += fused.removed
+            instructions, positions = fused.instructions, fused.positions
+        if self._compact:
+            compacted = compact.compact(instructions, positions, self._constants)
+            instructions, positions = compacted.instructions, compacted.positions
+        return instructions, positions
+
     def compile(self, node):
+        token = getattr(node, "token", None)
+        if token is None or token.line == 0:
+            self._compile_node(node)
+            return
+        line = self._line
+        self._line = token.line
+        try:
+            self._compile_node(node)
+        finally:
+            self._line = line
+
+    def _compile_node(self, node):
+        if self._optimize and isinstance(
+            node, (ast.PrefixExpression, ast.InfixExpression)
+        ):
+            value = fold_constant(node)
+            if value is not None:
+                self._emit_constant_value(value)
+                self.report.folded += _node_count(node) - 1
+                return
+            if (
+                node.operator == "!"
+                and isinstance(node.right, ast.PrefixExpression)
+                and node.right.operator == "!"
+                and _is_boolean_valued(node.right.right)
+            ):
+                self.report.bang_pairs += 2
+                self.compile(node.right.right)
+                return
+        if self._optimize and isinstance(node, ast.IfExpression):
+            if self._optimize_if(node):
+                return
         if isinstance(node, ast.Program):
+            # node ids from an earlier program may have been reused
+            self._static_types.clear()
             for s in node.statements:
                 self.compile(s)
+            if self._rewrites():
+                scope = self._scope
+                instructions, scope.positions = self._rewrite(
+                    scope.instructions, scope.positions
+                )
+                scope.instructions[:] = instructions
         elif isinstance(node, ast.BlockStatement):
             for s in node.statements:
                 self.compile(s)
@@ -112,13 +585,21 @@ class Compiler:
         elif isinstance(node, ast.LetStatement):
             self.compile(node.value)
             symbol = self._symbol_table.define(node.name.value)
-            self._emit(Opcode.SET_GLOBAL, symbol.index)
+            if self._optimize:
+                symbol.static_type = self._static_type(node.value)
+            if symbol.scope == SymbolScope.GLOBAL:
+                self._emit(Opcode.SET_GLOBAL, symbol.index)
+            else:
+                self._emit(Opcode.SET_LOCAL, symbol.index)
+        elif isinstance(node, ast.ReturnStatement):
+            self.compile(node.return_value)
+            self._emit(Opcode.RETURN_VALUE)
         elif isinstance(node, ast.IfExpression):
             self.compile(node.condition)
             # this jump offset is bogus.
             jump_not_truthy_pos = self._emit(Opcode.JUMP_NOT_TRUTHY, 9999)
             self.compile(node.consequence)
-            if self._last_instruction_is_pop():
+            if self._last_instruction_is(Opcode.POP):
                 self._remove_last_pop()
             jump_pos = self._emit(Opcode.JUMP, 9999)
             after_consequence_pos = len(self._instructions)
@@ -127,7 +608,7 @@ class Compiler:
                 self._emit(Opcode.NULL)
             else:
                 self.compile(node.alternative)
-                if self._last_instruction_is_pop():
+                if self._last_instruction_is(Opcode.POP):
                     self._remove_last_pop()
             after_alternative_pos = len(self._instructions)
             self._change_operand(jump_pos, after_alternative_pos)
@@ -140,13 +621,13 @@ class Compiler:
             self.compile(node.left)
             self.compile(node.right)
             if node.operator == "+":
-                self._emit(Opcode.ADD)
+                self._arithmetic(node, Opcode.ADD, Opcode.ADD_INT)
             elif node.operator == "-":
-                self._emit(Opcode.SUB)
+                self._arithmetic(node, Opcode.SUB, Opcode.SUB_INT)
             elif node.operator == "*":
-                self._emit(Opcode.MUL)
+                self._arithmetic(node, Opcode.MUL, Opcode.MUL_INT)
             elif node.operator == "/":
-                self._emit(Opcode.DIV)
+                self._arithmetic(node, Opcode.DIV, Opcode.DIV_INT)
             elif node.operator == ">":
                 self._emit(Opcode.GREATER_THAN)
             elif node.operator == "==":
@@ -166,6 +647,22 @@ class Compiler:
         elif isinstance(node, ast.IntegerLiteral):
             integer = monkey_object.Integer(node.value)
             self._emit(Opcode.CONSTANT, self._add_constant(integer))
+        elif isinstance(node, ast.StringLiteral):
+            string = monkey_object.String(node.value)
+            self._emit(Opcode.CONSTANT, self._add_constant(string))
+        elif isinstance(node, ast.ArrayLiteral):
+            for element in node.elements:
+                self.compile(element)
+            self._emit(Opcode.ARRAY, len(node.elements))
+        elif isinstance(node, ast.HashLiteral):
+            for key, value in node.pairs.items():
+                self.compile(key)
+                self.compile(value)
+            self._emit(Opcode.HASH, len(node.pairs) * 2)
+        elif isinstance(node, ast.IndexExpression):
+            self.compile(node.left)
+            self.compile(node.index)
+            self._emit(Opcode.INDEX)
         elif isinstance(node, ast.Boolean):
             if node.value:
                 self._emit(Opcode.TRUE)
@@ -177,13 +674,75 @@ class Compiler:
             except KeyError:
                 raise RuntimeError(f"undefined variable {node.value}")
 
+            self._load_symbol(symbol)
+        elif isinstance(node, ast.FunctionLiteral):
+            self._enter_scope()
+            if node.name != "":
+                self._symbol_table.define_function_name(node.name)
+            for parameter in node.parameters:
+                self._symbol_table.define(parameter.value)
+            self.compile(node.body)
+            if self._last_instruction_is(Opcode.POP):
+                self._replace_last_pop_with_return()
+            if not self._last_instruction_is(Opcode.RETURN_VALUE):
+                self._emit(Opcode.RETURN)
+            free_symbols = self._symbol_table.free_symbols
+            num_locals = self._symbol_table.num_definitions
+            scope = self._leave_scope()
+            instructions, positions = bytes(scope.instructions), scope.positions
+            if self._rewrites():
+                instructions, positions = self._rewrite(instructions, positions)
+            for symbol in free_symbols:
+                self._load_symbol(symbol)
+            function = monkey_object.CompiledFunction(
+                instructions,
+                num_locals,
+                len(node.parameters),
+                positions,
+                node.name,
+            )
+            self._emit(
+                Opcode.CLOSURE, self._add_constant(function), len(free_symbols)
+            )
+        elif isinstance(node, ast.CallExpression):
+            self.compile(node.function)
+            for argument in node.arguments:
+                self.compile(argument)
+            self._emit(Opcode.CALL, len(node.arguments))
+
+    def _load_symbol(self, symbol: Symbol):
+        if symbol.scope == SymbolScope.GLOBAL:
             self._emit(Opcode.GET_GLOBAL, symbol.index)
+        elif symbol.scope == SymbolScope.LOCAL:
+            self._emit(Opcode.GET_LOCAL, symbol.index)
+        elif symbol.scope == SymbolScope.FREE:
+            self._emit(Opcode.GET_FREE, symbol.index)
+        elif symbol.scope == SymbolScope.FUNCTION:
+            self._emit(Opcode.CURRENT_CLOSURE)
+        elif symbol.scope == SymbolScope.BUILTIN:
+            self._emit(Opcode.GET_BUILTIN, symbol.index)
 
     def bytecode(self):
-        return Bytecode(bytes(self._instructions), self._constants)
+        scope = self._scopes[0]
+        return Bytecode(
+            bytes(scope.instructions), self._constants, list(scope.positions)
+        )
+
+
+def line_for(positions: List[Tuple[int, int]], offset: int):
+    "The source line the instruction at `offset` came from, or 0."
+    i = bisect_right(positions, (offset, sys.maxsize)) - 1
+    if i < 0:
+        return 0
+    return positions[i][1]
 
 
 @dataclass(init=True, frozen=True)
 class Bytecode:
     instructions: bytes
     constants: List[monkey_object.Object]
+    positions: List[Tuple[int, int]] = field(default_factory=list)
+
+    def line_for(self, offset: int):
+        "The source line the instruction at `offset` came from, or 0."
+        return line_for(self.positions, offset)
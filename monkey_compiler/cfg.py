@@ -0,0 +1,181 @@
+"""
+A control-flow-graph pass over compiled instructions. It threads jumps to
+their final targets, drops unreachable basic blocks and jumps to the next
+instruction, and re-encodes the rest with corrected offsets and positions.
+"""
+from dataclasses import dataclass, field
+from monkey_code import Opcode
+from typing import Dict, List, Tuple
+import difflib
+import monkey_code as code
+
+UNCONDITIONAL_JUMPS = (Opcode.JUMP, Opcode.JUMP_SHORT)
+CONDITIONAL_JUMPS = (
+    Opcode.JUMP_NOT_TRUTHY,
+    Opcode.JUMP_NOT_TRUTHY_SHORT,
+    Opcode.GREATER_THAN_JUMP_NOT_TRUTHY,
+    Opcode.EQUAL_JUMP_NOT_TRUTHY,
+)
+# every jump has its target as its first operand
+JUMPS = (*UNCONDITIONAL_JUMPS, *CONDITIONAL_JUMPS)
+# instructions after which control never falls through
+TERMINATORS = (*UNCONDITIONAL_JUMPS, Opcode.RETURN_VALUE, Opcode.RETURN)
+
+
+@dataclass
+class BasicBlock:
+    # indexes into the decoded instructions, end exclusive
+    start: int
+    end: int
+    successors: List[int] = field(default_factory=list)
+
+
+@dataclass
+class Optimized:
+    instructions: bytes
+    positions: List[Tuple[int, int]]
+    # instructions left out, and jumps sent straight to their final target
+    removed: int = 0
+    threaded: int = 0
+
+
+def _final_target(decoded, index_at: Dict[int, int], target: int):
+    seen = set()
+    while target in index_at and target not in seen:
+        _, op, operands = decoded[index_at[target]]
+        if op not in UNCONDITIONAL_JUMPS:
+            break
+        seen.add(target)
+        target = operands[0]
+    return target
+
+
+def basic_blocks(decoded, targets: Dict[int, int]):
+    """
+    Split `decoded`, a list from `code.walk`, into basic blocks; `targets`
+    maps the index of each jump to the offset it goes to.
+    """
+    index_at = {offset: i for i, (offset, _, _) in enumerate(decoded)}
+    leaders = {0}
+    for i, (_, op, _) in enumerate(decoded):
+        if op in JUMPS or op in TERMINATORS:
+            leaders.add(i + 1)
+    for target in targets.values():
+        if target in index_at:
+            leaders.add(index_at[target])
+    starts = sorted(i for i in leaders if i < len(decoded))
+    ends = starts[1:] + [len(decoded)]
+    blocks = [BasicBlock(start, end) for start, end in zip(starts, ends)]
+    block_at = {block.start: n for n, block in enumerate(blocks)}
+    for n, block in enumerate(blocks):
+        last = block.end - 1
+        op = decoded[last][1]
+        if op in JUMPS and targets[last] in index_at:
+            block.successors.append(block_at[index_at[targets[last]]])
+        if op not in TERMINATORS and n + 1 < len(blocks):
+            block.successors.append(n + 1)
+    return blocks
+
+
+def _reachable(blocks: List[BasicBlock]):
+    reached = set()
+    pending = [0] if len(blocks) > 0 else []
+    while len(pending) > 0:
+        n = pending.pop()
+        if n in reached:
+            continue
+        reached.add(n)
+        pending.extend(blocks[n].successors)
+    return reached
+
+
+def optimize(instructions: bytes, positions: List[Tuple[int, int]] = ()):
+    "`instructions` without unreachable code and with jumps threaded."
+    decoded = list(code.walk(instructions))
+    index_at = {offset: i for i, (offset, _, _) in enumerate(decoded)}
+    end = len(instructions)
+
+    targets = {}
+    threaded = 0
+    for i, (_, op, operands) in enumerate(decoded):
+        if op in JUMPS:
+            targets[i] = _final_target(decoded, index_at, operands[0])
+            if targets[i] != operands[0]:
+                threaded += 1
+
+    blocks = basic_blocks(decoded, targets)
+    kept = []
+    for n in sorted(_reachable(blocks)):
+        kept.extend(range(blocks[n].start, blocks[n].end))
+
+    # a jump to where control falls through anyway is dropped, unless it is
+    # a target itself, which only a cycle of jumps can leave behind
+    target_offsets = {targets[i] for i in kept if i in targets}
+    fallthrough = []
+    for k, i in enumerate(kept):
+        offset, op, _ = decoded[i]
+        next_offset = decoded[kept[k + 1]][0] if k + 1 < len(kept) else end
+        if op in UNCONDITIONAL_JUMPS and targets[i] == next_offset:
+            if offset not in target_offsets:
+                continue
+        fallthrough.append(i)
+    kept = fallthrough
+
+    items = []
+    for i in kept:
+        offset, op, operands = decoded[i]
+        if op in JUMPS:
+            operands = [targets[i]]
+        items.append((offset, op, operands))
+    out, new_positions = assemble(items, end, positions)
+    return Optimized(out, new_positions, len(decoded) - len(kept), threaded)
+
+
+def layout(items, end: int):
+    "Where each of `items` (see `assemble`) and `end` land once encoded."
+    new_offsets = {}
+    size = 0
+    for offset, op, _ in items:
+        new_offsets[offset] = size
+        size += 1 + sum(code.lookup(op).operand_widths)
+    new_offsets[end] = size
+    return new_offsets
+
+
+def assemble(items, end: int, positions: List[Tuple[int, int]] = ()):
+    """
+    Encode `items`, (offset, opcode, operands) triples in the order of their
+    original offsets. Jump targets and `positions` are mapped from the
+    original offsets; `end` is the length of the original instructions.
+    """
+    new_offsets = layout(items, end)
+    out = bytearray()
+    new_positions = []
+    p = 0
+    line = 0
+    for offset, op, operands in items:
+        while p < len(positions) and positions[p][0] <= offset:
+            line = positions[p][1]
+            p += 1
+        if len(positions) > 0 and (
+            len(new_positions) == 0 or new_positions[-1][1] != line
+        ):
+            new_positions.append((len(out), line))
+        if op in JUMPS:
+            operands = [new_offsets[operands[0]], *operands[1:]]
+        out.extend(code.make(op, *operands))
+    return bytes(out), new_positions
+
+
+def _listing(instructions: bytes):
+    listing = str(code.Instructions(bytearray(instructions)))
+    return [line.split(" ", 1)[1] for line in listing.splitlines()]
+
+
+def disassembly_diff(before: bytes, after: bytes):
+    "A unified diff of the disassembly of `before` and `after`, without offsets."
+    return "\n".join(
+        difflib.unified_diff(
+            _listing(before), _listing(after), "before", "after", lineterm=""
+        )
+    )
@@ -0,0 +1,48 @@
+"""
+Compact encoding: every instruction in its narrowest form. Small integer
+constants become PUSH_SMALL_INT, and instructions whose operands fit in a
+byte switch to their one-byte form; see `code.narrowest`.
+"""
+from monkey_code import Opcode
+from monkey_compiler import cfg
+from typing import List, Tuple
+import monkey_code as code
+import monkey_object
+
+
+def compact(
+    instructions: bytes,
+    positions: List[Tuple[int, int]] = (),
+    constants: List[monkey_object.Object] = (),
+):
+    """
+    `instructions` re-encoded compactly; `constants` is the pool their
+    CONSTANT instructions index.
+    """
+    decoded = list(code.walk(instructions))
+    items = []
+    for offset, op, operands in decoded:
+        if op == Opcode.CONSTANT and operands[0] < len(constants):
+            obj = constants[operands[0]]
+            if type(obj) is monkey_object.Integer and 0 <= obj.value <= 0xFF:
+                items.append((offset, Opcode.PUSH_SMALL_INT, [obj.value]))
+                continue
+        if op not in cfg.JUMPS:
+            op = code.narrowest(op, *operands)
+        items.append((offset, op, operands))
+
+    # Shrinking a jump only moves later code closer to the start, so a jump
+    # that fits once keeps fitting; repeat until no jump shrinks.
+    end = len(instructions)
+    changed = True
+    while changed:
+        changed = False
+        new_offsets = cfg.layout(items, end)
+        for i, (offset, op, operands) in enumerate(items):
+            if op in cfg.JUMPS:
+                short = code.narrowest(op, new_offsets[operands[0]])
+                if short != op:
+                    items[i] = (offset, short, operands)
+                    changed = True
+    out, new_positions = cfg.assemble(items, end, positions)
+    return cfg.Optimized(out, new_positions)
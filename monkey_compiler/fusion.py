@@ -0,0 +1,63 @@
+"""
+Superinstructions: adjacent opcode pairs rewritten into one fused opcode,
+so that the VM dispatches once instead of twice. The pairs are the ones
+that dominate VM.run_instrumented's pair counts on the benchmark corpus;
+`rank` orders them by such counts for any workload.
+"""
+from collections import Counter
+from monkey_code import Opcode
+from monkey_compiler import cfg
+from typing import Dict, List, Tuple
+import monkey_code as code
+
+FUSIONS: Dict[Tuple[Opcode, Opcode], Opcode] = {
+    (Opcode.GET_LOCAL, Opcode.CONSTANT): Opcode.GET_LOCAL_CONSTANT,
+    (Opcode.GET_GLOBAL, Opcode.CONSTANT): Opcode.GET_GLOBAL_CONSTANT,
+    (Opcode.CONSTANT, Opcode.SET_GLOBAL): Opcode.CONSTANT_SET_GLOBAL,
+    (
+        Opcode.GREATER_THAN,
+        Opcode.JUMP_NOT_TRUTHY,
+    ): Opcode.GREATER_THAN_JUMP_NOT_TRUTHY,
+    (Opcode.EQUAL, Opcode.JUMP_NOT_TRUTHY): Opcode.EQUAL_JUMP_NOT_TRUTHY,
+}
+
+
+def rank(pairs: Counter) -> List[Tuple[Opcode, int]]:
+    """
+    The fused opcodes covering `pairs`, an OpcodeReport.pairs counter of
+    opcode name pairs, with how often their pair ran, most frequent first.
+    """
+    ranked = []
+    for (first, second), fused in FUSIONS.items():
+        count = pairs.get((first.name, second.name), 0)
+        if count > 0:
+            ranked.append((fused, count))
+    ranked.sort(key=lambda r: -r[1])
+    return ranked
+
+
+def fuse(instructions: bytes, positions: List[Tuple[int, int]] = (), fusions=None):
+    """
+    Rewrite each pair in `fusions` (by default FUSIONS) into its fused
+    opcode, left to right, unless a jump lands between the two.
+    """
+    if fusions is None:
+        fusions = FUSIONS
+    decoded = list(code.walk(instructions))
+    targets = {operands[0] for _, op, operands in decoded if op in cfg.JUMPS}
+
+    items = []
+    i = 0
+    while i < len(decoded):
+        offset, op, operands = decoded[i]
+        if i + 1 < len(decoded):
+            next_offset, next_op, next_operands = decoded[i + 1]
+            fused = fusions.get((op, next_op))
+            if fused is not None and next_offset not in targets:
+                items.append((offset, fused, operands + next_operands))
+                i += 2
+                continue
+        items.append((offset, op, operands))
+        i += 1
+    out, new_positions = cfg.assemble(items, len(instructions), positions)
+    return cfg.Optimized(out, new_positions, len(decoded) - len(items))
@@ -1,8 +1,12 @@
 from abc import abstractmethod, ABC
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import Enum, auto
 from dataclasses import dataclass
+from environment import Environment
 import hashlib
 import struct
+import threading
 
 
 class ObjectType(Enum):
@@ -16,6 +20,9 @@ class ObjectType(Enum):
     BUILTIN = auto()
     ARRAY = auto()
     HASH = auto()
+    INT_ARRAY = auto()
+    COMPILED_FUNCTION = auto()
+    CLOSURE = auto()
 
     def __str__(self):
         if self == ObjectType.INTEGER:
@@ -24,10 +31,26 @@ class ObjectType(Enum):
             return "BOOLEAN"
         elif self == ObjectType.NULL:
             return "NULL"
+        elif self == ObjectType.RETURN_VALUE:
+            return "RETURN_VALUE"
+        elif self == ObjectType.ERROR:
+            return "ERROR"
         elif self == ObjectType.STRING:
             return "STRING"
         elif self == ObjectType.FUNCTION:
             return "FUNCTION"
+        elif self == ObjectType.BUILTIN:
+            return "BUILTIN"
+        elif self == ObjectType.ARRAY:
+            return "ARRAY"
+        elif self == ObjectType.HASH:
+            return "HASH"
+        elif self == ObjectType.INT_ARRAY:
+            return "INT_ARRAY"
+        elif self == ObjectType.COMPILED_FUNCTION:
+            return "COMPILED_FUNCTION"
+        elif self == ObjectType.CLOSURE:
+            return "CLOSURE"
         else:
             raise Exception("unexpected type for __str__")
 
@@ -116,10 +139,11 @@ class Error(Object):
 
 
 class Function(Object):
-    def __init__(self, parameters, body, env):
+    def __init__(self, parameters, body, env, name=""):
         self.parameters = parameters
         self.body = body
         self.env = env
+        self.name = name
 
     def type(self):
         return ObjectType.FUNCTION
@@ -128,6 +152,38 @@ class Function(Object):
         return f"fn({self.parameters.join(', ')}) {{\n{self.body.string()}\n}}"
 
 
+class CompiledFunction(Object):
+    def __init__(
+        self, instructions, num_locals=0, num_parameters=0, positions=None, name=""
+    ):
+        self.instructions = instructions
+        self.num_locals = num_locals
+        self.num_parameters = num_parameters
+        # (offset, line) pairs, as in monkey_compiler.Bytecode
+        self.positions = positions if positions is not None else []
+        self.name = name
+
+    def type(self):
+        return ObjectType.COMPILED_FUNCTION
+
+    def inspect(self):
+        return f"CompiledFunction[{id(self):#x}]"
+
+
+class Closure(Object):
+    "A CompiledFunction with the values of the free variables it captured."
+
+    def __init__(self, fn, free=None):
+        self.fn = fn
+        self.free = free if free is not None else []
+
+    def type(self):
+        return ObjectType.CLOSURE
+
+    def inspect(self):
+        return f"Closure[{id(self):#x}]"
+
+
 class String(Object, Hashable):
     def __init__(self, value):
         self.value = value
@@ -167,6 +223,19 @@ class Array(Object):
         return f"[{', '.join(map(lambda e: e.inspect(), self.elements))}]"
 
 
+class IntArray(Object):
+    "An array of 64-bit integers backed by `int_array` storage."
+
+    def __init__(self, values):
+        self.values = values
+
+    def type(self):
+        return ObjectType.INT_ARRAY
+
+    def inspect(self):
+        return f"[{', '.join(str(int(v)) for v in self.values)}]"
+
+
 @dataclass(init=True, frozen=True)
 class HashPair:
     key: Object
@@ -185,3 +254,76 @@ class Hash(Object):
         for pair in self.pairs.values():
             pairs.append(f"{pair.key.inspect()}: {pair.value.inspect()}")
         return f"{{{', '.join(pairs)}}}"
+
+
+_allocation_observer = ContextVar("allocation_observer", default=None)
+_observers_active = 0
+_observers_lock = threading.Lock()
+_original_inits = dict()
+
+
+class MemoryQuotaExceeded(RuntimeError):
+    "Raised by an allocation observer to abort a run that allocated too much."
+
+
+def _object_types():
+    types = [Environment]
+    pending = [Object]
+    while len(pending) > 0:
+        cls = pending.pop()
+        for sub in cls.__subclasses__():
+            if sub not in types:
+                types.append(sub)
+                pending.append(sub)
+    return types
+
+
+def _observing_init(cls, init):
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        observer = _allocation_observer.get()
+        if observer is not None and type(self) is cls:
+            observer.allocated(self)
+
+    return __init__
+
+
+def _install_observing_inits():
+    types = _object_types()
+    inits = {cls: cls.__init__ for cls in types}
+    for cls in types:
+        _original_inits[cls] = cls.__dict__.get("__init__")
+        cls.__init__ = _observing_init(cls, inits[cls])
+
+
+def _remove_observing_inits():
+    for cls, init in _original_inits.items():
+        if init is None:
+            del cls.__init__
+        else:
+            cls.__init__ = init
+    _original_inits.clear()
+
+
+@contextmanager
+def observe_allocations(observer):
+    """
+    Call `observer.allocated(obj)` for every Object and Environment created
+    inside the block by the current thread or task. Constructors are only
+    wrapped while at least one observer is active, so they cost nothing
+    otherwise.
+    """
+    global _observers_active
+    with _observers_lock:
+        if _observers_active == 0:
+            _install_observing_inits()
+        _observers_active += 1
+    token = _allocation_observer.set(observer)
+    try:
+        yield observer
+    finally:
+        _allocation_observer.reset(token)
+        with _observers_lock:
+            _observers_active -= 1
+            if _observers_active == 0:
+                _remove_observing_inits()
@@ -139,6 +139,8 @@ class Parser:
 
         self.next_token()
         value = self.parse_expression(Precedence.LOWEST)
+        if isinstance(value, ast.FunctionLiteral):
+            value.name = name.value
         if self.peek_token_is(TokenType.Semicolon):
             self.next_token()
 
@@ -1,14 +1,174 @@
-from dataclasses import dataclass
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from monkey_compiler import Bytecode
-from typing import List
+from tracer import TracingSink
+from typing import Any, Dict, List, Optional
+import int_array
+import json
+import monkey_builtins
 import monkey_object
 import monkey_code as code
+import output
+import time
 
 STACK_SIZE = 2048
 GLOBALS_SIZE = 65536
+MAX_FRAMES = 1024
 TRUE = monkey_object.Boolean(True)
 FALSE = monkey_object.Boolean(False)
 NULL = monkey_object.Null()
+# shared by every PUSH_SMALL_INT; Integers are immutable
+SMALL_INTS = [monkey_object.Integer(i) for i in range(256)]
+# how many instructions run between checks of the execution limits
+CHECK_INTERVAL = 1024
+# Opcodes as plain ints. The dispatch loop compares raw instruction bytes
+# against these, which is much cheaper than building and comparing Opcodes.
+OP_CONSTANT = code.Opcode.CONSTANT.value
+OP_TRUE = code.Opcode.TRUE.value
+OP_FALSE = code.Opcode.FALSE.value
+OP_NULL = code.Opcode.NULL.value
+OP_ADD = code.Opcode.ADD.value
+OP_SUB = code.Opcode.SUB.value
+OP_MUL = code.Opcode.MUL.value
+OP_DIV = code.Opcode.DIV.value
+OP_MINUS = code.Opcode.MINUS.value
+OP_BANG = code.Opcode.BANG.value
+OP_EQUAL = code.Opcode.EQUAL.value
+OP_NOT_EQUAL = code.Opcode.NOT_EQUAL.value
+OP_GREATER_THAN = code.Opcode.GREATER_THAN.value
+OP_POP = code.Opcode.POP.value
+OP_JUMP_NOT_TRUTHY = code.Opcode.JUMP_NOT_TRUTHY.value
+OP_JUMP = code.Opcode.JUMP.value
+OP_GET_GLOBAL = code.Opcode.GET_GLOBAL.value
+OP_SET_GLOBAL = code.Opcode.SET_GLOBAL.value
+OP_CALL = code.Opcode.CALL.value
+OP_RETURN_VALUE = code.Opcode.RETURN_VALUE.value
+OP_RETURN = code.Opcode.RETURN.value
+OP_GET_LOCAL = code.Opcode.GET_LOCAL.value
+OP_SET_LOCAL = code.Opcode.SET_LOCAL.value
+OP_CLOSURE = code.Opcode.CLOSURE.value
+OP_GET_FREE = code.Opcode.GET_FREE.value
+OP_CURRENT_CLOSURE = code.Opcode.CURRENT_CLOSURE.value
+OP_ARRAY = code.Opcode.ARRAY.value
+OP_HASH = code.Opcode.HASH.value
+OP_INDEX = code.Opcode.INDEX.value
+OP_GET_BUILTIN = code.Opcode.GET_BUILTIN.value
+OP_GET_LOCAL_CONSTANT = code.Opcode.GET_LOCAL_CONSTANT.value
+OP_GET_GLOBAL_CONSTANT = code.Opcode.GET_GLOBAL_CONSTANT.value
+OP_CONSTANT_SET_GLOBAL = code.Opcode.CONSTANT_SET_GLOBAL.value
+OP_GREATER_THAN_JUMP_NOT_TRUTHY = code.Opcode.GREATER_THAN_JUMP_NOT_TRUTHY.value
+OP_EQUAL_JUMP_NOT_TRUTHY = code.Opcode.EQUAL_JUMP_NOT_TRUTHY.value
+OP_ADD_INT = code.Opcode.ADD_INT.value
+OP_SUB_INT = code.Opcode.SUB_INT.value
+OP_MUL_INT = code.Opcode.MUL_INT.value
+OP_DIV_INT = code.Opcode.DIV_INT.value
+OP_CONSTANT_SHORT = code.Opcode.CONSTANT_SHORT.value
+OP_GET_GLOBAL_SHORT = code.Opcode.GET_GLOBAL_SHORT.value
+OP_SET_GLOBAL_SHORT = code.Opcode.SET_GLOBAL_SHORT.value
+OP_JUMP_SHORT = code.Opcode.JUMP_SHORT.value
+OP_JUMP_NOT_TRUTHY_SHORT = code.Opcode.JUMP_NOT_TRUTHY_SHORT.value
+OP_PUSH_SMALL_INT = code.Opcode.PUSH_SMALL_INT.value
+# the source operator of each binary opcode
+BINARY_OPERATORS = {
+    code.Opcode.ADD: "+",
+    code.Opcode.SUB: "-",
+    code.Opcode.MUL: "*",
+    code.Opcode.DIV: "/",
+    code.Opcode.EQUAL: "==",
+    code.Opcode.NOT_EQUAL: "!=",
+    code.Opcode.GREATER_THAN: ">",
+}
+
+
+class ExecutionLimitExceeded(RuntimeError):
+    pass
+
+
+class InstructionBudgetExceeded(ExecutionLimitExceeded):
+    pass
+
+
+class DeadlineExceeded(ExecutionLimitExceeded):
+    pass
+
+
+class StackDepthExceeded(ExecutionLimitExceeded):
+    pass
+
+
+@dataclass
+class Limits:
+    "Per-run bounds on a VM. `timeout` is in seconds of wall-clock time."
+    max_instructions: Optional[int] = None
+    timeout: Optional[float] = None
+    max_stack_depth: Optional[int] = None
+
+
+@dataclass
+class OpcodeReport:
+    "Execution counts gathered by VM.run_instrumented."
+    opcodes: Counter = field(default_factory=Counter)
+    # keyed by (function label, offset within that function)
+    offsets: Counter = field(default_factory=Counter)
+    pairs: Counter = field(default_factory=Counter)
+    # seconds spent per opcode; only filled in when timing was requested
+    time: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self):
+        return {
+            "opcodes": dict(self.opcodes.most_common()),
+            "offsets": [[fn, ip, n] for (fn, ip), n in sorted(self.offsets.items())],
+            "pairs": [[a, b, n] for (a, b), n in self.pairs.most_common()],
+            "time": dict(sorted(self.time.items(), key=lambda t: -t[1])),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class Instrumentation:
+    def __init__(self, timing: bool, main_fn: monkey_object.CompiledFunction):
+        self.report = OpcodeReport()
+        self.timing = timing
+        self.main_fn = main_fn
+        self.previous: Optional[str] = None
+        self.previous_time = 0.0
+
+    def function_label(self, fn: monkey_object.CompiledFunction):
+        if fn is self.main_fn:
+            return "<main>"
+        return fn.name or fn.inspect()
+
+    def record(self, op: code.Opcode, fn: monkey_object.CompiledFunction, ip: int):
+        name = op.name
+        report = self.report
+        report.opcodes[name] += 1
+        report.offsets[(self.function_label(fn), ip)] += 1
+        if self.previous is not None:
+            report.pairs[(self.previous, name)] += 1
+        if self.timing:
+            self.stop_clock()
+        self.previous = name
+
+    def stop_clock(self):
+        now = time.perf_counter()
+        if self.previous is not None:
+            spent = self.report.time.get(self.previous, 0.0)
+            self.report.time[self.previous] = spent + now - self.previous_time
+        self.previous_time = now
+
+
+@dataclass
+class Frame:
+    closure: monkey_object.Closure
+    base_pointer: int
+    # the instruction to resume after, while a call made by this frame runs
+    ip: int = -1
+
+
+def new_globals_store():
+    return [None for _ in range(GLOBALS_SIZE)]
 
 
 def native_bool_to_boolean_object(b):
@@ -29,25 +189,71 @@ def is_truthy(obj: monkey_object.Object):
 @dataclass
 class VM:
     _constants: List[monkey_object.Object]
-    _instructions: code.Instructions
+    _main_closure: monkey_object.Closure
+    _frames: List[Frame]
     _stack: List[monkey_object.Object]
     _sp: int
     _globals: List[monkey_object.Object]
+    _sink: Optional[Any]
+    _limits: Limits
+    _max_sp: int
+    _deadline: Optional[float]
+    _started: int
+    _interval: int
+    _instrumentation: Optional[Instrumentation]
+    _tracer: Optional[Any]
 
-    def __init__(self, bytecode: Bytecode):
-        self._instructions = bytecode.instructions
+    def __init__(
+        self,
+        bytecode: Bytecode,
+        sink: Optional[Any] = None,
+        limits: Optional[Limits] = None,
+        tracer: Optional[Any] = None,
+        globals_store: Optional[List[monkey_object.Object]] = None,
+    ):
+        """
+        `sink` receives `puts` output; see the `output` module. `tracer` is a
+        `tracer.Tracer` that gets a span for run() and an event per `puts`.
+        `globals_store` lets runs share globals, as bytecode from
+        `Compiler.new_with_state` expects; see `new_globals_store`.
+        """
+        self._sink = sink
+        self._tracer = tracer
+        self._limits = limits if limits is not None else Limits()
+        self._max_sp = STACK_SIZE
+        if self._limits.max_stack_depth is not None:
+            self._max_sp = min(STACK_SIZE, self._limits.max_stack_depth)
+        self._deadline = None
+        self._started = 0
+        self._interval = CHECK_INTERVAL
+        self._instrumentation = None
+        main_fn = monkey_object.CompiledFunction(
+            bytecode.instructions, positions=bytecode.positions
+        )
+        self._main_closure = monkey_object.Closure(main_fn)
+        self._frames = []
         self._constants = bytecode.constants
         self._stack = [None for _ in range(STACK_SIZE)]
         self._sp = 0
-        self._globals = [None for _ in range(GLOBALS_SIZE)]
+        if globals_store is None:
+            globals_store = new_globals_store()
+        self._globals = globals_store
 
     def stack_top(self):
         if self._sp == 0:
             return None
         return self._stack[self._sp - 1]
 
+    @property
+    def instructions_executed(self):
+        return self._started
+
     def push(self, o: monkey_object.Object):
-        if self._sp >= STACK_SIZE:
+        if self._sp >= self._max_sp:
+            if self._max_sp < STACK_SIZE:
+                raise StackDepthExceeded(
+                    f"stack depth limit of {self._max_sp} exceeded"
+                )
             raise RuntimeError("stack overflow")
         self._stack[self._sp] = o
         self._sp += 1
@@ -60,62 +266,218 @@ class VM:
     def last_popped_stack_elem(self):
         return self._stack[self._sp]
 
+    def call_function(self, num_args: int):
+        "Push a frame for the closure below the `num_args` arguments on the stack."
+        closure = self._stack[self._sp - 1 - num_args]
+        if not isinstance(closure, monkey_object.Closure):
+            raise RuntimeError("calling non-function")
+        fn = closure.fn
+        if num_args != fn.num_parameters:
+            raise RuntimeError(
+                f"wrong number of arguments: want={fn.num_parameters}, got={num_args}"
+            )
+        if len(self._frames) >= MAX_FRAMES:
+            raise RuntimeError("call stack overflow")
+        base_pointer = self._sp - num_args
+        sp = base_pointer + fn.num_locals
+        if sp > self._max_sp:
+            if self._max_sp < STACK_SIZE:
+                raise StackDepthExceeded(
+                    f"stack depth limit of {self._max_sp} exceeded"
+                )
+            raise RuntimeError("stack overflow")
+        frame = Frame(closure, base_pointer)
+        self._frames.append(frame)
+        self._sp = sp
+        return frame
+
+    def return_from_function(self, return_value: monkey_object.Object):
+        "Pop the current frame and its callee slot, leaving `return_value`."
+        frame = self._frames.pop()
+        self._sp = frame.base_pointer - 1
+        self.push(return_value)
+        return self._frames[-1]
+
+    def push_closure(self, const_index: int, num_free: int):
+        "Close the function constant over the `num_free` values on the stack."
+        fn = self._constants[const_index]
+        if not isinstance(fn, monkey_object.CompiledFunction):
+            raise RuntimeError(f"not a function: {fn.inspect()}")
+        free = self._stack[self._sp - num_free : self._sp]
+        self._sp -= num_free
+        self.push(monkey_object.Closure(fn, free))
+
     def execute_binary_integer_operation(
-        self, op: code.Opcode, left: monkey_object.Object, right: monkey_object.Object
+        self, op: int, left: monkey_object.Object, right: monkey_object.Object
     ):
         result = None
-        if op == code.Opcode.ADD:
+        if op == OP_ADD:
             result = left.value + right.value
-        elif op == code.Opcode.SUB:
+        elif op == OP_SUB:
             result = left.value - right.value
-        elif op == code.Opcode.MUL:
+        elif op == OP_MUL:
             result = left.value * right.value
-        elif op == code.Opcode.DIV:
+        elif op == OP_DIV:
             result = left.value // right.value
         else:
-            raise RuntimeError(f"unknown integer operator: {op}")
+            raise RuntimeError(f"unknown integer operator: {code.Opcode(op)}")
         self.push(monkey_object.Integer(result))
 
-    def execute_binary_operation(self, op: code.Opcode):
+    def execute_binary_int_array_operation(
+        self, op: int, left: monkey_object.Object, right: monkey_object.Object
+    ):
+        operands = []
+        for operand in (left, right):
+            if isinstance(operand, monkey_object.IntArray):
+                operands.append(operand.values)
+            elif isinstance(operand, monkey_object.Integer):
+                operands.append(operand.value)
+            else:
+                raise RuntimeError(
+                    f"unsupported types for binary operation: {left.type()}, {right.type()}"
+                )
+        try:
+            result = int_array.binary(BINARY_OPERATORS[op], *operands)
+        except (ZeroDivisionError, OverflowError, ValueError) as e:
+            raise RuntimeError(str(e))
+        self.push(monkey_object.IntArray(result))
+
+    def execute_binary_string_operation(
+        self, op: int, left: monkey_object.Object, right: monkey_object.Object
+    ):
+        if op != OP_ADD:
+            raise RuntimeError(
+                f"unknown operator: {left.type()} {BINARY_OPERATORS[op]} {right.type()}"
+            )
+        self.push(monkey_object.String(left.value + right.value))
+
+    def build_array(self, num_elements: int):
+        elements = self._stack[self._sp - num_elements : self._sp]
+        self._sp -= num_elements
+        self.push(monkey_object.Array(elements))
+
+    def build_hash(self, num_items: int):
+        "Build a hash from the `num_items` alternating keys and values on the stack."
+        pairs = dict()
+        for i in range(self._sp - num_items, self._sp, 2):
+            key = self._stack[i]
+            value = self._stack[i + 1]
+            if not isinstance(key, monkey_object.Hashable):
+                raise RuntimeError(f"unusable as hash key: {key.type()}")
+            pairs[key.hash_key()] = monkey_object.HashPair(key, value)
+        self._sp -= num_items
+        self.push(monkey_object.Hash(pairs))
+
+    def execute_index_expression(self):
+        index = self.pop()
+        left = self.pop()
+        if isinstance(left, monkey_object.Array) and isinstance(
+            index, monkey_object.Integer
+        ):
+            i = index.value
+            if i < 0 or i >= len(left.elements):
+                self.push(NULL)
+            else:
+                self.push(left.elements[i])
+        elif isinstance(left, monkey_object.IntArray) and isinstance(
+            index, monkey_object.Integer
+        ):
+            i = index.value
+            if i < 0 or i >= len(left.values):
+                self.push(NULL)
+            else:
+                self.push(monkey_object.Integer(int_array.element(left.values, i)))
+        elif isinstance(left, monkey_object.Hash):
+            if not isinstance(index, monkey_object.Hashable):
+                raise RuntimeError(f"unusable as hash key: {index.type()}")
+            pair = left.pairs.get(index.hash_key())
+            self.push(NULL if pair is None else pair.value)
+        else:
+            raise RuntimeError(f"index operator not supported: {left.type()}")
+
+    def execute_binary_operation(self, op: int):
         right = self.pop()
         left = self.pop()
-        if (
-            left.type() == monkey_object.ObjectType.INTEGER
-            and right.type() == monkey_object.ObjectType.INTEGER
+        if isinstance(left, monkey_object.Integer) and isinstance(
+            right, monkey_object.Integer
         ):
             self.execute_binary_integer_operation(op, left, right)
             return
+        if isinstance(left, monkey_object.String) and isinstance(
+            right, monkey_object.String
+        ):
+            self.execute_binary_string_operation(op, left, right)
+            return
+        if (
+            left.type() == monkey_object.ObjectType.INT_ARRAY
+            or right.type() == monkey_object.ObjectType.INT_ARRAY
+        ):
+            self.execute_binary_int_array_operation(op, left, right)
+            return
 
         raise RuntimeError(
             f"unsupported types for binary operation: {left.type()}, {right.type()}"
         )
 
     def execute_integer_comparison(
-        self, op: code.Opcode, left: monkey_object.Object, right: monkey_object.Object
+        self, op: int, left: monkey_object.Object, right: monkey_object.Object
     ):
-        if op == code.Opcode.EQUAL:
+        if op == OP_EQUAL:
             self.push(native_bool_to_boolean_object(right.value == left.value))
-        elif op == code.Opcode.NOT_EQUAL:
+        elif op == OP_NOT_EQUAL:
             self.push(native_bool_to_boolean_object(right.value != left.value))
-        elif op == code.Opcode.GREATER_THAN:
+        elif op == OP_GREATER_THAN:
             self.push(native_bool_to_boolean_object(left.value > right.value))
         else:
-            raise RuntimeError(f"unknown operator: {op}")
+            raise RuntimeError(f"unknown operator: {code.Opcode(op)}")
 
-    def execute_comparison(self, op: code.Opcode):
+    def execute_comparison(self, op: int):
         right = self.pop()
         left = self.pop()
-        if (
-            left.type() == monkey_object.ObjectType.INTEGER
-            and right.type() == monkey_object.ObjectType.INTEGER
+        if isinstance(left, monkey_object.Integer) and isinstance(
+            right, monkey_object.Integer
         ):
             self.execute_integer_comparison(op, left, right)
-        elif op == code.Opcode.EQUAL:
+        elif (
+            isinstance(left, monkey_object.String)
+            and isinstance(right, monkey_object.String)
+            or op == OP_GREATER_THAN
+            and (
+                isinstance(left, monkey_object.IntArray)
+                or isinstance(right, monkey_object.IntArray)
+            )
+        ):
+            # the evaluator rejects comparing these too
+            raise RuntimeError(
+                f"unknown operator: {left.type()} {BINARY_OPERATORS[op]} {right.type()}"
+            )
+        elif op == OP_EQUAL:
             self.push(native_bool_to_boolean_object(right == left))
-        elif op == code.Opcode.NOT_EQUAL:
+        elif op == OP_NOT_EQUAL:
             self.push(native_bool_to_boolean_object(right != left))
         else:
-            raise RuntimeError(f"unknown operator: {op} ({left.type()} {right.type()})")
+            raise RuntimeError(
+                f"unknown operator: {code.Opcode(op)} ({left.type()} {right.type()})"
+            )
+
+    def compare_and_test(self, op: int):
+        """
+        The truthiness of comparing the top two stack items, as the fused
+        `op` does before jumping; integers skip the Boolean objects.
+        """
+        sp = self._sp
+        left = self._stack[sp - 2]
+        right = self._stack[sp - 1]
+        if type(left) is monkey_object.Integer and type(right) is monkey_object.Integer:
+            self._sp = sp - 2
+            if op == OP_GREATER_THAN_JUMP_NOT_TRUTHY:
+                return left.value > right.value
+            return left.value == right.value
+        if op == OP_GREATER_THAN_JUMP_NOT_TRUTHY:
+            self.execute_comparison(OP_GREATER_THAN)
+        else:
+            self.execute_comparison(OP_EQUAL)
+        return is_truthy(self.pop())
 
     def execute_bang_operator(self):
         operand = self.pop()
@@ -131,59 +493,258 @@ class VM:
         else:
             raise RuntimeError(f"unsupported type for negation: {operand.type()}")
 
+    def _next_interval(self):
+        if self._instrumentation is not None:
+            self._interval = 1
+            return 1
+        interval = CHECK_INTERVAL
+        budget = self._limits.max_instructions
+        if budget is not None:
+            # fire the next check exactly when instruction budget + 1 starts
+            interval = max(1, min(interval, budget + 1 - self._started))
+        self._interval = interval
+        return interval
+
+    def _check_limits(self, ins: bytes, ip: int):
+        "Runs before every `_interval`th instruction; returns the next interval."
+        started = self._started + self._interval
+        budget = self._limits.max_instructions
+        if budget is not None and started > budget:
+            # the instruction that tripped the check never runs
+            self._started -= 1
+            raise InstructionBudgetExceeded(
+                f"instruction budget of {budget} exceeded"
+            )
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self._started -= 1
+            raise DeadlineExceeded(f"deadline of {self._limits.timeout}s exceeded")
+        self._started = started
+        if self._instrumentation is not None:
+            fn = self._frames[-1].closure.fn
+            self._instrumentation.record(code.Opcode(ins[ip]), fn, ip)
+        return self._next_interval()
+
+    def run_instrumented(self, timing: bool = False):
+        """
+        Run while counting executions per opcode, per instruction offset
+        within its function and per pair of adjacent opcodes; with `timing`,
+        also the time spent per opcode. Plain run() does not pay for any of
+        this.
+        """
+        self._instrumentation = Instrumentation(timing, self._main_closure.fn)
+        try:
+            self.run()
+        finally:
+            if timing:
+                self._instrumentation.stop_clock()
+            report = self._instrumentation.report
+            self._instrumentation = None
+        return report
+
     def run(self):
+        self._started = 0
+        self._deadline = None
+        if self._limits.timeout is not None:
+            self._deadline = time.monotonic() + self._limits.timeout
+        with ExitStack() as stack:
+            sink = self._sink
+            if self._tracer is not None:
+                stack.enter_context(self._tracer.span("vm.run", "vm"))
+                if sink is None:
+                    sink = output.current()
+                sink = TracingSink(self._tracer, sink)
+            if sink is not None:
+                stack.enter_context(output.redirect(sink))
+            return self._run()
+
+    def _run(self):
+        frame = Frame(self._main_closure, 0)
+        self._frames = [frame]
+        ins = frame.closure.fn.instructions
         ip = 0
-        while ip < len(self._instructions):
-            op = code.Opcode(self._instructions[ip])
-            if op == code.Opcode.CONSTANT:
-                const_index = code.read_uint16(
-                    bytes(self._instructions[ip + 1 : ip + 3])
-                )
-                ip += 2
-                self.push(self._constants[const_index])
-            elif op == code.Opcode.TRUE:
-                self.push(TRUE)
-            elif op == code.Opcode.FALSE:
-                self.push(FALSE)
-            elif op in (
-                code.Opcode.ADD,
-                code.Opcode.SUB,
-                code.Opcode.MUL,
-                code.Opcode.DIV,
-            ):
-                self.execute_binary_operation(op)
-            elif op in (
-                code.Opcode.EQUAL,
-                code.Opcode.NOT_EQUAL,
-                code.Opcode.GREATER_THAN,
-            ):
-                self.execute_comparison(op)
-            elif op == code.Opcode.BANG:
-                self.execute_bang_operator()
-            elif op == code.Opcode.MINUS:
-                self.execute_minus_operator()
-            elif op == code.Opcode.POP:
-                self.pop()
-            elif op == code.Opcode.JUMP:
-                pos = code.read_uint16(self._instructions[ip + 1 : ip + 3])
-                ip = pos - 1
-            elif op == code.Opcode.JUMP_NOT_TRUTHY:
-                pos = code.read_uint16(self._instructions[ip + 1 : ip + 3])
-                ip += 2
-                condition = self.pop()
-                if not is_truthy(condition):
+        ticks = self._next_interval()
+        try:
+            while ip < len(ins):
+                ticks -= 1
+                if ticks == 0:
+                    ticks = self._check_limits(ins, ip)
+                op = ins[ip]
+                # two-byte operands are big-endian, as read by code.read_uint16
+                if op == OP_CONSTANT:
+                    const_index = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    self.push(self._constants[const_index])
+                elif op == OP_GET_LOCAL:
+                    local_index = ins[ip + 1]
+                    ip += 1
+                    self.push(self._stack[frame.base_pointer + local_index])
+                elif op == OP_PUSH_SMALL_INT:
+                    ip += 1
+                    self.push(SMALL_INTS[ins[ip]])
+                elif op == OP_CONSTANT_SHORT:
+                    ip += 1
+                    self.push(self._constants[ins[ip]])
+                elif op == OP_GET_GLOBAL_SHORT:
+                    ip += 1
+                    self.push(self._globals[ins[ip]])
+                elif op == OP_GET_GLOBAL:
+                    global_index = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    self.push(self._globals[global_index])
+                elif op == OP_GET_LOCAL_CONSTANT:
+                    local_index = ins[ip + 1]
+                    const_index = (ins[ip + 2] << 8) | ins[ip + 3]
+                    ip += 3
+                    self.push(self._stack[frame.base_pointer + local_index])
+                    self.push(self._constants[const_index])
+                elif (
+                    op == OP_GREATER_THAN_JUMP_NOT_TRUTHY
+                    or op == OP_EQUAL_JUMP_NOT_TRUTHY
+                ):
+                    pos = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    if not self.compare_and_test(op):
+                        ip = pos - 1
+                elif (
+                    op == OP_ADD_INT
+                    or op == OP_SUB_INT
+                    or op == OP_MUL_INT
+                    or op == OP_DIV_INT
+                ):
+                    # the compiler proved both operands are integers
+                    sp = self._sp - 1
+                    left = self._stack[sp - 1].value
+                    right = self._stack[sp].value
+                    if op == OP_ADD_INT:
+                        result = left + right
+                    elif op == OP_SUB_INT:
+                        result = left - right
+                    elif op == OP_MUL_INT:
+                        result = left * right
+                    else:
+                        result = left // right
+                    self._stack[sp - 1] = monkey_object.Integer(result)
+                    self._sp = sp
+                elif op == OP_ADD or op == OP_SUB or op == OP_MUL or op == OP_DIV:
+                    self.execute_binary_operation(op)
+                elif op == OP_EQUAL or op == OP_NOT_EQUAL or op == OP_GREATER_THAN:
+                    self.execute_comparison(op)
+                elif op == OP_JUMP_NOT_TRUTHY:
+                    pos = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    condition = self.pop()
+                    if not is_truthy(condition):
+                        ip = pos - 1
+                elif op == OP_JUMP:
+                    pos = (ins[ip + 1] << 8) | ins[ip + 2]
                     ip = pos - 1
-            elif op == code.Opcode.SET_GLOBAL:
-                global_index = code.read_uint16(self._instructions[ip + 1 : ip + 3])
-                ip += 2
-
-                self._globals[global_index] = self.pop()
-            elif op == code.Opcode.GET_GLOBAL:
-                global_index = code.read_uint16(self._instructions[ip + 1 : ip + 3])
-                ip += 2
-                self.push(self._globals[global_index])
-            elif op == code.Opcode.NULL:
-                self.push(NULL)
-            ip += 1
+                elif op == OP_JUMP_NOT_TRUTHY_SHORT:
+                    pos = ins[ip + 1]
+                    ip += 1
+                    condition = self.pop()
+                    if not is_truthy(condition):
+                        ip = pos - 1
+                elif op == OP_JUMP_SHORT:
+                    ip = ins[ip + 1] - 1
+                elif op == OP_CALL:
+                    num_args = ins[ip + 1]
+                    callee = self._stack[self._sp - 1 - num_args]
+                    if type(callee) is monkey_object.Builtin:
+                        # builtins run without a frame, straight off the stack
+                        sp = self._sp
+                        result = callee.fn(self._stack[sp - num_args : sp])
+                        if result is None:
+                            result = NULL
+                        elif type(result) is monkey_object.Error:
+                            raise RuntimeError(result.message)
+                        self._sp = sp - num_args - 1
+                        self.push(result)
+                        ip += 1
+                    else:
+                        frame.ip = ip + 1
+                        frame = self.call_function(num_args)
+                        ins = frame.closure.fn.instructions
+                        ip = -1
+                elif op == OP_RETURN_VALUE or op == OP_RETURN:
+                    return_value = NULL
+                    if op == OP_RETURN_VALUE:
+                        return_value = self.pop()
+                    if len(self._frames) == 1:
+                        # a top-level return ends the program with its value
+                        self._sp = 0
+                        self._stack[0] = return_value
+                        break
+                    frame = self.return_from_function(return_value)
+                    ins = frame.closure.fn.instructions
+                    ip = frame.ip
+                elif op == OP_INDEX:
+                    self.execute_index_expression()
+                elif op == OP_ARRAY:
+                    num_elements = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    self.build_array(num_elements)
+                elif op == OP_HASH:
+                    num_items = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    self.build_hash(num_items)
+                elif op == OP_GET_GLOBAL_CONSTANT:
+                    global_index = (ins[ip + 1] << 8) | ins[ip + 2]
+                    const_index = (ins[ip + 3] << 8) | ins[ip + 4]
+                    ip += 4
+                    self.push(self._globals[global_index])
+                    self.push(self._constants[const_index])
+                elif op == OP_CONSTANT_SET_GLOBAL:
+                    const_index = (ins[ip + 1] << 8) | ins[ip + 2]
+                    global_index = (ins[ip + 3] << 8) | ins[ip + 4]
+                    ip += 4
+                    value = self._constants[const_index]
+                    if self._sp >= self._max_sp:
+                        # fails the same way as the unfused CONSTANT
+                        self.push(value)
+                    # left where SET_GLOBAL's pop leaves it, for
+                    # last_popped_stack_elem
+                    self._stack[self._sp] = value
+                    self._globals[global_index] = value
+                elif op == OP_GET_BUILTIN:
+                    builtin_index = ins[ip + 1]
+                    ip += 1
+                    self.push(monkey_builtins.BUILTIN_LIST[builtin_index])
+                elif op == OP_GET_FREE:
+                    free_index = ins[ip + 1]
+                    ip += 1
+                    self.push(frame.closure.free[free_index])
+                elif op == OP_CLOSURE:
+                    const_index = (ins[ip + 1] << 8) | ins[ip + 2]
+                    num_free = ins[ip + 3]
+                    ip += 3
+                    self.push_closure(const_index, num_free)
+                elif op == OP_CURRENT_CLOSURE:
+                    self.push(frame.closure)
+                elif op == OP_POP:
+                    self.pop()
+                elif op == OP_SET_LOCAL:
+                    local_index = ins[ip + 1]
+                    ip += 1
+                    self._stack[frame.base_pointer + local_index] = self.pop()
+                elif op == OP_SET_GLOBAL:
+                    global_index = (ins[ip + 1] << 8) | ins[ip + 2]
+                    ip += 2
+                    self._globals[global_index] = self.pop()
+                elif op == OP_SET_GLOBAL_SHORT:
+                    ip += 1
+                    self._globals[ins[ip]] = self.pop()
+                elif op == OP_TRUE:
+                    self.push(TRUE)
+                elif op == OP_FALSE:
+                    self.push(FALSE)
+                elif op == OP_NULL:
+                    self.push(NULL)
+                elif op == OP_BANG:
+                    self.execute_bang_operator()
+                elif op == OP_MINUS:
+                    self.execute_minus_operator()
+                ip += 1
+        finally:
+            self._started += self._interval - ticks
 
         return None
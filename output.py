@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import sys
+
+
+class PrintSink:
+    "Writes every line to stdout as soon as it is produced."
+
+    def write(self, line):
+        print(line)
+
+    def flush(self):
+        pass
+
+
+class BufferedSink:
+    "Joins lines and writes them to `stream` once `flush_size` chars are held."
+
+    def __init__(self, stream=None, flush_size=64 * 1024):
+        self.stream = stream
+        self.flush_size = flush_size
+        self._lines = []
+        self._size = 0
+
+    def write(self, line):
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._lines) == 0:
+            return
+        stream = self.stream if self.stream is not None else sys.stdout
+        self._lines.append("")
+        stream.write("\n".join(self._lines))
+        stream.flush()
+        self._lines = []
+        self._size = 0
+
+
+class CollectingSink:
+    "Keeps every line in memory, for embedding and tests."
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return "".join(f"{line}\n" for line in self.lines)
+
+
+class CallbackSink:
+    """
+    Hands each line to `callback` as it is produced. An async consumer can
+    pass e.g. `lambda line: loop.call_soon_threadsafe(queue.put_nowait, line)`.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, line):
+        self.callback(line)
+
+    def flush(self):
+        pass
+
+
+_sink = ContextVar("output_sink", default=PrintSink())
+
+
+def current():
+    return _sink.get()
+
+
+@contextmanager
+def redirect(sink):
+    "Send `puts` output produced inside the block to `sink`."
+    token = _sink.set(sink)
+    try:
+        yield sink
+    finally:
+        sink.flush()
+        _sink.reset(token)
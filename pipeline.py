@@ -0,0 +1,204 @@
+from contextlib import ExitStack, nullcontext
+from dataclasses import dataclass, field
+from environment import Environment
+from lexer import Lexer
+from monkey_compiler import Compiler
+from monkey_parser import Parser
+from monkey_vm import VM
+from tokens import TokenType
+from tracer import TracingSink
+from typing import List, Optional
+import evaluator
+import monkey_ast as ast
+import monkey_object
+import output
+import time
+
+
+@dataclass
+class Stats:
+    engine: str
+    lex_time: float = 0.0
+    parse_time: float = 0.0
+    compile_time: float = 0.0
+    run_time: float = 0.0
+    tokens: int = 0
+    ast_nodes: int = 0
+    # the main program's instructions and those of every function
+    bytecode_size: int = 0
+    constants: int = 0
+    # by Compiler(optimize=True); see OptimizationReport
+    instructions_removed: int = 0
+    instructions_executed: int = 0
+    objects_allocated: int = 0
+    # "parse", "compile" or "run" when the script failed in that phase
+    failed_phase: Optional[str] = None
+
+    @property
+    def total_time(self):
+        return self.lex_time + self.parse_time + self.compile_time + self.run_time
+
+
+@dataclass
+class Result:
+    value: Optional[monkey_object.Object]
+    stats: Stats
+    errors: List[str] = field(default_factory=list)
+
+
+class TokenList:
+    "Replays already lexed tokens to a Parser."
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def next_token(self):
+        tok = self.tokens[self.position]
+        if self.position < len(self.tokens) - 1:
+            self.position += 1
+        return tok
+
+
+class AllocationCounter:
+    "Counts Monkey objects, passing every allocation on to `inner` if given."
+
+    def __init__(self, inner=None):
+        self.count = 0
+        self.inner = inner
+
+    def allocated(self, obj):
+        if isinstance(obj, monkey_object.Object):
+            self.count += 1
+        if self.inner is not None:
+            self.inner.allocated(obj)
+
+
+def lex(source):
+    lexer = Lexer(source)
+    tokens = []
+    while True:
+        tok = lexer.next_token()
+        tokens.append(tok)
+        if tok.type == TokenType.Eof:
+            return tokens
+
+
+def _phase(tracer, name):
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name)
+
+
+def run(
+    source,
+    engine="vm",
+    sink=None,
+    vm_limits=None,
+    eval_limits=None,
+    tracer=None,
+    metrics=None,
+    accountant=None,
+    optimize=False,
+):
+    """
+    Lex, parse and run `source` on `engine` ("vm" or "eval"), timing each
+    phase. Parser errors are returned in Result.errors; compiler and VM
+    failures raise RuntimeError as usual. A `tracer.Tracer` gets a span per
+    phase and per evaluator function call, and an event per `puts`;
+    `metrics.InterpreterMetrics` accounts for the run, failed or not. An
+    `accounting.AllocationAccountant` observes the run's allocations.
+    `optimize` turns on the compiler's optimizations, superinstructions and
+    compact encoding.
+    """
+    if engine not in ("vm", "eval"):
+        raise ValueError(f"unknown engine {engine}")
+    stats = Stats(engine)
+    try:
+        return _run(
+            source, stats, sink, vm_limits, eval_limits, tracer, accountant, optimize
+        )
+    finally:
+        if metrics is not None:
+            metrics.record(stats)
+
+
+def _run(source, stats, sink, vm_limits, eval_limits, tracer, accountant, optimize):
+    engine = stats.engine
+
+    start = time.perf_counter()
+    with _phase(tracer, "lex"):
+        tokens = lex(source)
+    stats.lex_time = time.perf_counter() - start
+    stats.tokens = len(tokens) - 1
+
+    start = time.perf_counter()
+    with _phase(tracer, "parse"):
+        parser = Parser(TokenList(tokens))
+        program = parser.parse_program()
+    stats.parse_time = time.perf_counter() - start
+    stats.ast_nodes = sum(1 for _ in ast.walk(program))
+    if len(parser.errors) > 0:
+        stats.failed_phase = "parse"
+        return Result(None, stats, list(parser.errors))
+
+    counter = AllocationCounter(accountant)
+    if engine == "vm":
+        start = time.perf_counter()
+        try:
+            with _phase(tracer, "compile"):
+                compiler = Compiler(
+                    optimize=optimize, superinstructions=optimize, compact=optimize
+                )
+                compiler.compile(program)
+                bytecode = compiler.bytecode()
+        except Exception:
+            stats.failed_phase = "compile"
+            raise
+        finally:
+            stats.compile_time = time.perf_counter() - start
+        stats.bytecode_size = len(bytecode.instructions) + sum(
+            len(constant.instructions)
+            for constant in bytecode.constants
+            if isinstance(constant, monkey_object.CompiledFunction)
+        )
+        stats.constants = len(bytecode.constants)
+        stats.instructions_removed = compiler.report.instructions_removed
+
+        machine = VM(bytecode, sink=sink, limits=vm_limits, tracer=tracer)
+        start = time.perf_counter()
+        try:
+            with monkey_object.observe_allocations(counter):
+                machine.run()
+        except Exception:
+            stats.failed_phase = "run"
+            raise
+        finally:
+            stats.run_time = time.perf_counter() - start
+            stats.instructions_executed = machine.instructions_executed
+            stats.objects_allocated = counter.count
+        return Result(machine.last_popped_stack_elem(), stats)
+    else:
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            stack.enter_context(monkey_object.observe_allocations(counter))
+            if tracer is not None:
+                stack.enter_context(tracer.span("eval"))
+                stack.enter_context(evaluator.traced(tracer))
+                if sink is None:
+                    sink = output.current()
+                sink = TracingSink(tracer, sink)
+            if sink is not None:
+                stack.enter_context(output.redirect(sink))
+            if eval_limits is not None:
+                stack.enter_context(evaluator.limited(eval_limits))
+            try:
+                value = evaluator.eval_node(program, Environment())
+            except Exception:
+                stats.failed_phase = "run"
+                raise
+        stats.run_time = time.perf_counter() - start
+        stats.objects_allocated = counter.count
+        if evaluator.is_error(value):
+            stats.failed_phase = "run"
+        return Result(value, stats)
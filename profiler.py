@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+import time
+
+
+@dataclass
+class FunctionStats:
+    name: str
+    calls: int = 0
+    self_time: float = 0.0
+    cumulative_time: float = 0.0
+
+
+def function_label(function):
+    if function.name:
+        return function.name
+    params = ", ".join(p.value for p in function.parameters)
+    return f"<anonymous fn({params})>"
+
+
+class Profiler:
+    """
+    Call counts and timings per Monkey function for the evaluator; install
+    it with `evaluator.profiled`. Functions are told apart by the body of
+    their FunctionLiteral, and labelled with the name of their let binding.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stats = dict()
+        self.collapsed = dict()
+        self._stack = []
+        self._active = dict()
+
+    def enter(self, function):
+        key = id(function.body)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = FunctionStats(function_label(function))
+            self.stats[key] = stats
+        stats.calls += 1
+        self._active[key] = self._active.get(key, 0) + 1
+        # [key, start time, time spent in callees]
+        self._stack.append([key, self.clock(), 0.0])
+
+    def exit(self):
+        key, start, child_time = self._stack.pop()
+        elapsed = self.clock() - start
+        stats = self.stats[key]
+        stats.self_time += elapsed - child_time
+        # recursive activations are already covered by the outermost one
+        self._active[key] -= 1
+        if self._active[key] == 0:
+            stats.cumulative_time += elapsed
+        if len(self._stack) > 0:
+            self._stack[-1][2] += elapsed
+
+        path = tuple(self.stats[k].name for k, _, _ in self._stack) + (stats.name,)
+        self.collapsed[path] = self.collapsed.get(path, 0.0) + elapsed - child_time
+
+    def sorted_stats(self, key="cumulative_time"):
+        return sorted(self.stats.values(), key=lambda s: getattr(s, key), reverse=True)
+
+    def table(self, key="cumulative_time"):
+        lines = [f"{'calls':>10} {'self (ms)':>12} {'cumulative (ms)':>16}  function"]
+        for s in self.sorted_stats(key):
+            lines.append(
+                f"{s.calls:>10} {s.self_time * 1000:>12.3f} {s.cumulative_time * 1000:>16.3f}  {s.name}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_collapsed(self, stream):
+        "Write self time in microseconds as collapsed stacks, for flamegraph.pl."
+        for path, seconds in sorted(self.collapsed.items()):
+            stream.write(f"{';'.join(path)} {round(seconds * 1_000_000)}\n")
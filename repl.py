@@ -1,5 +1,5 @@
-from monkey_vm import VM
-from monkey_compiler import Compiler
+from monkey_vm import VM, new_globals_store
+from monkey_compiler import Compiler, new_symbol_table
 from lexer import Lexer
 from monkey_parser import Parser
 
@@ -10,6 +10,10 @@ def print_parser_errors(errs):
 
 
 if __name__ == "__main__":
+    # shared by every line, so that globals and constants carry over
+    constants = []
+    globals_store = new_globals_store()
+    symbol_table = new_symbol_table()
     while True:
         try:
             line = input(">> ")
@@ -23,13 +27,13 @@ if __name__ == "__main__":
         if len(par.errors) > 0:
             print_parser_errors(par.errors)
             continue
-        comp = Compiler()
+        comp = Compiler.new_with_state(symbol_table, constants)
         try:
             comp.compile(program)
         except RuntimeError as e:
             print(f"compilation failed: {e}")
             continue
-        machine = VM(comp.bytecode())
+        machine = VM(comp.bytecode(), globals_store=globals_store)
         try:
             machine.run()
         except RuntimeError as e:
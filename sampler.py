@@ -0,0 +1,79 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import List
+import monkey_compiler
+import monkey_vm
+import sys
+import threading
+
+
+@dataclass
+class LineSamples:
+    line: int
+    samples: int
+    fraction: float
+    source: str
+
+
+class SamplingProfiler:
+    """
+    Samples the instruction pointer of a VM running on the thread that
+    enters the `with` block, every `interval` seconds, from a background
+    thread. The VM itself is not instrumented: the sampler reads the `frame`
+    and `ip` locals of the running dispatch loop.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+        return False
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self._thread_id)
+        while frame is not None:
+            if frame.f_code is monkey_vm.VM._run.__code__:
+                ip = frame.f_locals.get("ip")
+                vm_frame = frame.f_locals.get("frame")
+                if ip is not None and vm_frame is not None:
+                    self.samples[(vm_frame.closure.fn, ip)] += 1
+                return
+            frame = frame.f_back
+
+    def line_report(self, source: str = "") -> List[LineSamples]:
+        "Samples per source line, hottest first."
+        lines = Counter()
+        for (fn, ip), n in self.samples.items():
+            lines[monkey_compiler.line_for(fn.positions, ip)] += n
+        total = sum(lines.values())
+        source_lines = source.splitlines()
+        report = []
+        for line, n in lines.most_common():
+            text = ""
+            if 0 < line <= len(source_lines):
+                text = source_lines[line - 1].strip()
+            report.append(LineSamples(line, n, n / total, text))
+        return report
+
+    def format_report(self, source: str = ""):
+        out = f"{'line':>6} {'samples':>8} {'%':>6}  source\n"
+        for entry in self.line_report(source):
+            out += f"{entry.line:>6} {entry.samples:>8} {entry.fraction * 100:>6.1f}  {entry.source}\n"
+        return out
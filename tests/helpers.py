@@ -0,0 +1,14 @@
+from lexer import Lexer
+from monkey_parser import Parser
+
+
+def parse(text: str):
+    return Parser(Lexer(text)).parse_program()
+
+
+def assemble(*instructions):
+    "The bytes of `instructions`, each from monkey_code.make, back to back."
+    out = bytearray()
+    for ins in instructions:
+        out.extend(ins)
+    return bytes(out)
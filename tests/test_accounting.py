@@ -0,0 +1,78 @@
+from accounting import AllocationAccountant
+import monkey_object
+import pipeline
+import pytest
+
+
+def test_counts_by_type():
+    accountant = AllocationAccountant()
+    pipeline.run(
+        'let a = [1, 2, 3]; "x" + "y"', engine="eval", accountant=accountant
+    )
+
+    assert accountant.by_type["ARRAY"].count == 1
+    assert accountant.by_type["INTEGER"].count == 3
+    assert accountant.by_type["STRING"].count == 3
+    assert accountant.by_type["ENVIRONMENT"].count == 1
+    assert accountant.total_bytes > 0
+    assert accountant.peak_live_bytes >= accountant.live_bytes
+
+
+def test_environments_are_counted():
+    accountant = AllocationAccountant()
+    pipeline.run(
+        "let f = fn(x) { x }; f(1); f(2);", engine="eval", accountant=accountant
+    )
+
+    assert accountant.by_type["ENVIRONMENT"].count == 3
+
+
+def test_vm_allocations():
+    accountant = AllocationAccountant()
+    result = pipeline.run("1 + 2 * 3 > 4", engine="vm", accountant=accountant)
+
+    assert accountant.by_type["INTEGER"].count == 2
+    assert accountant.count == result.stats.objects_allocated
+
+
+def test_largest():
+    accountant = AllocationAccountant(largest=2)
+    pipeline.run(
+        "[1, 2]; [1, 2, 3, 4, 5, 6, 7, 8]", engine="eval", accountant=accountant
+    )
+
+    largest = accountant.largest()
+    assert len(largest) == 2
+    assert largest[0][1] == "ARRAY[8]"
+    assert largest[0][0] >= largest[1][0]
+    assert accountant.report()["largest"][0]["object"] == "ARRAY[8]"
+
+
+def test_live_bytes_are_released():
+    accountant = AllocationAccountant()
+    with monkey_object.observe_allocations(accountant):
+        obj = monkey_object.String("x" * 1000)
+    assert accountant.live_bytes > 1000
+    del obj
+    assert accountant.live_bytes == 0
+    assert accountant.peak_live_bytes > 1000
+
+
+def test_quota_in_evaluator():
+    accountant = AllocationAccountant(quota=2000)
+    source = 'let s = "' + "a" * 40 + '"; [s + s + s + s + s, s + s + s + s + s]'
+    result = pipeline.run(
+        source,
+        engine="eval",
+        accountant=accountant,
+    )
+
+    assert isinstance(result.value, monkey_object.Error)
+    assert result.value.message == "memory quota of 2000 bytes exceeded"
+    assert result.stats.failed_phase == "run"
+
+
+def test_quota_in_vm():
+    accountant = AllocationAccountant(quota=100)
+    with pytest.raises(RuntimeError, match="memory quota of 100 bytes exceeded"):
+        pipeline.run("1 + 2", engine="vm", accountant=accountant)
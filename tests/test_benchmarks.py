@@ -0,0 +1,136 @@
+from benchmarks import components, engines, memory
+import benchmarks
+import pipeline
+
+
+def test_workloads_run_on_their_engines():
+    for workload in benchmarks.workloads(max_size=1_000):
+        for engine in workload.engines:
+            result = pipeline.run(workload.source, engine=engine)
+            assert result.errors == [], workload.name
+            assert result.value is not None
+
+
+def test_identifiers_are_distinct():
+    names = {benchmarks.identifier(i) for i in range(1000)}
+    assert len(names) == 1000
+    assert all(name.isalpha() for name in names)
+
+
+def test_measure_reports_every_stage():
+    workload = benchmarks.Workload("small", benchmarks.statements(50))
+    vm = memory.measure(workload, "vm")
+    assert [r.stage for r in vm] == ["lex", "parse", "compile", "run"]
+    evaluated = memory.measure(workload, "eval")
+    assert [r.stage for r in evaluated] == ["lex", "parse", "run"]
+    assert all(r.peak >= r.retained for r in vm + evaluated)
+    assert vm[0].retained > 0
+
+
+def test_compare():
+    baseline = memory.to_dict(
+        [
+            memory.StageMemory("a", "vm", "lex", 1000, 500),
+            memory.StageMemory("a", "vm", "parse", 1000, 500),
+        ]
+    )
+    current = memory.to_dict(
+        [
+            memory.StageMemory("a", "vm", "lex", 1050, 500),
+            memory.StageMemory("a", "vm", "parse", 1000, 800),
+            memory.StageMemory("b", "vm", "lex", 5000, 5000),
+        ]
+    )
+    regressions = memory.compare(baseline, current, tolerance=0.1)
+    assert [(r.stage, r.metric) for r in regressions] == [("parse", "retained")]
+    assert str(regressions[0]) == "a vm parse retained: 500 -> 800 bytes (+60.0%)"
+
+
+def test_main_writes_results(tmp_path, monkeypatch):
+    suite = [benchmarks.Workload("tiny", "1 + 2")]
+    monkeypatch.setattr(memory, "workloads", lambda max_size: suite)
+    out = tmp_path / "memory.json"
+    assert memory.main(["--output", str(out)]) == 0
+    assert memory.main(["--baseline", str(out), "--tolerance", "100"]) == 0
+
+
+CORPUS_RESULTS = {
+    "fibonacci": 610,
+    "counter": 200,
+    "string-building": 100,
+    "hash-lookups": 1050,
+    "array-push-rest": 1275,
+    "closures": 1425,
+}
+
+
+def test_corpus_results():
+    for workload in benchmarks.CORPUS:
+        for engine in workload.engines:
+            result = pipeline.run(workload.source, engine=engine)
+            assert result.errors == [], workload.name
+            if workload.name in CORPUS_RESULTS:
+                assert result.value.value == CORPUS_RESULTS[workload.name]
+
+
+def test_engine_throughput():
+    ticks = iter(range(100))
+    workload = benchmarks.Workload("tiny", "1 + 2")
+    result = engines.measure(
+        workload, "vm", repetitions=3, warmup=1, clock=lambda: next(ticks) * 0.5
+    )
+    assert result.repetitions == 3
+    assert result.mean == result.min == result.max == 2.0
+    assert result.stdev == 0.0
+
+
+def test_engine_dispatches():
+    corpus = [
+        benchmarks.Workload("branchy", "let a = 1; if (a > 0) { a + 1 } else { 0 }"),
+        benchmarks.Workload("eval-only", "1", ("eval",)),
+    ]
+    [result] = engines.dispatches(corpus)
+    assert result.workload == "branchy"
+    assert result.optimized < result.plain
+    assert "branchy" in engines.format_dispatches([result])
+
+
+def test_engine_compare():
+    baseline = engines.to_dict(
+        [
+            engines.Throughput("a", "vm", 10, 100.0, 1.0, 99.0, 101.0),
+            engines.Throughput("a", "eval", 10, 100.0, 1.0, 99.0, 101.0),
+        ]
+    )
+    current = engines.to_dict(
+        [
+            engines.Throughput("a", "vm", 10, 95.0, 1.0, 94.0, 96.0),
+            engines.Throughput("a", "eval", 10, 80.0, 1.0, 79.0, 81.0),
+        ]
+    )
+    regressions = engines.compare(baseline, current, threshold=0.1)
+    assert [str(r) for r in regressions] == ["a eval: 100.0 -> 80.0 ops/sec (-20.0%)"]
+
+
+def test_generate():
+    source = benchmarks.generate(
+        statements=20, depth=2, identifier_density=1.0, literal_size=4
+    )
+    assert benchmarks.generate(20, 2, 1.0, 4) == source
+    result = pipeline.run(source, engine="vm")
+    assert result.errors == []
+    # the first binding has nothing to refer to
+    assert source.splitlines()[0].count("va") == 1
+    for line in benchmarks.generate(5, 0, 0.0, 3).splitlines()[:-1]:
+        literal = line.split(" = ")[1].rstrip(";")
+        assert len(literal) == 3 and literal.isdigit()
+
+
+def test_component_scaling():
+    samples = components.run_suite([10, 20], depth=1, repetitions=1)
+    assert {s.component for s in samples} == set(components.UNITS)
+    lexer = [s for s in samples if s.component == "lexer"]
+    assert lexer[0].exponent is None
+    assert lexer[1].exponent is not None
+    assert lexer[1].units > lexer[0].units
+    assert "tokens/s" in components.format_table(samples)
@@ -0,0 +1,102 @@
+from monkey_code import Opcode, make, walk
+from monkey_compiler import Compiler, cfg, line_for
+from tests.helpers import assemble, parse
+import pipeline
+
+
+def test_threads_jumps_to_jumps():
+    instructions = assemble(
+        make(Opcode.TRUE),  # 0
+        make(Opcode.JUMP_NOT_TRUTHY, 8),  # 1
+        make(Opcode.JUMP, 11),  # 4
+        make(Opcode.NULL),  # 7
+        make(Opcode.JUMP, 4),  # 8
+        make(Opcode.POP),  # 11
+    )
+    optimized = cfg.optimize(instructions)
+    # both jumps end up at the POP, so the JUMP at 4 falls through to it and
+    # the NULL and the JUMP at 8 are unreachable
+    assert optimized.instructions == assemble(
+        make(Opcode.TRUE),
+        make(Opcode.JUMP_NOT_TRUTHY, 4),
+        make(Opcode.POP),
+    )
+    assert (optimized.removed, optimized.threaded) == (3, 2)
+
+
+def test_removes_code_after_returns():
+    compiler = Compiler()
+    compiler.compile(parse("fn(x) { if (x) { return 1; } else { return 2; } }"))
+    fn = compiler.bytecode().constants[-1]
+    optimized = cfg.optimize(fn.instructions, fn.positions)
+    assert [op for _, op, _ in walk(optimized.instructions)] == [
+        Opcode.GET_LOCAL,
+        Opcode.JUMP_NOT_TRUTHY,
+        Opcode.CONSTANT,
+        Opcode.RETURN_VALUE,
+        Opcode.CONSTANT,
+        Opcode.RETURN_VALUE,
+    ]
+    assert optimized.removed == 2
+    assert cfg.disassembly_diff(fn.instructions, optimized.instructions) == "\n".join(
+        [
+            "--- before",
+            "+++ after",
+            "@@ -1,8 +1,6 @@",
+            " OpGetLocal 0",
+            "-OpJumpNotTruthy 12",
+            "+OpJumpNotTruthy 9",
+            " OpConstant 0",
+            " OpReturnValue",
+            "-OpJump 16",
+            " OpConstant 1",
+            " OpReturnValue",
+            "-OpReturnValue",
+        ]
+    )
+
+
+def test_basic_blocks():
+    instructions = assemble(
+        make(Opcode.TRUE),
+        make(Opcode.JUMP_NOT_TRUTHY, 10),
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.JUMP, 11),
+        make(Opcode.NULL),
+        make(Opcode.POP),
+    )
+    decoded = list(walk(instructions))
+    targets = {1: 10, 3: 11}
+    blocks = cfg.basic_blocks(decoded, targets)
+    assert [(b.start, b.end, b.successors) for b in blocks] == [
+        (0, 2, [2, 1]),
+        (2, 4, [3]),
+        (4, 5, [3]),
+        (5, 6, []),
+    ]
+
+
+def test_positions_follow_instructions():
+    source = "let f = fn(x) {\nif (x) {\nreturn 1;\n}\nelse {\nreturn 2;\n}\n};"
+    compiler = Compiler(optimize=True)
+    compiler.compile(parse(source))
+    fn = compiler.bytecode().constants[-1]
+    constants = [
+        offset for offset, op, _ in walk(fn.instructions) if op == Opcode.CONSTANT
+    ]
+    assert [line_for(fn.positions, offset) for offset in constants] == [3, 6]
+
+
+def test_fewer_instructions_executed():
+    source = """
+    let classify = fn(x) {
+        if (x > 10) { if (x > 100) { 3 } else { 2 } } else { 1 }
+    };
+    classify(5) + classify(50) + classify(500)
+    """
+    plain = pipeline.run(source)
+    optimized = pipeline.run(source, optimize=True)
+    assert plain.value.value == optimized.value.value == 6
+    assert (
+        optimized.stats.instructions_executed < plain.stats.instructions_executed
+    )
@@ -1,5 +1,14 @@
 from typing import List
-from monkey_code import Instructions, Opcode, lookup, make, read_operands
+import struct
+from monkey_code import (
+    Instructions,
+    Opcode,
+    lookup,
+    make,
+    narrowest,
+    read_operands,
+    walk,
+)
 import pytest
 
 
@@ -9,6 +18,17 @@ class TestCode:
         [
             (Opcode.CONSTANT, [0xFFFE], bytes([Opcode.CONSTANT, 0xFF, 0xFE])),
             (Opcode.ADD, [], bytes([Opcode.ADD])),
+            (Opcode.GET_LOCAL, [255], bytes([Opcode.GET_LOCAL, 255])),
+            (
+                Opcode.CLOSURE,
+                [65534, 255],
+                bytes([Opcode.CLOSURE, 0xFF, 0xFE, 0xFF]),
+            ),
+            (
+                Opcode.GET_LOCAL_CONSTANT,
+                [255, 65534],
+                bytes([Opcode.GET_LOCAL_CONSTANT, 0xFF, 0xFF, 0xFE]),
+            ),
         ],
     )
     def test_make(self, op, operands, expected):
@@ -21,13 +41,17 @@ class TestCode:
         instructions = Instructions(
             [
                 make(Opcode.ADD),
+                make(Opcode.GET_LOCAL, 1),
                 make(Opcode.CONSTANT, 2),
                 make(Opcode.CONSTANT, 65535),
+                make(Opcode.CLOSURE, 65535, 255),
             ]
         )
         expected = """0000 OpAdd
-0001 OpConstant 2
-0004 OpConstant 65535
+0001 OpGetLocal 1
+0003 OpConstant 2
+0006 OpConstant 65535
+0009 OpClosure 65535 255
 """
         concatted = []
         for ins in instructions:
@@ -39,6 +63,8 @@ class TestCode:
         "op,operands,bytes_read",
         [
             (Opcode.CONSTANT, [65535], 2),
+            (Opcode.GET_LOCAL, [255], 1),
+            (Opcode.CLOSURE, [65535, 255], 3),
         ],
     )
     def test_read_operands(self, op: Opcode, operands: List[int], bytes_read: int):
@@ -48,3 +74,31 @@ class TestCode:
         assert n == bytes_read
         for op_read, want in zip(operands_read, operands):
             assert op_read == want
+
+    def test_walk(self):
+        instructions = [
+            make(Opcode.ADD),
+            make(Opcode.GET_LOCAL, 1),
+            make(Opcode.CLOSURE, 65535, 255),
+        ]
+        concatted = bytearray()
+        for ins in instructions:
+            concatted.extend(ins)
+        assert list(walk(concatted)) == [
+            (0, Opcode.ADD, []),
+            (1, Opcode.GET_LOCAL, [1]),
+            (3, Opcode.CLOSURE, [65535, 255]),
+        ]
+
+    def test_narrowest(self):
+        assert narrowest(Opcode.CONSTANT, 255) == Opcode.CONSTANT_SHORT
+        assert narrowest(Opcode.CONSTANT, 256) == Opcode.CONSTANT
+        assert narrowest(Opcode.JUMP, 0) == Opcode.JUMP_SHORT
+        assert narrowest(Opcode.ADD) == Opcode.ADD
+        assert str(Instructions(make(Opcode.PUSH_SMALL_INT, 255))) == (
+            "0000 OpPushSmallInt 255\n"
+        )
+
+    def test_one_byte_operand_out_of_range(self):
+        with pytest.raises(struct.error):
+            make(Opcode.GET_LOCAL, 256)
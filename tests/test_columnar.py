@@ -0,0 +1,109 @@
+import columnar
+import lexer
+import monkey_object
+import monkey_parser as parser
+import pytest
+
+
+def parse(text: str):
+    lex = lexer.Lexer(text)
+    par = parser.Parser(lex)
+    return par.parse_program()
+
+
+class TestColumnar:
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("price * qty", [20, 300, 0, 49]),
+            ("price * qty > 100", [False, True, False, False]),
+            ("-price + 1", [-9, -99, -4, -6]),
+            ("!(price > qty)", [False, False, False, True]),
+            ("qty / 2", [1, 1, 0, 3]),
+            ("if (qty > 2) { price } else { 0 - price }", [-10, 100, -5, 7]),
+            ("if (qty != 0) { price / qty } else { 0 }", [5, 33, 0, 1]),
+            ("7", [7, 7, 7, 7]),
+        ],
+    )
+    def test_vectorized(self, text, expected):
+        numpy = pytest.importorskip("numpy")
+        columns = {
+            "price": numpy.array([10, 100, 5, 7]),
+            "qty": numpy.array([2, 3, 0, 7]),
+        }
+        result = columnar.eval_columns(parse(text), columns)
+        assert isinstance(result, numpy.ndarray)
+        assert result.tolist() == expected
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "price * qty > 100",
+            "if (qty != 0) { price / qty } else { 0 }",
+            "if (flag) { price } else { qty }",
+        ],
+    )
+    def test_matches_row_evaluation(self, text):
+        numpy = pytest.importorskip("numpy")
+        columns = {
+            "price": numpy.array([10, 100, 5, 7]),
+            "qty": numpy.array([2, 3, 0, 7]),
+            "flag": numpy.array([True, False, True, False]),
+        }
+        node = parse(text)
+        vectorized = columnar.eval_columns(node, columns)
+        rows = columnar.eval_rows(node, columns, 4)
+        assert vectorized.tolist() == rows.tolist()
+
+    def test_division_by_zero(self):
+        numpy = pytest.importorskip("numpy")
+        columns = {"qty": numpy.array([1, 0])}
+        with pytest.raises(ZeroDivisionError):
+            columnar.eval_columns(parse("10 / qty"), columns)
+
+    def test_unsupported_node_falls_back(self):
+        numpy = pytest.importorskip("numpy")
+        columns = {"qty": numpy.array([1, 2])}
+        node = parse("if (qty > 1) { qty }")
+        with pytest.raises(columnar.UnsupportedNode):
+            columnar.compile_node(node, {"qty": columnar.INTEGER})
+        assert columnar.eval_columns(node, columns).tolist() == [None, 2]
+
+    def test_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(columnar, "numpy", None)
+        columns = {"price": [10, 100], "name": ["a", "b"]}
+        result = columnar.eval_columns(parse('price > 50; '), columns)
+        assert result == [False, True]
+        result = columnar.eval_columns(parse('name + "!"'), columns)
+        assert isinstance(result[0], monkey_object.String)
+        assert [r.value for r in result] == ["a!", "b!"]
+
+    def test_unsupported_column_dtype(self, monkeypatch):
+        numpy = pytest.importorskip("numpy")
+        columns = {"price": numpy.array([9.99, 50.5]), "qty": numpy.array([10, 2])}
+        with pytest.raises(columnar.UnsupportedColumn):
+            columnar.eval_columns(parse("price * qty > 100"), columns)
+        monkeypatch.setattr(columnar, "numpy", None)
+        with pytest.raises(columnar.UnsupportedColumn):
+            columnar.eval_columns(parse("price * qty > 100"), {"price": [9.99]})
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("a * b", [2**64, 2]),
+            ("-a - a - a - b", [-3 * 2**62 - 4, -5]),
+            ("if (a < 10) { a * b } else { 0 }", [0, 2]),
+        ],
+    )
+    def test_overflow_is_exact(self, text, expected):
+        numpy = pytest.importorskip("numpy")
+        columns = {"a": numpy.array([2**62, 1]), "b": numpy.array([4, 2])}
+        assert columnar.eval_columns(parse(text), columns).tolist() == expected
+
+    def test_out_of_range_literal(self):
+        numpy = pytest.importorskip("numpy")
+        node = parse("a * 99999999999999999999")
+        with pytest.raises(columnar.UnsupportedNode):
+            columnar.compile_node(node, {"a": columnar.INTEGER})
+        result = columnar.eval_columns(node, {"a": numpy.array([2, 1])})
+        assert result.tolist() == [2 * 99999999999999999999, 99999999999999999999]
@@ -0,0 +1,56 @@
+from monkey_code import Opcode, make, walk
+from monkey_compiler import Compiler, compact
+from tests.helpers import assemble, parse
+import monkey_object
+
+
+def test_compact():
+    constants = [monkey_object.Integer(7), monkey_object.Integer(1000)]
+    instructions = assemble(
+        make(Opcode.CONSTANT, 0),  # 0
+        make(Opcode.SET_GLOBAL, 3),  # 3
+        make(Opcode.GET_GLOBAL, 300),  # 6
+        make(Opcode.JUMP_NOT_TRUTHY, 15),  # 9
+        make(Opcode.CONSTANT, 1),  # 12
+        make(Opcode.POP),  # 15
+    )
+    compacted = compact.compact(instructions, [(0, 1), (12, 2)], constants)
+    assert compacted.instructions == assemble(
+        make(Opcode.PUSH_SMALL_INT, 7),
+        make(Opcode.SET_GLOBAL_SHORT, 3),
+        make(Opcode.GET_GLOBAL, 300),
+        make(Opcode.JUMP_NOT_TRUTHY_SHORT, 11),
+        make(Opcode.CONSTANT_SHORT, 1),
+        make(Opcode.POP),
+    )
+    assert compacted.positions == [(0, 1), (9, 2)]
+
+
+def test_far_jumps_stay_wide():
+    body = "; ".join(["x"] * 200)
+    compiler = Compiler(compact=True)
+    compiler.compile(parse(f"fn(x) {{ if (x) {{ {body} }} else {{ 1 }} }}"))
+    fn = compiler.bytecode().constants[-1]
+    jumps = [
+        (op, operands[0])
+        for _, op, operands in walk(fn.instructions)
+        if op.name.startswith("JUMP")
+    ]
+    # 200 GET_LOCAL, POP pairs put the end of the consequence past 255
+    assert [op for op, _ in jumps] == [Opcode.JUMP_NOT_TRUTHY, Opcode.JUMP]
+    assert all(target > 255 for _, target in jumps)
+
+
+def test_smaller_bytecode():
+    source = "let a = 1; let b = [a, 2, 3]; if (a > 0) { b[0] + 300 } else { 0 }"
+    sizes = []
+    for flag in (False, True):
+        compiler = Compiler(compact=flag)
+        compiler.compile(parse(source))
+        bytecode = compiler.bytecode()
+        sizes.append(len(bytecode.instructions))
+        ops = [op for _, op, _ in walk(bytecode.instructions)]
+    assert sizes[1] < sizes[0] * 0.8
+    # 300 is the only constant that does not fit PUSH_SMALL_INT
+    assert Opcode.CONSTANT not in ops
+    assert Opcode.CONSTANT_SHORT in ops
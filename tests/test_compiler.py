@@ -1,18 +1,16 @@
 from typing import Any, List
-from monkey_compiler import Compiler, Symbol, SymbolScope, SymbolTable
+from monkey_compiler import Compiler, Symbol, SymbolScope, SymbolTable, new_symbol_table
 from lexer import Lexer
 from monkey_parser import Parser
 import monkey_code as code
 from monkey_code import Opcode
 import monkey_object
 import pytest
+from tests.helpers import assemble
 
 
 def concat_instructions(instructions: List[code.Instructions]):
-    out = []
-    for ins in instructions:
-        out.extend(ins)
-    return code.Instructions(bytearray(out))
+    return code.Instructions(bytearray(assemble(*instructions)))
 
 
 def parse(text: str):
@@ -31,6 +29,12 @@ def check_constants(expected: List[Any], actual: List[monkey_object.Object]):
     for act, constant in zip(actual, expected):
         if isinstance(constant, int):
             check_integer_object(constant, act)
+        elif isinstance(constant, str):
+            assert isinstance(act, monkey_object.String)
+            assert act.value == constant
+        elif isinstance(constant, list):
+            assert isinstance(act, monkey_object.CompiledFunction)
+            check_instructions(constant, act.instructions)
 
 
 def check_instructions(
@@ -42,13 +46,16 @@ def check_instructions(
         assert a == ins
 
 
-def run_compiler_test(text, expected_constants, expected_instructions):
+def run_compiler_test(
+    text, expected_constants, expected_instructions, optimize=False
+):
     program = parse(text)
-    compiler = Compiler()
+    compiler = Compiler(optimize=optimize)
     compiler.compile(program)
     bytecode = compiler.bytecode()
     check_instructions(expected_instructions, bytecode.instructions)
     check_constants(expected_constants, bytecode.constants)
+    return compiler
 
 
 class TestCompiler:
@@ -294,6 +301,19 @@ class TestCompiler:
                     code.make(Opcode.POP),
                 ],
             ),
+            (
+                """
+                let x = 1;
+                let x = x;
+                """,
+                [1],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.SET_GLOBAL, 0),
+                    code.make(Opcode.GET_GLOBAL, 0),
+                    code.make(Opcode.SET_GLOBAL, 1),
+                ],
+            ),
         ],
     )
     def test_global_let_statements(
@@ -325,3 +345,736 @@ class TestCompiler:
         for sym in expected:
             result = glob.resolve(sym.name)
             assert result == sym
+
+    def test_positions(self):
+        program = parse("let a = 1;\nif (a > 2) {\n  a\n} else {\n  3\n};\n")
+        compiler = Compiler()
+        compiler.compile(program)
+        bytecode = compiler.bytecode()
+        # CONSTANT, SET_GLOBAL
+        assert bytecode.line_for(0) == 1
+        assert bytecode.line_for(3) == 1
+        # GET_GLOBAL, CONSTANT, GREATER_THAN, JUMP_NOT_TRUTHY
+        assert bytecode.line_for(6) == 2
+        assert bytecode.line_for(13) == 2
+        # GET_GLOBAL a
+        assert bytecode.line_for(16) == 3
+        # JUMP belongs to the if expression
+        assert bytecode.line_for(19) == 2
+        # CONSTANT 3
+        assert bytecode.line_for(22) == 5
+        # POP after the if expression statement
+        assert bytecode.line_for(25) == 2
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                "fn() { return 5 + 10 }",
+                [
+                    5,
+                    10,
+                    [
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.CONSTANT, 1),
+                        code.make(Opcode.ADD),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "fn() { 5 + 10 }",
+                [
+                    5,
+                    10,
+                    [
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.CONSTANT, 1),
+                        code.make(Opcode.ADD),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "fn() { 1; 2 }",
+                [
+                    1,
+                    2,
+                    [
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.POP),
+                        code.make(Opcode.CONSTANT, 1),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "fn() { }",
+                [[code.make(Opcode.RETURN)]],
+                [
+                    code.make(Opcode.CLOSURE, 0, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+        ],
+    )
+    def test_functions(self, text, expected_constants, expected_instructions):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                "fn() { 24 }();",
+                [24, [code.make(Opcode.CONSTANT, 0), code.make(Opcode.RETURN_VALUE)]],
+                [
+                    code.make(Opcode.CLOSURE, 1, 0),
+                    code.make(Opcode.CALL, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                """
+                let oneArg = fn(a) { a };
+                oneArg(24);
+                """,
+                [[code.make(Opcode.GET_LOCAL, 0), code.make(Opcode.RETURN_VALUE)], 24],
+                [
+                    code.make(Opcode.CLOSURE, 0, 0),
+                    code.make(Opcode.SET_GLOBAL, 0),
+                    code.make(Opcode.GET_GLOBAL, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.CALL, 1),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                """
+                let manyArg = fn(a, b, c) { a; b; c };
+                manyArg(24, 25, 26);
+                """,
+                [
+                    [
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.POP),
+                        code.make(Opcode.GET_LOCAL, 1),
+                        code.make(Opcode.POP),
+                        code.make(Opcode.GET_LOCAL, 2),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                    24,
+                    25,
+                    26,
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 0, 0),
+                    code.make(Opcode.SET_GLOBAL, 0),
+                    code.make(Opcode.GET_GLOBAL, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.CONSTANT, 2),
+                    code.make(Opcode.CONSTANT, 3),
+                    code.make(Opcode.CALL, 3),
+                    code.make(Opcode.POP),
+                ],
+            ),
+        ],
+    )
+    def test_function_calls(self, text, expected_constants, expected_instructions):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                """
+                let num = 55;
+                fn() { num }
+                """,
+                [
+                    55,
+                    [code.make(Opcode.GET_GLOBAL, 0), code.make(Opcode.RETURN_VALUE)],
+                ],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.SET_GLOBAL, 0),
+                    code.make(Opcode.CLOSURE, 1, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                """
+                fn() {
+                    let a = 55;
+                    let b = 77;
+                    a + b
+                }
+                """,
+                [
+                    55,
+                    77,
+                    [
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.SET_LOCAL, 0),
+                        code.make(Opcode.CONSTANT, 1),
+                        code.make(Opcode.SET_LOCAL, 1),
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.GET_LOCAL, 1),
+                        code.make(Opcode.ADD),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+        ],
+    )
+    def test_let_statement_scopes(
+        self, text, expected_constants, expected_instructions
+    ):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    def test_function_metadata(self):
+        compiler = Compiler()
+        compiler.compile(parse("let f = fn(a, b) {\n  let c = a;\n  c\n};"))
+        function = compiler.bytecode().constants[0]
+        assert function.num_parameters == 2
+        assert function.num_locals == 3
+        assert function.name == "f"
+        # GET_LOCAL a, SET_LOCAL c
+        assert function.positions[0] == (0, 2)
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                "fn(a) { fn(b) { a + b } }",
+                [
+                    [
+                        code.make(Opcode.GET_FREE, 0),
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.ADD),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                    [
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.CLOSURE, 0, 1),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 1, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "fn(a) { fn(b) { fn(c) { a + b + c } } }",
+                [
+                    [
+                        code.make(Opcode.GET_FREE, 0),
+                        code.make(Opcode.GET_FREE, 1),
+                        code.make(Opcode.ADD),
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.ADD),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                    [
+                        code.make(Opcode.GET_FREE, 0),
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.CLOSURE, 0, 2),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                    [
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.CLOSURE, 1, 1),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                """
+                let wrapper = fn() {
+                    let countDown = fn(x) { countDown(x - 1); };
+                    countDown(1);
+                };
+                """,
+                [
+                    1,
+                    [
+                        code.make(Opcode.CURRENT_CLOSURE),
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.SUB),
+                        code.make(Opcode.CALL, 1),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                    [
+                        code.make(Opcode.CLOSURE, 1, 0),
+                        code.make(Opcode.SET_LOCAL, 0),
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.CALL, 1),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.SET_GLOBAL, 0),
+                ],
+            ),
+        ],
+    )
+    def test_closures(self, text, expected_constants, expected_instructions):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                '"mon" + "key"',
+                ["mon", "key"],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.ADD),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "[1 + 2, 3]",
+                [1, 2, 3],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.ADD),
+                    code.make(Opcode.CONSTANT, 2),
+                    code.make(Opcode.ARRAY, 2),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "{}",
+                [],
+                [
+                    code.make(Opcode.HASH, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "{1: 2, 3: 4 * 5}",
+                [1, 2, 3, 4, 5],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.CONSTANT, 2),
+                    code.make(Opcode.CONSTANT, 3),
+                    code.make(Opcode.CONSTANT, 4),
+                    code.make(Opcode.MUL),
+                    code.make(Opcode.HASH, 4),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "[1, 2][1]",
+                [1, 2],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.ARRAY, 2),
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.INDEX),
+                    code.make(Opcode.POP),
+                ],
+            ),
+        ],
+    )
+    def test_data_structures(self, text, expected_constants, expected_instructions):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                "len([]); push([], 1);",
+                [1],
+                [
+                    code.make(Opcode.GET_BUILTIN, 0),
+                    code.make(Opcode.ARRAY, 0),
+                    code.make(Opcode.CALL, 1),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.GET_BUILTIN, 4),
+                    code.make(Opcode.ARRAY, 0),
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.CALL, 2),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "fn() { len([]) }",
+                [
+                    [
+                        code.make(Opcode.GET_BUILTIN, 0),
+                        code.make(Opcode.ARRAY, 0),
+                        code.make(Opcode.CALL, 1),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 0, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+        ],
+    )
+    def test_builtins(self, text, expected_constants, expected_instructions):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions,removed",
+        [
+            (
+                "1 + 2 * 3",
+                [7],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                ],
+                4,
+            ),
+            (
+                '-(10 / 3) < 2; "a" + "b"',
+                ["ab"],
+                [
+                    code.make(Opcode.TRUE),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                ],
+                7,
+            ),
+            (
+                "1 / 0; -true",
+                [1, 0],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.DIV_INT),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.TRUE),
+                    code.make(Opcode.MINUS),
+                    code.make(Opcode.POP),
+                ],
+                0,
+            ),
+            (
+                "fn(a) { !!(a > 1) }",
+                [
+                    1,
+                    [
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.CONSTANT, 0),
+                        code.make(Opcode.GREATER_THAN),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 1, 0),
+                    code.make(Opcode.POP),
+                ],
+                2,
+            ),
+            (
+                "fn(a) { !!a }",
+                [
+                    [
+                        code.make(Opcode.GET_LOCAL, 0),
+                        code.make(Opcode.BANG),
+                        code.make(Opcode.BANG),
+                        code.make(Opcode.RETURN_VALUE),
+                    ],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 0, 0),
+                    code.make(Opcode.POP),
+                ],
+                0,
+            ),
+            (
+                "if (!!(1 < 2)) { 10 } else { 20 }; 3333",
+                [10, 3333],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.POP),
+                ],
+                # CONSTANT CONSTANT GREATER_THAN BANG BANG JUMP_NOT_TRUTHY
+                # CONSTANT JUMP CONSTANT, down to the first CONSTANT
+                8,
+            ),
+            (
+                "if (false) { 10 }",
+                [],
+                [
+                    code.make(Opcode.NULL),
+                    code.make(Opcode.POP),
+                ],
+                4,
+            ),
+            (
+                "if (1) { 10 }",
+                [10],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                ],
+                4,
+            ),
+            (
+                "let a = 1; if (!!a) { a }",
+                [1],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.SET_GLOBAL, 0),
+                    code.make(Opcode.GET_GLOBAL, 0),
+                    code.make(Opcode.JUMP_NOT_TRUTHY, 18),
+                    code.make(Opcode.GET_GLOBAL, 0),
+                    code.make(Opcode.JUMP, 19),
+                    code.make(Opcode.NULL),
+                    code.make(Opcode.POP),
+                ],
+                2,
+            ),
+            (
+                "if (false) { let a = fn() { 1 }; } else { 2 }; a",
+                [2],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.GET_GLOBAL, 0),
+                    code.make(Opcode.POP),
+                ],
+                5,
+            ),
+        ],
+    )
+    def test_optimize(self, text, expected_constants, expected_instructions, removed):
+        compiler = run_compiler_test(
+            text, expected_constants, expected_instructions, optimize=True
+        )
+        assert compiler.report.instructions_removed == removed
+
+    def test_integer_specialization(self):
+        compiler = Compiler(optimize=True)
+        compiler.compile(
+            parse(
+                """
+                let a = 1;
+                let b = a * 2;
+                b - -a;
+                "x" + a;
+                let f = fn(p) { p + a };
+                let g = fn() { let x = a / 2; fn() { x * 3 } };
+                let h = fn() { f(1) + 1 };
+                """
+            )
+        )
+        bytecode = compiler.bytecode()
+
+        def arithmetic(instructions):
+            return [
+                op.name
+                for _, op, _ in code.walk(instructions)
+                if op.name.split("_")[0] in ("ADD", "SUB", "MUL", "DIV")
+            ]
+
+        assert arithmetic(bytecode.instructions) == ["MUL_INT", "SUB_INT", "ADD"]
+        functions = [
+            c for c in bytecode.constants if isinstance(c, monkey_object.CompiledFunction)
+        ]
+        assert [arithmetic(fn.instructions) for fn in functions] == [
+            ["ADD"],
+            ["MUL_INT"],
+            ["DIV_INT"],
+            ["ADD"],
+        ]
+        assert compiler.report.specialized == 4
+
+    def test_dead_branches_leave_the_report_alone(self):
+        compiler = Compiler(optimize=True)
+        compiler.compile(
+            parse("let a = 1; if (false) { fn() { if (true) { a * a } else { 2 } } }; a")
+        )
+        report = compiler.report
+        # only the outer branch counts; the function inside it is dropped
+        assert (report.branches, report.specialized) == (4, 0)
+
+    def test_static_types_do_not_outlive_a_program(self):
+        compiler = Compiler(optimize=True)
+        first = parse("let a = 1; let b = 2; a * b")
+        compiler.compile(first)
+        # the same node, as a reused id would look, now over strings
+        product = first.statements[-1]
+        second = parse('let a = "x"; let b = "y";')
+        second.statements.append(product)
+        compiler.compile(second)
+        ops = [op for _, op, _ in code.walk(compiler.bytecode().instructions)]
+        assert ops.count(Opcode.MUL_INT) == 1
+        assert ops.count(Opcode.MUL) == 1
+
+    def test_optimization_report(self):
+        compiler = Compiler(optimize=True)
+        compiler.compile(parse("if (!!true) { 1 + 2 } else { 3 }; fn(x) { !!(x == 1) }"))
+        report = compiler.report
+        # the branch's own BANG pair counts with the branch
+        assert (report.folded, report.bang_pairs, report.branches) == (2, 2, 6)
+        assert str(report) == (
+            "10 instructions removed: 2 by constant folding, 2 in BANG pairs, "
+            "6 in constant branches, 0 as dead code, 0 by fusion; 0 jumps threaded, "
+            "0 integer operations specialized"
+        )
+
+    @pytest.mark.parametrize(
+        "text,expected_constants,expected_instructions",
+        [
+            (
+                '1; "1"; 1; "1"',
+                [1, "1"],
+                [
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.CONSTANT, 0),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.CONSTANT, 1),
+                    code.make(Opcode.POP),
+                ],
+            ),
+            (
+                "fn() { 1 }; fn() { 1 }",
+                [
+                    1,
+                    [code.make(Opcode.CONSTANT, 0), code.make(Opcode.RETURN_VALUE)],
+                    [code.make(Opcode.CONSTANT, 0), code.make(Opcode.RETURN_VALUE)],
+                ],
+                [
+                    code.make(Opcode.CLOSURE, 1, 0),
+                    code.make(Opcode.POP),
+                    code.make(Opcode.CLOSURE, 2, 0),
+                    code.make(Opcode.POP),
+                ],
+            ),
+        ],
+    )
+    def test_constant_deduplication(
+        self, text, expected_constants, expected_instructions
+    ):
+        run_compiler_test(text, expected_constants, expected_instructions)
+
+    def test_deduplicated_pool_fits_operands(self):
+        compiler = Compiler()
+        compiler.compile(parse("1;" * 70000))
+        assert len(compiler.bytecode().constants) == 1
+
+    def test_new_with_state(self):
+        symbol_table = new_symbol_table()
+        constants = []
+        first = Compiler.new_with_state(symbol_table, constants)
+        first.compile(parse('let a = 1; "x"'))
+        second = Compiler.new_with_state(symbol_table, constants)
+        second.compile(parse('let b = a + 1; "x" + "y"'))
+        bytecode = second.bytecode()
+        check_instructions(
+            [
+                code.make(Opcode.GET_GLOBAL, 0),
+                code.make(Opcode.CONSTANT, 0),
+                code.make(Opcode.ADD),
+                code.make(Opcode.SET_GLOBAL, 1),
+                code.make(Opcode.CONSTANT, 1),
+                code.make(Opcode.CONSTANT, 2),
+                code.make(Opcode.ADD),
+                code.make(Opcode.POP),
+            ],
+            bytecode.instructions,
+        )
+        assert bytecode.constants is constants
+        check_constants([1, "x", "y"], constants)
+
+    def test_operand_out_of_range(self):
+        compiler = Compiler()
+        elements = ", ".join(["1"] * 65536)
+        with pytest.raises(RuntimeError, match="out of range for ARRAY"):
+            compiler.compile(parse(f"[{elements}]"))
+
+    def test_one_byte_operand_out_of_range(self):
+        compiler = Compiler()
+        arguments = ", ".join(["1"] * 256)
+        with pytest.raises(RuntimeError, match="out of range for CALL"):
+            compiler.compile(parse(f"len({arguments})"))
+
+    def test_resolve_free(self):
+        glob = SymbolTable()
+        glob.define("a")
+        first = SymbolTable(glob)
+        first.define("c")
+        second = SymbolTable(first)
+        second.define("e")
+        assert second.resolve("a") == Symbol("a", SymbolScope.GLOBAL, 0)
+        assert second.resolve("e") == Symbol("e", SymbolScope.LOCAL, 0)
+        assert second.resolve("c") == Symbol("c", SymbolScope.FREE, 0)
+        assert second.free_symbols == [Symbol("c", SymbolScope.LOCAL, 0)]
+        # the free symbol is only defined once
+        assert second.resolve("c") == Symbol("c", SymbolScope.FREE, 0)
+        assert len(second.free_symbols) == 1
+
+    def test_resolve_builtin(self):
+        glob = SymbolTable()
+        first = SymbolTable(glob)
+        second = SymbolTable(first)
+        for i, name in enumerate(["a", "c", "e", "f"]):
+            glob.define_builtin(i, name)
+        for table in [glob, first, second]:
+            assert table.resolve("e") == Symbol("e", SymbolScope.BUILTIN, 2)
+        assert second.free_symbols == []
+
+    def test_function_name(self):
+        glob = SymbolTable()
+        glob.define_function_name("a")
+        assert glob.resolve("a") == Symbol("a", SymbolScope.FUNCTION, 0)
+        glob.define("a")
+        assert glob.resolve("a") == Symbol("a", SymbolScope.GLOBAL, 0)
+
+    def test_resolve_local(self):
+        glob = SymbolTable()
+        glob.define("a")
+        glob.define("b")
+        local = SymbolTable(glob)
+        local.define("c")
+        local.define("d")
+        assert local.resolve("a") == Symbol("a", SymbolScope.GLOBAL, 0)
+        assert local.resolve("c") == Symbol("c", SymbolScope.LOCAL, 0)
+        assert local.resolve("d") == Symbol("d", SymbolScope.LOCAL, 1)
+        nested = SymbolTable(local)
+        nested.define("e")
+        assert nested.resolve("e") == Symbol("e", SymbolScope.LOCAL, 0)
+        assert nested.resolve("c") == Symbol("c", SymbolScope.FREE, 0)
+        with pytest.raises(KeyError):
+            nested.resolve("f")
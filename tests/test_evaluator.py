@@ -1,7 +1,8 @@
 from environment import Environment
 import lexer
 import monkey_parser as parser
-from evaluator import NULL, eval_node, TRUE, FALSE
+from evaluator import NULL, eval_node, TRUE, FALSE, Limits, limited
+import int_array
 import pytest
 import monkey_object
 
@@ -70,6 +71,10 @@ class TestEvaluator:
             ("(1 < 2) == false", FALSE),
             ("(1 > 2) == true", FALSE),
             ("(1 > 2) == false", TRUE),
+            ("let a = int_array([1]); a == a", TRUE),
+            ("let a = int_array([1]); a != a", FALSE),
+            ("int_array([1]) == int_array([1])", FALSE),
+            ("int_array([1]) != 1", TRUE),
         ],
     )
     def test_eval_boolean_expression(self, text, expected):
@@ -182,6 +187,7 @@ class TestEvaluator:
             ("let a = 5 * 5; a;", 25),
             ("let a = 5; let b = a; b;", 5),
             ("let a = 5; let b = a; let c = a + b + 5; c;", 15),
+            ("let a = 1; let a = a + 1; a;", 2),
         ],
     )
     def test_let_statements(self, text, expected):
@@ -379,3 +385,119 @@ class TestEvaluator:
             self.check_integer_object(evaluated, expected)
         else:
             self.check_null_object(evaluated)
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("int_array([1, 2, 3])", [1, 2, 3]),
+            ("int_array([1, 2, 3]) + 1", [2, 3, 4]),
+            ("10 - int_array([1, 2, 3])", [9, 8, 7]),
+            ("int_array([1, 2, 3]) * int_array([4, 5, 6])", [4, 10, 18]),
+            ("int_array([7, -7, 9]) / 2", [3, -4, 4]),
+            ("slice(int_array([1, 2, 3, 4]), 1, 3)", [2, 3]),
+            ("int_array([1, 2]) + int_array([1, 2, 3])", "length mismatch: 2 vs 3"),
+            ("int_array([1, 2]) / int_array([1, 0])", "division by zero"),
+            ("int_array([1, 2]) + true", "type mismatch: INT_ARRAY + BOOLEAN"),
+            ("int_array([1, 2]) > 1", "unknown operator: INT_ARRAY > INTEGER"),
+            ("int_array([1, 2]) < 1", "unknown operator: INT_ARRAY < INTEGER"),
+            ('int_array([1, "a"])', "elements of `int_array` must be INTEGER, got STRING"),
+        ],
+    )
+    def test_int_array_expressions(self, text, expected):
+        evaluated = self.eval_setup(text)
+        if isinstance(expected, str):
+            assert isinstance(evaluated, monkey_object.Error)
+            assert evaluated.message == expected
+        else:
+            assert isinstance(evaluated, monkey_object.IntArray)
+            assert [int(v) for v in evaluated.values] == expected
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("len(int_array([1, 2, 3]))", 3),
+            ("int_array([1, 2, 3])[1]", 2),
+            ("int_array([1, 2, 3])[3]", None),
+            ("sum(int_array([1, 2, 3]))", 6),
+            ("min(int_array([3, -1, 2]))", -1),
+            ("max(int_array([3, -1, 2]))", 3),
+            ("max(int_array([]))", None),
+            ("sum([1, 2])", "argument to `sum` must be INT_ARRAY, got ARRAY"),
+        ],
+    )
+    def test_int_array_builtins(self, text, expected):
+        evaluated = self.eval_setup(text)
+        if isinstance(expected, int):
+            self.check_integer_object(evaluated, expected)
+        elif isinstance(expected, str):
+            assert isinstance(evaluated, monkey_object.Error)
+            assert evaluated.message == expected
+        else:
+            self.check_null_object(evaluated)
+
+    @pytest.mark.parametrize("backend", ["numpy", "array"])
+    def test_int_array_overflow(self, backend, monkeypatch):
+        if backend == "numpy":
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setattr(int_array, "numpy", None)
+        evaluated = self.eval_setup("int_array([9223372036854775807]) + 1")
+        assert isinstance(evaluated, monkey_object.Error)
+        assert evaluated.message == "integer overflow"
+        evaluated = self.eval_setup(
+            "sum(int_array([9223372036854775807, 9223372036854775807]))"
+        )
+        self.check_integer_object(evaluated, 2 * (2**63 - 1))
+
+    def eval_limited(self, text, limits):
+        lex = lexer.Lexer(text)
+        par = parser.Parser(lex)
+        program = par.parse_program()
+        with limited(limits):
+            return eval_node(program, Environment())
+
+    @pytest.mark.parametrize(
+        "text,limits,expected",
+        [
+            # Program, ExpressionStatement, InfixExpression, 2 IntegerLiterals
+            ("1 + 2", Limits(fuel=5), 3),
+            ("1 + 2", Limits(fuel=4), "out of fuel after 4 steps"),
+            (
+                "let f = fn(n) { if (n == 0) { 0 } else { f(n - 1) } }; f(5)",
+                Limits(max_call_depth=6),
+                0,
+            ),
+            (
+                "let f = fn(n) { if (n == 0) { 0 } else { f(n - 1) } }; f(5)",
+                Limits(max_call_depth=5),
+                "maximum call depth of 5 exceeded",
+            ),
+            (
+                "let f = fn() { f() }; f()",
+                Limits(max_call_depth=20),
+                "maximum call depth of 20 exceeded",
+            ),
+            (
+                "let f = fn() { f() }; f()",
+                Limits(max_call_depth=500),
+                "maximum recursion depth exceeded",
+            ),
+            (
+                "let f = fn() { f() }; f()",
+                Limits(fuel=10**9),
+                "maximum recursion depth exceeded",
+            ),
+            (
+                "1; " * 2000,
+                Limits(timeout=0),
+                "deadline of 0s exceeded",
+            ),
+        ],
+    )
+    def test_limits(self, text, limits, expected):
+        evaluated = self.eval_limited(text, limits)
+        if isinstance(expected, int):
+            self.check_integer_object(evaluated, expected)
+        else:
+            assert isinstance(evaluated, monkey_object.Error)
+            assert evaluated.message == expected
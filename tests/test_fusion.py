@@ -0,0 +1,70 @@
+from collections import Counter
+from monkey_code import Opcode, make, walk
+from monkey_compiler import Compiler, fusion
+from tests.helpers import assemble, parse
+
+
+def test_fuse():
+    instructions = assemble(
+        make(Opcode.CONSTANT, 1),  # 0
+        make(Opcode.SET_GLOBAL, 0),  # 3
+        make(Opcode.GET_GLOBAL, 0),  # 6
+        make(Opcode.CONSTANT, 2),  # 9
+        make(Opcode.GREATER_THAN),  # 12
+        make(Opcode.JUMP_NOT_TRUTHY, 20),  # 13
+        make(Opcode.GET_LOCAL, 0),  # 16
+        make(Opcode.POP),  # 18
+        make(Opcode.NULL),  # 19
+        make(Opcode.POP),  # 20
+    )
+    fused = fusion.fuse(instructions, [(0, 1), (16, 2)])
+    assert fused.instructions == assemble(
+        make(Opcode.CONSTANT_SET_GLOBAL, 1, 0),
+        make(Opcode.GET_GLOBAL_CONSTANT, 0, 2),
+        make(Opcode.GREATER_THAN_JUMP_NOT_TRUTHY, 17),
+        make(Opcode.GET_LOCAL, 0),
+        make(Opcode.POP),
+        make(Opcode.NULL),
+        make(Opcode.POP),
+    )
+    assert fused.positions == [(0, 1), (13, 2)]
+    assert fused.removed == 3
+
+
+def test_no_fusion_onto_a_jump_target():
+    instructions = assemble(
+        make(Opcode.TRUE),  # 0
+        make(Opcode.JUMP_NOT_TRUTHY, 6),  # 1
+        make(Opcode.GET_LOCAL, 0),  # 4
+        make(Opcode.CONSTANT, 0),  # 6
+    )
+    fused = fusion.fuse(instructions)
+    assert [op for _, op, _ in walk(fused.instructions)] == [
+        Opcode.TRUE,
+        Opcode.JUMP_NOT_TRUTHY,
+        Opcode.GET_LOCAL,
+        Opcode.CONSTANT,
+    ]
+
+
+def test_compiler_superinstructions():
+    compiler = Compiler(superinstructions=True)
+    compiler.compile(parse("let f = fn(n) { if (n == 0) { 1 } else { f(n - 1) } };"))
+    fn = compiler.bytecode().constants[-1]
+    ops = [op for _, op, _ in walk(fn.instructions)]
+    assert ops[:2] == [Opcode.GET_LOCAL_CONSTANT, Opcode.EQUAL_JUMP_NOT_TRUTHY]
+    assert compiler.report.fused == 3
+
+
+def test_rank():
+    pairs = Counter(
+        {
+            ("GET_LOCAL", "CONSTANT"): 10,
+            ("GREATER_THAN", "JUMP_NOT_TRUTHY"): 30,
+            ("CALL", "POP"): 50,
+        }
+    )
+    assert fusion.rank(pairs) == [
+        (Opcode.GREATER_THAN_JUMP_NOT_TRUTHY, 30),
+        (Opcode.GET_LOCAL_CONSTANT, 10),
+    ]
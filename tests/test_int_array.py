@@ -0,0 +1,66 @@
+import int_array
+import pytest
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(int_array, "numpy", None)
+    return request.param
+
+
+class TestIntArray:
+    @pytest.mark.parametrize(
+        "operator,left,right,expected",
+        [
+            ("+", [1, 2, 3], 1, [2, 3, 4]),
+            ("-", 10, [1, 2, 3], [9, 8, 7]),
+            ("*", [1, 2, 3], [4, 5, 6], [4, 10, 18]),
+            ("/", [7, -7, 9], 2, [3, -4, 4]),
+        ],
+    )
+    def test_binary(self, backend, operator, left, right, expected):
+        if isinstance(left, list):
+            left = int_array.new(left)
+        if isinstance(right, list):
+            right = int_array.new(right)
+        result = int_array.binary(operator, left, right)
+        assert [int(v) for v in result] == expected
+
+    def test_binary_errors(self, backend):
+        with pytest.raises(ValueError):
+            int_array.binary("+", int_array.new([1]), int_array.new([1, 2]))
+        with pytest.raises(ZeroDivisionError):
+            int_array.binary("/", int_array.new([1, 2]), int_array.new([1, 0]))
+
+    def test_reductions(self, backend):
+        values = int_array.new([3, -1, 2])
+        assert int_array.total(values) == 4
+        assert int_array.minimum(values) == -1
+        assert int_array.maximum(values) == 3
+        assert int_array.element(values, 2) == 2
+
+    @pytest.mark.parametrize(
+        "operator,left,right",
+        [
+            ("+", [2**63 - 1], 1),
+            ("-", [-(2**63)], [1]),
+            ("*", 2, [2**62]),
+            ("*", [-(2**63)], -1),
+            ("/", [-(2**63)], -1),
+        ],
+    )
+    def test_binary_overflow(self, backend, operator, left, right):
+        if isinstance(left, list):
+            left = int_array.new(left)
+        if isinstance(right, list):
+            right = int_array.new(right)
+        with pytest.raises(OverflowError, match="integer overflow"):
+            int_array.binary(operator, left, right)
+
+    def test_total_is_exact(self, backend):
+        values = int_array.new([2**63 - 1, 2**63 - 1, -5])
+        assert int_array.total(values) == 2**64 - 7
+        assert int_array.total(int_array.new([-(2**63)] * 3)) == -3 * 2**63
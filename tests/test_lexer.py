@@ -127,3 +127,24 @@ class TestLexer:
         tok = lexer.next_token()
         assert tok.type == token_type
         assert tok.literal == token_name
+
+    def test_token_positions(self):
+        lex = Lexer('let x = 5;\n  x + "a\nb";\n')
+        positions = []
+        while True:
+            tok = lex.next_token()
+            positions.append((tok.literal, tok.line, tok.column))
+            if tok.type == TokenType.Eof:
+                break
+        assert positions == [
+            ("let", 1, 1),
+            ("x", 1, 5),
+            ("=", 1, 7),
+            ("5", 1, 9),
+            (";", 1, 10),
+            ("x", 2, 3),
+            ("+", 2, 5),
+            ("a\nb", 2, 7),
+            (";", 3, 3),
+            ("", 4, 1),
+        ]
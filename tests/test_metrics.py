@@ -0,0 +1,107 @@
+from metrics import Counter, Histogram, InterpreterMetrics, Registry
+import metrics
+import monkey_vm
+import pipeline
+import pytest
+import threading
+import urllib.request
+
+
+class TestMetrics:
+    def test_counter_exposition(self):
+        registry = Registry()
+        counter = registry.counter("jobs_total", "Jobs.", ["kind"])
+        counter.inc(kind="a")
+        counter.inc(2, kind='b"c')
+        assert registry.exposition() == (
+            "# HELP jobs_total Jobs.\n"
+            "# TYPE jobs_total counter\n"
+            'jobs_total{kind="a"} 1\n'
+            'jobs_total{kind="b\\"c"} 2\n'
+        )
+
+    def test_histogram_exposition(self):
+        histogram = Histogram("latency_seconds", "Latency.", buckets=[0.1, 1])
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(3)
+        assert list(histogram.samples()) == [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            "latency_seconds_sum 3.55",
+            "latency_seconds_count 3",
+        ]
+
+    def test_registering_twice_returns_existing(self):
+        registry = Registry()
+        assert registry.counter("a", "A.") is registry.counter("a", "A.")
+
+    def test_threads(self):
+        counter = Counter("n", "N.")
+        histogram = Histogram("h", "H.")
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+                histogram.observe(0.001)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert counter.value() == 8000
+        assert histogram.count() == 8000
+
+    def test_pipeline_feeds_metrics(self):
+        m = InterpreterMetrics()
+        pipeline.run("1 + 2", metrics=m)
+        pipeline.run("let = 1", metrics=m)
+        pipeline.run("-true", engine="eval", metrics=m)
+        with pytest.raises(RuntimeError):
+            pipeline.run("-true", metrics=m)
+        with pytest.raises(RuntimeError):
+            pipeline.run("undefined", metrics=m)
+        with pytest.raises(monkey_vm.InstructionBudgetExceeded):
+            pipeline.run(
+                "1; 2", metrics=m, vm_limits=monkey_vm.Limits(max_instructions=1)
+            )
+        assert m.scripts.value(engine="vm") == 5
+        assert m.scripts.value(engine="eval") == 1
+        assert m.parse_errors.value() == 1
+        assert m.compile_errors.value() == 1
+        assert m.runtime_errors.value(engine="vm") == 2
+        assert m.runtime_errors.value(engine="eval") == 1
+        assert m.instructions.value() == 4 + 2 + 1
+        assert m.phase_seconds.count(phase="lex") == 6
+        assert m.phase_seconds.count(phase="compile") == 4
+        assert m.phase_seconds.count(phase="run") == 4
+        assert "monkey_scripts_total" in m.registry.exposition()
+
+    def test_pipeline_counts_vm_exceptions(self):
+        m = InterpreterMetrics()
+        with pytest.raises(ZeroDivisionError):
+            pipeline.run("1 / 0", metrics=m)
+        assert m.runtime_errors.value(engine="vm") == 1
+        assert m.compile_errors.value() == 0
+
+    def test_write_file(self, tmp_path):
+        registry = Registry()
+        registry.counter("a_total", "A.").inc()
+        path = tmp_path / "monkey.prom"
+        metrics.write_file(registry, str(path))
+        assert path.read_text() == registry.exposition()
+        assert [p.name for p in tmp_path.iterdir()] == ["monkey.prom"]
+
+    def test_http(self):
+        registry = Registry()
+        registry.counter("a_total", "A.").inc()
+        server = metrics.serve(registry, port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                assert response.read().decode() == registry.exposition()
+        finally:
+            server.shutdown()
+            server.server_close()
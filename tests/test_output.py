@@ -0,0 +1,60 @@
+from environment import Environment
+from evaluator import eval_node
+import io
+import lexer
+import monkey_compiler as compiler
+import monkey_parser as parser
+import monkey_vm
+import output
+
+
+def parse(text: str):
+    lex = lexer.Lexer(text)
+    par = parser.Parser(lex)
+    return par.parse_program()
+
+
+class TestOutput:
+    def test_puts_defaults_to_stdout(self, capsys):
+        eval_node(parse('puts("a", 1)'), Environment())
+        assert capsys.readouterr().out == "a\n1\n"
+
+    def test_redirect_collects(self, capsys):
+        sink = output.CollectingSink()
+        with output.redirect(sink):
+            eval_node(parse('puts("a"); puts([1, 2])'), Environment())
+        assert sink.lines == ["a", "[1, 2]"]
+        assert sink.getvalue() == "a\n[1, 2]\n"
+        assert capsys.readouterr().out == ""
+
+    def test_buffered_sink(self):
+        stream = io.StringIO()
+        sink = output.BufferedSink(stream, flush_size=6)
+        sink.write("ab")
+        assert stream.getvalue() == ""
+        sink.write("cd")
+        assert stream.getvalue() == "ab\ncd\n"
+        sink.write("e")
+        sink.flush()
+        assert stream.getvalue() == "ab\ncd\ne\n"
+
+    def test_redirect_flushes_on_exit(self):
+        stream = io.StringIO()
+        with output.redirect(output.BufferedSink(stream)):
+            eval_node(parse('puts("x")'), Environment())
+            assert stream.getvalue() == ""
+        assert stream.getvalue() == "x\n"
+
+    def test_callback_sink(self):
+        lines = []
+        with output.redirect(output.CallbackSink(lines.append)):
+            eval_node(parse('puts(1, 2)'), Environment())
+        assert lines == ["1", "2"]
+
+    def test_vm_sink_is_per_run(self):
+        comp = compiler.Compiler()
+        comp.compile(parse("1"))
+        sink = output.CollectingSink()
+        vm = monkey_vm.VM(comp.bytecode(), sink=sink)
+        vm.run()
+        assert output.current() is not sink
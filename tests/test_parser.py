@@ -270,6 +270,15 @@ class TestParser:
         for param, ident in zip(function.parameters, params):
             self.check_literal_expression(param, ident)
 
+    def test_function_literal_with_name(self):
+        program = self.parse("let myFunction = fn() { };")
+        assert len(program.statements) == 1
+        stmt = program.statements[0]
+        assert isinstance(stmt, ast.LetStatement)
+        function = stmt.value
+        assert isinstance(function, ast.FunctionLiteral)
+        assert function.name == "myFunction"
+
     def test_call_expression(self):
         text = "add(1, 2 * 3, 4 + 5)"
         program = self.parse(text)
@@ -0,0 +1,86 @@
+import evaluator
+import monkey_ast as ast
+import monkey_object
+import output
+import pipeline
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+
+
+class TestPipeline:
+    def test_vm_stats(self):
+        result = pipeline.run("let a = 1; a + 2 * 3")
+        assert result.errors == []
+        assert result.value.value == 7
+        stats = result.stats
+        assert stats.engine == "vm"
+        assert stats.tokens == 10
+        # Program, Let, Identifier, 1, ExpressionStatement, +, a, *, 2, 3
+        assert stats.ast_nodes == 10
+        assert stats.constants == 3
+        # CONSTANT SET_GLOBAL GET_GLOBAL CONSTANT CONSTANT MUL ADD POP
+        assert stats.bytecode_size == 18
+        assert stats.instructions_executed == 8
+        # the results of MUL and ADD
+        assert stats.objects_allocated == 2
+        assert stats.total_time >= stats.run_time > 0
+
+    def test_bytecode_size_includes_functions(self):
+        result = pipeline.run("let f = fn(a) { a + 1 }; f(1)")
+        # CLOSURE SET_GLOBAL GET_GLOBAL CONSTANT CALL POP, and in f
+        # GET_LOCAL CONSTANT ADD RETURN_VALUE
+        assert result.stats.bytecode_size == 16 + 7
+
+    def test_optimize(self):
+        result = pipeline.run("if (1 < 2) { 3 * 4 }", optimize=True)
+        assert result.value.value == 12
+        # CONSTANT CONSTANT GREATER_THAN JUMP_NOT_TRUTHY CONSTANT CONSTANT MUL
+        # JUMP NULL, down to one CONSTANT
+        assert result.stats.instructions_removed == 8
+        assert result.stats.instructions_executed == 2
+
+    def test_eval_stats(self):
+        sink = output.CollectingSink()
+        result = pipeline.run('puts("hi"); [1, 2][0]', engine="eval", sink=sink)
+        assert result.value.value == 1
+        assert sink.lines == ["hi"]
+        stats = result.stats
+        assert stats.bytecode_size == 0
+        assert stats.instructions_executed == 0
+        # "hi", 1, 2, the array and the index 0
+        assert stats.objects_allocated == 5
+
+    def test_eval_recursion_depth(self):
+        result = pipeline.run(
+            "let f = fn(n) { if (n == 0) { 0 } else { f(n - 1) } }; f(1000)",
+            engine="eval",
+            eval_limits=evaluator.Limits(max_call_depth=500),
+        )
+        assert isinstance(result.value, monkey_object.Error)
+        assert result.stats.failed_phase == "run"
+
+    def test_parser_errors(self):
+        result = pipeline.run("let = 1;")
+        assert result.value is None
+        assert len(result.errors) > 0
+
+    def test_allocation_observer_is_removed(self):
+        counter = pipeline.AllocationCounter()
+        with monkey_object.observe_allocations(counter):
+            monkey_object.Integer(1)
+            monkey_object.Null()
+        monkey_object.Integer(2)
+        assert counter.count == 2
+        assert "__init__" not in monkey_object.Null.__dict__
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            pipeline.run("1", engine="jit")
+
+    def test_token_list_matches_lexer(self):
+        source = "let add = fn(a, b) { a + b }; add(1, 2);"
+        direct = Parser(Lexer(source)).parse_program()
+        replayed = Parser(pipeline.TokenList(pipeline.lex(source))).parse_program()
+        assert direct.string() == replayed.string()
+        assert sum(1 for _ in ast.walk(direct)) == sum(1 for _ in ast.walk(replayed))
@@ -0,0 +1,73 @@
+from environment import Environment
+from evaluator import eval_node, profiled
+from profiler import Profiler
+import io
+import itertools
+import lexer
+import monkey_parser as parser
+
+
+def parse(text: str):
+    lex = lexer.Lexer(text)
+    par = parser.Parser(lex)
+    return par.parse_program()
+
+
+def run_profiled(text):
+    # every clock reading advances time by one second
+    profiler = Profiler(clock=itertools.count().__next__)
+    with profiled(profiler):
+        eval_node(parse(text), Environment())
+    return profiler
+
+
+class TestProfiler:
+    def test_call_counts(self):
+        profiler = run_profiled(
+            """
+            let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+            let double = fn(x) { x * 2 };
+            double(fib(5));
+            fn(y) { y }(1);
+            """
+        )
+        calls = {s.name: s.calls for s in profiler.stats.values()}
+        assert calls == {"fib": 15, "double": 1, "<anonymous fn(y)>": 1}
+
+    def test_self_and_cumulative_time(self):
+        profiler = run_profiled(
+            """
+            let inner = fn() { 1 };
+            let outer = fn() { inner() + inner() };
+            outer();
+            """
+        )
+        stats = {s.name: s for s in profiler.stats.values()}
+        # clock reads: outer enter 0, inner 1..2, inner 3..4, outer exit 5
+        assert stats["inner"].cumulative_time == 2
+        assert stats["inner"].self_time == 2
+        assert stats["outer"].cumulative_time == 5
+        assert stats["outer"].self_time == 3
+        assert [s.name for s in profiler.sorted_stats()] == ["outer", "inner"]
+        assert profiler.table().splitlines()[1].split() == ["1", "3000.000", "5000.000", "outer"]
+
+    def test_recursion_counts_cumulative_once(self):
+        profiler = run_profiled(
+            "let f = fn(n) { if (n == 0) { 0 } else { f(n - 1) } }; f(2);"
+        )
+        (stats,) = profiler.stats.values()
+        assert stats.calls == 3
+        assert stats.cumulative_time == 5
+        assert stats.self_time == 5
+
+    def test_collapsed_stacks(self):
+        profiler = run_profiled(
+            """
+            let inner = fn() { 1 };
+            let outer = fn() { inner() };
+            outer();
+            """
+        )
+        out = io.StringIO()
+        profiler.write_collapsed(out)
+        assert out.getvalue() == "outer 2000000\nouter;inner 1000000\n"
@@ -0,0 +1,44 @@
+from sampler import SamplingProfiler
+import lexer
+import monkey_compiler as compiler
+import monkey_parser as parser
+import monkey_vm
+
+
+def compile_source(text: str):
+    lex = lexer.Lexer(text)
+    par = parser.Parser(lex)
+    comp = compiler.Compiler()
+    comp.compile(par.parse_program())
+    return comp.bytecode()
+
+
+class TestSampler:
+    def test_line_report(self):
+        source = "let a = 1;\n" + "a + a;\n" * 3000 + "a;\n"
+        bytecode = compile_source(source)
+        with SamplingProfiler(interval=0.0005) as profiler:
+            for _ in range(5):
+                monkey_vm.VM(bytecode).run()
+        assert sum(profiler.samples.values()) > 0
+        report = profiler.line_report(source)
+        assert all(1 <= entry.line <= 3002 for entry in report)
+        assert abs(sum(entry.fraction for entry in report) - 1) < 1e-9
+        assert "a + a;" in {entry.source for entry in report}
+        assert profiler.format_report(source).startswith("  line")
+
+    def test_sample_outside_vm(self):
+        profiler = SamplingProfiler()
+        profiler._thread_id = None
+        profiler.sample()
+        assert len(profiler.samples) == 0
+
+    def test_samples_inside_functions(self):
+        source = "let f = fn(a) {\n" + "  a + a;\n" * 2000 + "  a\n};\nf(1);\n"
+        bytecode = compile_source(source)
+        with SamplingProfiler(interval=0.0005) as profiler:
+            for _ in range(5):
+                monkey_vm.VM(bytecode).run()
+        report = profiler.line_report(source)
+        assert all(1 <= entry.line <= 2004 for entry in report)
+        assert "a + a;" in {entry.source for entry in report}
@@ -0,0 +1,67 @@
+from tracer import Tracer
+import io
+import itertools
+import json
+import output
+import pipeline
+
+
+class TestTracer:
+    def test_eval_trace(self):
+        tracer = Tracer()
+        sink = output.CollectingSink()
+        result = pipeline.run(
+            """
+            let inner = fn(x) { puts(x); x };
+            let outer = fn() { inner(1) + inner(2) };
+            outer();
+            """,
+            engine="eval",
+            sink=sink,
+            tracer=tracer,
+        )
+        assert result.value.value == 3
+        assert sink.lines == ["1", "2"]
+        names = [e["name"] for e in tracer.events]
+        assert names == [
+            "lex",
+            "parse",
+            "puts",
+            "inner",
+            "puts",
+            "inner",
+            "outer",
+            "eval",
+        ]
+        spans = {e["name"]: e for e in tracer.events if e["ph"] == "X"}
+        outer = spans["outer"]
+        for e in tracer.events:
+            if e["name"] in ("inner", "puts"):
+                assert outer["ts"] <= e["ts"] <= outer["ts"] + outer["dur"]
+        puts = [e for e in tracer.events if e["name"] == "puts"]
+        assert puts[0]["ph"] == "i"
+        assert puts[0]["args"] == {"line": "1"}
+
+    def test_vm_trace(self):
+        tracer = Tracer()
+        pipeline.run("1 + 2", tracer=tracer)
+        names = [e["name"] for e in tracer.events]
+        assert names == ["lex", "parse", "compile", "vm.run"]
+
+    def test_ring_buffer(self):
+        tracer = Tracer(capacity=2)
+        for name in ["a", "b", "c"]:
+            tracer.instant(name)
+        assert [e["name"] for e in tracer.events] == ["b", "c"]
+
+    def test_export(self):
+        tracer = Tracer(clock=itertools.count(0, 1000).__next__)
+        with tracer.span("phase"):
+            tracer.instant("tick")
+        out = io.StringIO()
+        tracer.write(out)
+        trace = json.loads(out.getvalue())
+        assert trace["displayTimeUnit"] == "ms"
+        tick, phase = trace["traceEvents"]
+        assert tick["ts"] == 2 and tick["ph"] == "i"
+        assert phase["ts"] == 1 and phase["dur"] == 2 and phase["ph"] == "X"
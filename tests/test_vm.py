@@ -1,8 +1,20 @@
-from monkey_vm import NULL, VM
+from monkey_vm import (
+    NULL,
+    VM,
+    DeadlineExceeded,
+    ExecutionLimitExceeded,
+    InstructionBudgetExceeded,
+    Limits,
+    StackDepthExceeded,
+)
 from typing import Any
+import int_array
+import json
 import lexer
+import monkey_code as code
 import monkey_object
 import monkey_parser as parser
+import monkey_vm
 import monkey_compiler as compiler
 import pytest
 
@@ -40,6 +52,19 @@ def check_expected_object(expected: Any, actual: monkey_object.Object):
         check_integer_object(expected, actual)
     elif isinstance(expected, monkey_object.Null):
         assert actual == NULL
+    elif isinstance(expected, str):
+        assert isinstance(actual, monkey_object.String)
+        assert actual.value == expected
+    elif isinstance(expected, list):
+        assert isinstance(actual, monkey_object.Array)
+        assert len(actual.elements) == len(expected)
+        for want, element in zip(expected, actual.elements):
+            check_expected_object(want, element)
+    elif isinstance(expected, dict):
+        assert isinstance(actual, monkey_object.Hash)
+        assert len(actual.pairs) == len(expected)
+        for key, want in expected.items():
+            check_expected_object(want, actual.pairs[key.hash_key()].value)
 
 
 @pytest.mark.parametrize(
@@ -96,6 +121,10 @@ def test_integer_arithmetic(text: str, expected: int):
         ("!!false", False),
         ("!!5", True),
         ("!(if (false) { 5; })", True),
+        ("let a = int_array([1]); a == a", True),
+        ("let a = int_array([1]); a != a", False),
+        ("int_array([1]) == int_array([1])", False),
+        ("int_array([1]) != 1", True),
     ],
 )
 def test_boolean_expression(text: str, expected: bool):
@@ -127,7 +156,512 @@ def test_conditionals(text: str, expected: int):
         ("let one = 1; one", 1),
         ("let one = 1; let two = 2; one + two", 3),
         ("let one = 1; let two = one + one; one + two", 3),
+        ("let x = 1; let x = x + 1; x", 2),
     ]
 )
 def test_global_let_statements(text: str, expected: int):
     run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("let fivePlusTen = fn() { 5 + 10; }; fivePlusTen();", 15),
+        ("let one = fn() { 1; }; let two = fn() { 2; }; one() + two()", 3),
+        ("let a = fn() { 1 }; let b = fn() { a() + 1 }; let c = fn() { b() + 1 }; c();", 3),
+        ("let earlyExit = fn() { return 99; 100; }; earlyExit();", 99),
+        ("let earlyExit = fn() { return 99; return 100; }; earlyExit();", 99),
+        ("let noReturn = fn() { }; noReturn();", NULL),
+        ("let noReturn = fn() { }; let noReturnTwo = fn() { noReturn(); }; noReturnTwo();", NULL),
+        ("let returnsOne = fn() { 1; }; let returnsOneReturner = fn() { returnsOne; }; returnsOneReturner()();", 1),
+        ("let one = fn() { let one = 1; one }; one();", 1),
+        ("let oneAndTwo = fn() { let one = 1; let two = 2; one + two; }; oneAndTwo();", 3),
+        ("fn() { let y = 1; let y = y + 1; y }()", 2),
+        (
+            """
+            let firstFoobar = fn() { let foobar = 50; foobar; };
+            let secondFoobar = fn() { let foobar = 100; foobar; };
+            firstFoobar() + secondFoobar();
+            """,
+            150,
+        ),
+        (
+            """
+            let globalSeed = 50;
+            let minusOne = fn() { let num = 1; globalSeed - num; };
+            let minusTwo = fn() { let num = 2; globalSeed - num; };
+            minusOne() + minusTwo();
+            """,
+            97,
+        ),
+        ("let identity = fn(a) { a; }; identity(4);", 4),
+        ("let sum = fn(a, b) { a + b; }; sum(1, 2);", 3),
+        ("let sum = fn(a, b) { let c = a + b; c; }; sum(1, 2) + sum(3, 4);", 10),
+        (
+            """
+            let sum = fn(a, b) { let c = a + b; c; };
+            let outer = fn() { sum(1, 2) + sum(3, 4); };
+            outer();
+            """,
+            10,
+        ),
+        (
+            """
+            let fibonacci = fn(x) {
+                if (x < 2) { x } else { fibonacci(x - 1) + fibonacci(x - 2) }
+            };
+            fibonacci(15);
+            """,
+            610,
+        ),
+        ("return 5; 10;", 5),
+        ("let f = fn() { 1 }; if (true) { return f() + 1; }; 10;", 2),
+    ],
+)
+def test_calling_functions(text: str, expected: Any):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("let newClosure = fn(a) { fn() { a; }; }; let closure = newClosure(99); closure();", 99),
+        ("let newAdder = fn(a, b) { fn(c) { a + b + c }; }; let adder = newAdder(1, 2); adder(8);", 11),
+        ("let newAdder = fn(a, b) { let c = a + b; fn(d) { c + d }; }; let adder = newAdder(1, 2); adder(8);", 11),
+        (
+            """
+            let newAdderOuter = fn(a, b) {
+                let c = a + b;
+                fn(d) {
+                    let e = d + c;
+                    fn(f) { e + f; };
+                };
+            };
+            let newAdderInner = newAdderOuter(1, 2);
+            let adder = newAdderInner(3);
+            adder(8);
+            """,
+            14,
+        ),
+        (
+            """
+            let a = 1;
+            let newAdderOuter = fn(b) {
+                fn(c) {
+                    fn(d) { a + b + c + d };
+                };
+            };
+            let newAdderInner = newAdderOuter(2);
+            let adder = newAdderInner(3);
+            adder(8);
+            """,
+            14,
+        ),
+        (
+            """
+            let newClosure = fn(a, b) {
+                let one = fn() { a; };
+                let two = fn() { b; };
+                fn() { one() + two(); };
+            };
+            let closure = newClosure(9, 90);
+            closure();
+            """,
+            99,
+        ),
+        (
+            """
+            let countDown = fn(x) {
+                if (x == 0) { return 0; } else { countDown(x - 1); }
+            };
+            let wrapper = fn() { countDown(1); };
+            wrapper();
+            """,
+            0,
+        ),
+        (
+            """
+            let wrapper = fn() {
+                let countDown = fn(x) {
+                    if (x == 0) { return 0; } else { countDown(x - 1); }
+                };
+                countDown(1);
+            };
+            wrapper();
+            """,
+            0,
+        ),
+        (
+            """
+            let twice = fn(f, x) { f(f(x)) };
+            let adder = fn(n) { fn(x) { x + n } };
+            twice(adder(5), 1);
+            """,
+            11,
+        ),
+    ],
+)
+def test_closures(text: str, expected: Any):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,message",
+    [
+        ("fn() { 1; }(1);", "wrong number of arguments: want=0, got=1"),
+        ("fn(a) { a; }();", "wrong number of arguments: want=1, got=0"),
+        ("fn(a, b) { a + b; }(1);", "wrong number of arguments: want=2, got=1"),
+        ("1();", "calling non-function"),
+        ("let f = fn(x) { f(x + 1) }; f(0);", "stack overflow"),
+        ("let f = fn() { f() }; f();", "call stack overflow"),
+    ],
+)
+def test_calling_functions_errors(text: str, message: str):
+    program = parse(text)
+    comp = compiler.Compiler()
+    comp.compile(program)
+    vm = VM(comp.bytecode())
+    with pytest.raises(RuntimeError) as e:
+        vm.run()
+    assert str(e.value) == message
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ('"monkey"', "monkey"),
+        ('"mon" + "key"', "monkey"),
+        ('"mon" + "key" + "banana"', "monkeybanana"),
+        ('let greeting = "Hello"; greeting + " " + "World!"', "Hello World!"),
+    ],
+)
+def test_string_expressions(text: str, expected: str):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("[]", []),
+        ("[1, 2, 3]", [1, 2, 3]),
+        ("[1 + 2, 3 * 4, 5 + 6]", [3, 12, 11]),
+        ('[1, "two", [3]]', [1, "two", [3]]),
+    ],
+)
+def test_array_literals(text: str, expected: list):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("{}", {}),
+        (
+            "{1: 2, 2: 3}",
+            {monkey_object.Integer(1): 2, monkey_object.Integer(2): 3},
+        ),
+        (
+            "{1 + 1: 2 * 2, 3 + 3: 4 * 4}",
+            {monkey_object.Integer(2): 4, monkey_object.Integer(6): 16},
+        ),
+        (
+            """
+            let two = "two";
+            {"one": 10 - 9, two: 1 + 1, "thr" + "ee": 6 / 2, 4: 4, true: 5, false: 6}
+            """,
+            {
+                monkey_object.String("one"): 1,
+                monkey_object.String("two"): 2,
+                monkey_object.String("three"): 3,
+                monkey_object.Integer(4): 4,
+                monkey_object.Boolean(True): 5,
+                monkey_object.Boolean(False): 6,
+            },
+        ),
+    ],
+)
+def test_hash_literals(text: str, expected: dict):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("[1, 2, 3][0]", 1),
+        ("[1, 2, 3][1]", 2),
+        ("[1, 2, 3][2]", 3),
+        ("let i = 0; [1][i];", 1),
+        ("[1, 2, 3][1 + 1];", 3),
+        ("let myArray = [1, 2, 3]; myArray[2];", 3),
+        ("let myArray = [1, 2, 3]; myArray[0] + myArray[1] + myArray[2];", 6),
+        ("let myArray = [1, 2, 3]; let i = myArray[0]; myArray[i]", 2),
+        ("[1, 2, 3][3]", NULL),
+        ("[1, 2, 3][-1]", NULL),
+        ("[[1, 1, 1]][0][0]", 1),
+        ('{"foo": 5}["foo"]', 5),
+        ('{"foo": 5}["bar"]', NULL),
+        ('let key = "foo"; {"foo": 5}[key]', 5),
+        ('{}["foo"]', NULL),
+        ("{5: 5}[5]", 5),
+        ("{true: 5}[true]", 5),
+        ("{false: 5}[false]", 5),
+        ("{1: 1, 2: 2}[2]", 2),
+        ("{1: 1}[0]", NULL),
+    ],
+)
+def test_index_expressions(text: str, expected: Any):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,message",
+    [
+        ('"Hello" - "World"', "unknown operator: STRING - STRING"),
+        ('"a" == "a"', "unknown operator: STRING == STRING"),
+        ("int_array([1]) > 1", "unknown operator: INT_ARRAY > INTEGER"),
+        ('{"name": "Monkey"}[fn(x) { x }];', "unusable as hash key: CLOSURE"),
+        ("{[1]: 2}", "unusable as hash key: ARRAY"),
+        ("1[0]", "index operator not supported: INTEGER"),
+    ],
+)
+def test_data_errors(text: str, message: str):
+    program = parse(text)
+    comp = compiler.Compiler()
+    comp.compile(program)
+    vm = VM(comp.bytecode())
+    with pytest.raises(RuntimeError) as e:
+        vm.run()
+    assert str(e.value) == message
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ('len("")', 0),
+        ('len("four")', 4),
+        ('len("hello world")', 11),
+        ("len([1, 2, 3])", 3),
+        ("len([])", 0),
+        ('puts("hello", "world!")', NULL),
+        ("first([1, 2, 3])", 1),
+        ("first([])", NULL),
+        ("last([1, 2, 3])", 3),
+        ("last([])", NULL),
+        ("rest([1, 2, 3])", [2, 3]),
+        ("rest([])", NULL),
+        ("push([], 1)", [1]),
+        ("sum(int_array([1, 2, 3]))", 6),
+        ("let map = fn(a, f) { if (len(a) == 0) { [] } else { push(map(rest(a), f), f(first(a))) } }; map([1, 2, 3], fn(x) { x * 2 })", [6, 4, 2]),
+        ("let len = fn(x) { 42 }; len([])", 42),
+    ],
+)
+def test_builtin_functions(text: str, expected: Any):
+    run_vm_test(text, expected)
+
+
+@pytest.mark.parametrize(
+    "text,message",
+    [
+        ("len(1)", "argument to `len` not supported, got INTEGER"),
+        ('len("one", "two")', "wrong number of arguments. got=2, want=1"),
+        ("first(1)", "argument to `first` must be ARRAY, got INTEGER"),
+        ("push(1, 1)", "argument to `push` must be ARRAY, got INTEGER"),
+    ],
+)
+def test_builtin_errors(text: str, message: str):
+    comp = compiler.Compiler()
+    comp.compile(parse(text))
+    vm = VM(comp.bytecode())
+    with pytest.raises(RuntimeError) as e:
+        vm.run()
+    assert str(e.value) == message
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "1 + 2 * 3 - 4 / 2",
+        "7 / -2; -7 / 2",
+        "(1 < 2) == !(2 > 1 != false)",
+        '"a" + "b" + "c"',
+        "if (!!(1 > 2)) { 10 } else { 20 }",
+        "if (0) { 10 }",
+        "if (!!!true) { 10 }",
+        "let a = 1; if (false) { a } else { a + 1 }",
+        "let f = fn(x) { if (1 == 1) { !!(x > 2) } else { x } }; [f(1), f(3)]",
+        "let x = 5; if (!!x) { x * (2 + 3) }",
+        "let f = fn(x) { if (x) { return 1; } else { return 2; }; 3 }; [f(true), f(0)]",
+        "let g = fn(x) { if (x > 1) { if (x > 2) { 3 } else { 2 } } else { 1 } }; [g(1), g(2), g(3)]",
+        "let t = true; let h = fn(x) { if (x == t) { 1 } else { 2 } }; [h(true), h(false), h(t == 1)]",
+        "let s = 5; if (s > 4) { s - 1 } else { s + 1 }",
+        "let n = -7; let m = n / 2 * 3 - n; [m, n + 1, -n / 2]",
+        "let k = 3; let adder = fn(x) { fn() { k * x + k } }; adder(2)()",
+    ],
+)
+def test_optimized_results_match(text: str):
+    results = []
+    for optimize in (False, True):
+        comp = compiler.Compiler(
+            optimize=optimize, superinstructions=optimize, compact=optimize
+        )
+        comp.compile(parse(text))
+        vm = VM(comp.bytecode())
+        vm.run()
+        results.append(vm.last_popped_stack_elem().inspect())
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize(
+    "text", ["let v = 100;", "(5 * 2); let x = 70000;", "let f = fn() { 1 }; let y = 2;"]
+)
+def test_superinstructions_last_popped(text: str):
+    results = []
+    for superinstructions in (False, True):
+        comp = compiler.Compiler(superinstructions=superinstructions)
+        comp.compile(parse(text))
+        vm = VM(comp.bytecode())
+        vm.run()
+        results.append(vm.last_popped_stack_elem().inspect())
+    assert results[0] == results[1]
+
+
+def test_superinstruction_errors():
+    comp = compiler.Compiler(superinstructions=True)
+    comp.compile(parse('let f = fn(a) { if (a > "b") { 1 } }; f("a")'))
+    vm = VM(comp.bytecode())
+    with pytest.raises(RuntimeError) as e:
+        vm.run()
+    assert str(e.value) == "unknown operator: STRING > STRING"
+
+
+def test_shared_globals_store():
+    symbol_table = compiler.new_symbol_table()
+    constants = []
+    globals_store = monkey_vm.new_globals_store()
+    for text in ["let a = 2;", "let b = a * 3; b + a"]:
+        comp = compiler.Compiler.new_with_state(symbol_table, constants)
+        comp.compile(parse(text))
+        vm = VM(comp.bytecode(), globals_store=globals_store)
+        vm.run()
+    check_expected_object(8, vm.last_popped_stack_elem())
+
+
+def test_int_array_binary_operations():
+    constants = [
+        monkey_object.IntArray(int_array.new([1, 2, 3])),
+        monkey_object.Integer(2),
+    ]
+    instructions = bytes(
+        [
+            *code.make(code.Opcode.CONSTANT, 0),
+            *code.make(code.Opcode.CONSTANT, 1),
+            *code.make(code.Opcode.MUL),
+            *code.make(code.Opcode.CONSTANT, 0),
+            *code.make(code.Opcode.ADD),
+            *code.make(code.Opcode.POP),
+        ]
+    )
+    vm = VM(compiler.Bytecode(instructions, constants))
+    vm.run()
+    result = vm.last_popped_stack_elem()
+    assert isinstance(result, monkey_object.IntArray)
+    assert [int(v) for v in result.values] == [3, 6, 9]
+
+
+def run_with_limits(text: str, limits: Limits):
+    program = parse(text)
+    comp = compiler.Compiler()
+    comp.compile(program)
+    vm = VM(comp.bytecode(), limits=limits)
+    vm.run()
+    return vm
+
+
+def test_instruction_budget():
+    # CONSTANT CONSTANT ADD POP
+    vm = run_with_limits("1 + 2", Limits(max_instructions=4))
+    assert vm.instructions_executed == 4
+    with pytest.raises(InstructionBudgetExceeded):
+        run_with_limits("1 + 2", Limits(max_instructions=3))
+    text = "1 + 1; " * 1000
+    vm = run_with_limits(text, Limits(max_instructions=4000))
+    assert vm.instructions_executed == 4000
+    with pytest.raises(InstructionBudgetExceeded):
+        run_with_limits(text, Limits(max_instructions=3999))
+
+
+def test_deadline():
+    with pytest.raises(DeadlineExceeded):
+        run_with_limits("1 + 1; " * 1000, Limits(timeout=0))
+    run_with_limits("1 + 1; " * 1000, Limits(timeout=60))
+
+
+def test_stack_depth():
+    run_with_limits("1 + 2", Limits(max_stack_depth=2))
+    with pytest.raises(StackDepthExceeded):
+        run_with_limits("1 + 2", Limits(max_stack_depth=1))
+    # the callee slot, three locals and the value being bound
+    text = "fn() { let a = 1; let b = 2; let c = 3; }()"
+    run_with_limits(text, Limits(max_stack_depth=5))
+    with pytest.raises(StackDepthExceeded):
+        run_with_limits(text, Limits(max_stack_depth=4))
+    # the locals do not fit at all
+    with pytest.raises(StackDepthExceeded):
+        run_with_limits(text, Limits(max_stack_depth=3))
+
+
+def test_limit_errors_are_runtime_errors():
+    assert issubclass(InstructionBudgetExceeded, ExecutionLimitExceeded)
+    assert issubclass(DeadlineExceeded, ExecutionLimitExceeded)
+    assert issubclass(StackDepthExceeded, ExecutionLimitExceeded)
+    assert issubclass(ExecutionLimitExceeded, RuntimeError)
+
+
+def test_run_instrumented():
+    program = parse("let a = 1; if (a > 2) { 3 } else { 4 }; a + a")
+    comp = compiler.Compiler()
+    comp.compile(program)
+    vm = VM(comp.bytecode())
+    report = vm.run_instrumented(timing=True)
+    check_integer_object(2, vm.last_popped_stack_elem())
+    assert report.opcodes == {
+        "CONSTANT": 3,
+        "SET_GLOBAL": 1,
+        "GET_GLOBAL": 3,
+        "GREATER_THAN": 1,
+        "JUMP_NOT_TRUTHY": 1,
+        "ADD": 1,
+        "POP": 2,
+    }
+    assert report.offsets[("<main>", 0)] == 1
+    assert sum(report.offsets.values()) == vm.instructions_executed == 12
+    assert report.pairs[("GET_GLOBAL", "CONSTANT")] == 1
+    assert report.pairs[("GET_GLOBAL", "GET_GLOBAL")] == 1
+    assert sum(report.pairs.values()) == 11
+    assert set(report.time) == set(report.opcodes)
+    exported = json.loads(report.to_json())
+    assert exported["opcodes"]["GET_GLOBAL"] == 3
+    assert ["GET_GLOBAL", "ADD", 1] in exported["pairs"]
+    assert ["<main>", 0, 1] in exported["offsets"]
+
+
+def test_run_instrumented_offsets_per_function():
+    comp = compiler.Compiler()
+    comp.compile(parse("let f = fn(x) { x }; f(1) + fn() { 2 }()"))
+    vm = VM(comp.bytecode())
+    report = vm.run_instrumented()
+    anonymous = comp.bytecode().constants[-1].inspect()
+    # each function starts at its own offset 0
+    assert report.offsets[("<main>", 0)] == 1
+    assert report.offsets[("f", 0)] == 1
+    assert report.offsets[(anonymous, 0)] == 1
+    assert sum(report.offsets.values()) == vm.instructions_executed
+
+
+def test_run_instrumented_respects_budget():
+    program = parse("1 + 2")
+    comp = compiler.Compiler()
+    comp.compile(program)
+    vm = VM(comp.bytecode(), limits=Limits(max_instructions=2))
+    with pytest.raises(InstructionBudgetExceeded):
+        vm.run_instrumented()
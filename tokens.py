@@ -42,9 +42,12 @@ class TokenType(Enum):
 
 
 class Token:
-    def __init__(self, type=TokenType.Illegal, literal=""):
+    def __init__(self, type=TokenType.Illegal, literal="", line=0, column=0):
         self.type = type
         self.literal = literal
+        # 1-based position of the first character; 0 when unknown
+        self.line = line
+        self.column = column
 
 
 KEYWORDS = {
@@ -0,0 +1,84 @@
+from collections import deque
+from contextlib import contextmanager
+from profiler import function_label
+import json
+import os
+import threading
+import time
+
+
+class Tracer:
+    """
+    Collects Chrome trace events (viewable in Perfetto or chrome://tracing).
+    With a `capacity`, only the most recent events are kept.
+    """
+
+    def __init__(self, capacity=None, clock=time.perf_counter_ns):
+        self.events = deque(maxlen=capacity)
+        self.clock = clock
+        self._origin = clock()
+        self._stack = []
+        self._pid = os.getpid()
+
+    def _now(self):
+        "Microseconds since the tracer was created."
+        return (self.clock() - self._origin) / 1000
+
+    def _event(self, name, cat, ph, ts, args):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": ph,
+            "ts": ts,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        return event
+
+    def complete(self, name, cat, start, args=None):
+        event = self._event(name, cat, "X", start, args)
+        event["dur"] = self._now() - start
+        self.events.append(event)
+
+    @contextmanager
+    def span(self, name, cat="phase", args=None):
+        start = self._now()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, args)
+
+    def instant(self, name, cat="event", args=None):
+        event = self._event(name, cat, "i", self._now(), args)
+        event["s"] = "t"
+        self.events.append(event)
+
+    def enter(self, function):
+        self._stack.append((function_label(function), self._now()))
+
+    def exit(self):
+        name, start = self._stack.pop()
+        self.complete(name, "function", start)
+
+    def to_dict(self):
+        return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def write(self, stream):
+        json.dump(self.to_dict(), stream)
+
+
+class TracingSink:
+    "Passes `puts` output on to `sink`, recording an instant event per line."
+
+    def __init__(self, tracer, sink):
+        self.tracer = tracer
+        self.sink = sink
+
+    def write(self, line):
+        self.tracer.instant("puts", args={"line": line})
+        self.sink.write(line)
+
+    def flush(self):
+        self.sink.flush()